@@ -47,28 +47,55 @@ async function runWildfireSimulation(countyKey, igniPointLat, igniPointLon) {
 }
 
 /**
- * Get a dynamic GEE layer URL.
- * Sends a GeoJSON geometry (e.g., a county) to the backend, which returns
- * a clipped Google Earth Engine tile URL for visualization.
+ * Check candidate ignition points and snap each to the nearest forest pixel.
+ * @param {string} countyKey - County key identifier
+ * @param {Array<{lat: number, lon: number}>} points - Candidate points
+ * @param {number} [maxSnapDistance] - Optional snap radius in pixels
+ * @returns {Promise<Object|null>} - { success, points: [{ burnable, nearest: {lat, lon, ...} | null }, ...] }
+ */
+async function queryIgnitionPoints(countyKey, points, maxSnapDistance) {
+    const pointQueryEndpoint = `${CONFIG.API_BASE_URL}/ignition_points/query`;
+    try {
+        const response = await fetch(pointQueryEndpoint, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ countyKey, points, maxSnapDistance }),
+        });
+
+        if (!response.ok) throw new Error(`HTTP error! Status: ${response.status}`);
+
+        return await response.json();
+    } catch (error) {
+        console.error('[API Error] Ignition Point Query:', error);
+        return null;
+    }
+}
+
+/**
+ * Get the forest layer tile URL.
+ * Sends a GeoJSON geometry (e.g., a county) to the backend. If the county's
+ * GeoTIFF is already downloaded the backend returns local tiles, otherwise
+ * a clipped Google Earth Engine tile URL.
  * @param {Object} geometry - GeoJSON geometry object (e.g., county)
- * @returns {Promise<string|null>} - Tile URL string
+ * @param {string} [countyKey] - County key identifier (enables local tiles)
+ * @returns {Promise<Object|null>} - { url, source: 'local' | 'gee', bounds? }
  */
-async function getGEEClippedLayer(geometry) {
+async function getGEEClippedLayer(geometry, countyKey) {
     const GEELayerEndpoint = `${CONFIG.GEE_BASE_URL}/get_layer`;
     try {
         const response = await fetch(GEELayerEndpoint, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ geometry }),
+            body: JSON.stringify({ geometry, countyKey }),
         });
 
         if (!response.ok) throw new Error(`HTTP error! Status: ${response.status}`);
 
         const data = await response.json();
-        // backend returns { url: "...tile url..." }
+        // backend returns { url: "...tile url...", source, bounds }
         if (data.url) {
-            console.log('[INFO] GEE tile URL retrieved:', data.url);
-            return data.url;
+            console.log(`[INFO] Forest tile URL retrieved (${data.source}):`, data.url);
+            return data;
         } else {
             console.warn('[WARN] No "url" field returned from backend.');
             return null;
@@ -110,12 +137,16 @@ async function startForestExport(geometry, countyName, stateAbbr) {
 
 /**
  * STEP 2: Check the status of the export task.
- * @param {string} taskId - The GEE-generated ID for the task (e.g., "P7NDW...")
+ * @param {string|null} taskId - The GEE-generated ID for the task (e.g., "P7NDW..."); null while
+ *   the export we attached to is still starting (the backend then looks it up by filenameKey)
+ * @param {string} filenameKey - Export key returned by start-export
+ * @param {number} waitSeconds - Let the backend hold the request until the status changes (long poll)
  * @returns {Promise<Object|null>} - Status response object
  */
-async function checkExportStatus(taskId, filenameKey) {
+async function checkExportStatus(taskId, filenameKey, waitSeconds = 20) {
     // use filename_key query param to match backend
-    const checkStatusEndpoint = `${CONFIG.GEE_BASE_URL}/check-status/${taskId}?filename_key=${encodeURIComponent(filenameKey)}`;
+    const taskPath = taskId ? `/${encodeURIComponent(taskId)}` : '';
+    const checkStatusEndpoint = `${CONFIG.GEE_BASE_URL}/check-status${taskPath}?filename_key=${encodeURIComponent(filenameKey)}&wait=${waitSeconds}`;
     try {
         const response = await fetch(checkStatusEndpoint, {
             method: 'GET',
@@ -124,7 +155,7 @@ async function checkExportStatus(taskId, filenameKey) {
         if (!response.ok) {
             throw new Error(`HTTP error! Status: ${response.status}`);
         }
-        return await response.json(); // expected: { status: 'PROCESSING'|'COMPLETED'|'FAILED', local_path?, url? }
+        return await response.json(); // expected: { status: 'PROCESSING'|'COMPLETED'|'FAILED', task_id?, local_path?, url? }
     } catch (error) {
         console.error('[API Error] Check Export Status:', error);
         return null;
@@ -134,6 +165,7 @@ async function checkExportStatus(taskId, filenameKey) {
 
 export {
     runWildfireSimulation,
+    queryIgnitionPoints,
     getGEEClippedLayer,
     startForestExport,
     checkExportStatus
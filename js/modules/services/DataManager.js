@@ -2,6 +2,7 @@ import CONFIG from '../../config.js';
 import { appState, setState } from '../state.js';
 import {
     runWildfireSimulation,
+    queryIgnitionPoints,
     getGEEClippedLayer,
     startForestExport,
     checkExportStatus
@@ -51,17 +52,29 @@ async function loadWildfireSimulation({ countyKey, igniPointLat, igniPointLon })
 }
 
 
-async function loadGEEClippedLayer(geometry) {
+/**
+ * Snap a clicked point to the nearest forest pixel of the current county raster.
+ * @returns {Promise<{lat: number, lng: number, distancePx: number}|null>}
+ */
+async function snapIgnitionPoint({ countyKey, lat, lng, maxSnapDistance }) {
+    const response = await queryIgnitionPoints(countyKey, [{ lat, lon: lng }], maxSnapDistance);
+    const result = response?.success ? response.points[0] : null;
+    if (!result || !result.nearest) return null;
+    return { lat: result.nearest.lat, lng: result.nearest.lon, distancePx: result.nearest.distance_px };
+}
+
+
+async function loadGEEClippedLayer(geometry, countyKey) {
     try {
-        const url = await getGEEClippedLayer(geometry);
-        if (!url) {
+        const layerInfo = await getGEEClippedLayer(geometry, countyKey);
+        if (!layerInfo) {
             console.warn('[WARN] No GEE URL received.');
             return;
         }
 
-        setState('geeLayerUrl', url);
-        console.log('[INFO] GEE layer URL stored in state:', url);
-        return url;
+        setState('geeLayerUrl', layerInfo.url);
+        console.log('[INFO] GEE layer URL stored in state:', layerInfo.url);
+        return layerInfo;
     } catch (error) {
         console.error('[ERROR] DataManager: Failed to load GEE layer.', error);
     }
@@ -118,7 +131,9 @@ async function startForestDataExport(geometry) {
                 status: 'PROCESSING',
                 localUrl: null
             });
-            console.log(`[INFO] DataManager: Forest export started. Task ID: ${taskResponse.task_id} for ${taskResponse.filename_key}`);
+            // task_id is null when we attached to an export that is still starting;
+            // checkForestDataStatus() picks it up from the status responses
+            console.log(`[INFO] DataManager: Forest export started. Task ID: ${taskResponse.task_id || '(starting)'} for ${taskResponse.filename_key}`);
             alert("Starting forest data export. This may take several minutes.");
             return;
         }
@@ -146,12 +161,12 @@ async function checkForestDataStatus() {
     }
 
     if (task.status === 'COMPLETED') return 'COMPLETED';
-    if (task.status === 'PROCESSING' && !task.id) {
-        console.error('[ERROR] Task is processing but has no GEE task ID to poll.');
+    if (task.status === 'PROCESSING' && !task.countyKey) {
+        console.error('[ERROR] Task is processing but has no export key to poll.');
         return 'FAILED';
     }
 
-    console.log(`[INFO] DataManager: Checking status for task ${task.id} (${task.countyKey})`);
+    console.log(`[INFO] DataManager: Checking status for task ${task.id || '(starting)'} (${task.countyKey})`);
 
     try {
         const statusResponse = await checkExportStatus(task.id, task.countyKey);
@@ -177,7 +192,7 @@ async function checkForestDataStatus() {
 
             case 'PROCESSING':
                 console.log('[INFO] DataManager: Export is still processing.');
-                setState('currentExportTask', { ...task, status: 'PROCESSING' });
+                setState('currentExportTask', { ...task, id: statusResponse.task_id || task.id, status: 'PROCESSING' });
                 return 'PROCESSING';
 
             case 'FAILED':
@@ -242,6 +257,7 @@ function getForestExportStatus() {
 export {
     loadAllData,
     loadWildfireSimulation,
+    snapIgnitionPoint,
     loadGEEClippedLayer,
     startForestDataExport,
     checkForestDataStatus,
@@ -1,14 +1,11 @@
 // ForestLayer.js
-// Handles GeoTIFF forest cover loading, masking, and GEE fallback
+// Handles forest cover layer loading (local tiles) and GEE fallback
 
-import parseGeoraster from "georaster";
-import GeoRasterLayer from "georaster-layer-for-leaflet";
 import CONFIG from "../../config.js";
 import {
     loadGEEClippedLayer,
     startForestDataExport,
     checkForestDataStatus,
-    getCurrentGEEForestFileUrl,
     setCurrentCountyNameAndStateAbbr,
     getCurrentCountyKey
 } from "../services/DataManager.js";
@@ -18,9 +15,30 @@ import { showLoader, hideLoader } from "../../utils/loader.js";
 import MapCore from "./MapCore.js";
 
 let forestLayer = null;
-let geoRaster = null;
 let geotiffLoaded = false;
 
+/**
+ * Show the county's forest layer as locally rendered XYZ tiles
+ * (only the tiles in view are fetched; the backend caches them).
+ */
+function showLocalForestLayer(layerInfo) {
+    const map = MapCore.getMap();
+    if (!map) return;
+
+    if (forestLayer) {
+        try { map.removeLayer(forestLayer); } catch {}
+    }
+
+    const b = layerInfo.bounds;
+    forestLayer = L.tileLayer(layerInfo.url, {
+        pane: "forestPane",
+        opacity: 1.0,
+        bounds: b ? L.latLngBounds([b.south, b.west], [b.north, b.east]) : undefined
+    }).addTo(map);
+
+    geotiffLoaded = true;
+}
+
 async function handleCountySelectionForGEE(feature) {
     const map = MapCore.getMap();
     if (!map) return;
@@ -51,68 +69,43 @@ async function handleCountySelectionForGEE(feature) {
             try { map.removeLayer(forestLayer); } catch (e) {}
             forestLayer = null;
         }
-        geoRaster = null;
-
-        // Construct served URL for the expected GeoTIFF
-        const servedGeotiffUrl = `${CONFIG.API_BASE_URL}/exports/${encodeURIComponent(countyKey)}.tif`;
 
-        // 1) Try local GeoTIFF first
-        try {
-            const headResp = await fetch(servedGeotiffUrl, { method: "HEAD" });
-            if (headResp.ok) {
-                const resp = await fetch(servedGeotiffUrl);
-                if (!resp.ok) throw new Error(`Failed to fetch GeoTIFF: ${resp.status}`);
-                const arrayBuffer = await resp.arrayBuffer();
-                geoRaster = await parseGeoraster(arrayBuffer);
-
-                if (forestLayer) {
-                    try { map.removeLayer(forestLayer); } catch {}
-                }
-
-                forestLayer = new GeoRasterLayer({
-                    georaster: geoRaster,
-                    pane: "forestPane",
-                    opacity: 1.0,
-                    resolution: 128,
-                    pixelValuesToColorFn: (values) => {
-                        const v = values[0];
-                        return v === 1 ? "rgba(0,150,0,0.9)" : "rgba(0,0,0,0)";
-                    },
-                    mask: feature.geometry
-                }).addTo(map);
-
-                geotiffLoaded = true;
-                hideLoader();
-                showToast("Forest layer map loaded successfully.");
-                return;
-            }
-        } catch (err) {
-            console.warn("[WARN] Local GeoTIFF not available or failed to load:", err);
+        // 1) Ask for the layer: the backend serves local tiles when the
+        //    county GeoTIFF is already downloaded, else a GEE tile URL
+        const layerInfo = await loadGEEClippedLayer(feature.geometry, countyKey);
+        if (layerInfo && layerInfo.source === "local") {
+            showLocalForestLayer(layerInfo);
+            hideLoader();
+            showToast("Forest layer map loaded successfully.");
+            return;
         }
 
         // 2) Start export + show preview tiles while waiting
         // startForestDataExport initiates backend export and records task in DataManager
         await startForestDataExport(feature.geometry);
 
-        // Try to get a preview tile (may be null)
-        const tileUrl = await loadGEEClippedLayer(feature.geometry);
         let previewLayer = null;
-        if (tileUrl) {
-            previewLayer = L.tileLayer(tileUrl, {
+        if (layerInfo && layerInfo.url) {
+            previewLayer = L.tileLayer(layerInfo.url, {
                 opacity: CONFIG.DEFAULT_FOREST_OPACITY,
                 attribution: "GEE Forest Cover"
             }).addTo(map);
         }
 
-        // 3) Poll backend (via DataManager) until export completes or fails
-        const MAX_ATTEMPTS = 120; // e.g., 10 minutes @ 5s
-        const INTERVAL_MS = 5000;
-        let attempts = 0;
+        // 3) Poll backend (via DataManager) until export completes or fails.
+        //    check-status long-polls (the backend holds the request until the
+        //    status changes), so only answers that came back early are padded
+        //    to MIN_INTERVAL_MS; unexpected answers back off.
+        const MAX_WAIT_MS = 10 * 60 * 1000; // give up after 10 minutes
+        const MIN_INTERVAL_MS = 5000;
+        const MAX_BACKOFF_MS = 30000;
+        const deadline = Date.now() + MAX_WAIT_MS;
+        let backoffMs = MIN_INTERVAL_MS;
         let finalStatus = null;
 
-        while (attempts < MAX_ATTEMPTS) {
-            attempts += 1;
-            // checkForestDataStatus updates DataManager state and returns 'COMPLETED' | 'PROCESSING' | 'FAILED'
+        while (Date.now() < deadline) {
+            const started = Date.now();
+            // checkForestDataStatus updates DataManager state and returns 'COMPLETED' | 'PROCESSING' | 'FAILED' | 'UNKNOWN'
             const status = await checkForestDataStatus();
             if (status === "COMPLETED") {
                 finalStatus = "COMPLETED";
@@ -122,38 +115,26 @@ async function handleCountySelectionForGEE(feature) {
                 finalStatus = "FAILED";
                 break;
             }
-            // still processing — wait then loop
-            await new Promise((res) => setTimeout(res, INTERVAL_MS));
+            let delayMs;
+            if (status === "PROCESSING") {
+                backoffMs = MIN_INTERVAL_MS;
+                delayMs = MIN_INTERVAL_MS - (Date.now() - started);
+            } else {
+                delayMs = backoffMs;
+                backoffMs = Math.min(backoffMs * 2, MAX_BACKOFF_MS);
+            }
+            delayMs = Math.min(delayMs, deadline - Date.now());
+            if (delayMs > 0) {
+                await new Promise((res) => setTimeout(res, delayMs));
+            }
         }
 
         // 4) Handle end of polling
         if (finalStatus === "COMPLETED") {
-            // Get the served file URL from DataManager (preferred) or fallback to /exports/<countyKey>.tif
-            const fileUrl = getCurrentGEEForestFileUrl() || servedGeotiffUrl;
-
-            try {
-                const resp = await fetch(fileUrl);
-                if (!resp.ok) throw new Error(`Failed to fetch completed GeoTIFF: ${resp.status}`);
-                const arrayBuffer = await resp.arrayBuffer();
-                geoRaster = await parseGeoraster(arrayBuffer);
-
-                if (forestLayer) {
-                    try { map.removeLayer(forestLayer); } catch {}
-                }
-
-                forestLayer = new GeoRasterLayer({
-                    georaster: geoRaster,
-                    pane: "forestPane",
-                    opacity: CONFIG.DEFAULT_FOREST_OPACITY,
-                    resolution: 128,
-                    pixelValuesToColorFn: (values) => {
-                        const v = values[0];
-                        return v === 1 ? "rgba(0,150,0,0.9)" : "rgba(0,0,0,0)";
-                    },
-                    mask: feature.geometry
-                }).addTo(map);
-
-                geotiffLoaded = true;
+            // The GeoTIFF is now local, so the backend serves its tiles
+            const localInfo = await loadGEEClippedLayer(feature.geometry, countyKey);
+            if (localInfo && localInfo.source === "local") {
+                showLocalForestLayer(localInfo);
                 if (previewLayer) {
                     try { map.removeLayer(previewLayer); } catch {}
                 }
@@ -161,18 +142,16 @@ async function handleCountySelectionForGEE(feature) {
                 hideLoader();
                 showToast("Forest layer map loaded successfully.");
                 return;
-            } catch (err) {
-                console.error("[ERROR] Failed to download/parse final GeoTIFF:", err);
-                if (previewLayer) {
-                    hideLoader();
-                    showToast("Preview available, but final GeoTIFF failed to load.", true);
-                    return;
-                } else {
-                    hideLoader();
-                    showToast("Failed to load forest layer.", true);
-                    return;
-                }
             }
+
+            console.error("[ERROR] Export completed but local forest tiles are unavailable.");
+            hideLoader();
+            if (previewLayer) {
+                showToast("Preview available, but final forest layer failed to load.", true);
+            } else {
+                showToast("Failed to load forest layer.", true);
+            }
+            return;
         } else if (finalStatus === "FAILED") {
             if (previewLayer) {
                 hideLoader();
@@ -207,8 +186,8 @@ function getForestLayer() {
     return forestLayer;
 }
 
-function getGeoRaster() {
-    return geoRaster;
+function isForestLayerLoaded() {
+    return geotiffLoaded;
 }
 
 function resetForest() {
@@ -222,13 +201,12 @@ function resetForest() {
     }
 
     forestLayer = null;
-    geoRaster = null;
     geotiffLoaded = false;
 }
 
 export default {
     handleCountySelectionForGEE,
     getForestLayer,
-    getGeoRaster,
+    isForestLayerLoaded,
     resetForest
 };
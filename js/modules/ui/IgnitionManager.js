@@ -5,6 +5,10 @@ import * as turf from "@turf/turf";
 import { showToast } from "../../utils/toast.js";
 import MapCore from "./MapCore.js";
 import ForestLayer from "./ForestLayer.js";
+import { snapIgnitionPoint, getCurrentCountyKey } from "../services/DataManager.js";
+
+// Max distance (in raster pixels) a click is moved to reach forest
+const MAX_SNAP_DISTANCE_PX = 25;
 
 let isSettingIgnitionPoint = false;
 let ignitionMarker = null;
@@ -32,12 +36,9 @@ function enableIgnitionSelection() {
 async function handleMapClick(e, countyLayer) {
     if (!isSettingIgnitionPoint) return;
 
-    const map = MapCore.getMap();
-    const geoRaster = ForestLayer.getGeoRaster();
-
-    if (!geoRaster) {
+    if (!ForestLayer.isForestLayerLoaded()) {
         showToast("Failed to load forest layer.", true);
-        console.warn("[WARN] Forest GeoTIFF not loaded.");
+        console.warn("[WARN] Forest layer not loaded.");
         return;
     }
 
@@ -50,24 +51,25 @@ async function handleMapClick(e, countyLayer) {
         return;
     }
 
-    // Convert lat/lng to raster pixel coordinates
+    // The forest layer is served as tiles, so ask the backend for the pixel:
+    // a forest click comes back unchanged, anything else is snapped to the
+    // nearest forest pixel instead of making the user retry
     try {
-        const x = Math.floor((lng - geoRaster.xmin) / geoRaster.pixelWidth);
-        const y = Math.floor((geoRaster.ymax - lat) / Math.abs(geoRaster.pixelHeight));
-
-        if (y < 0 || y >= geoRaster.height || x < 0 || x >= geoRaster.width) {
-            showToast("Point outside GeoTIFF bounds.", true);
+        const snapped = await snapIgnitionPoint({
+            countyKey: getCurrentCountyKey(),
+            lat,
+            lng,
+            maxSnapDistance: MAX_SNAP_DISTANCE_PX
+        });
+        if (!snapped) {
+            showToast("That point is not a forest pixel.", true);
             return;
         }
-
-        const val = geoRaster.values[0][y][x];
-
-        if (val !== 1) {
-            showToast("That point is not a forest pixel.", true);
+        if (snapped.distancePx === 0) {
+            placeIgnitionMarker(lat, lng);
             return;
         }
-
-        placeIgnitionMarker(lat, lng);
+        placeIgnitionMarker(snapped.lat, snapped.lng);
     } catch (err) {
         console.error("[IGNITION ERROR]", err);
         showToast("Error reading pixel value.", true);
@@ -214,16 +214,8 @@ function setupButtons() {
         const frames = WildfireSimulationLayer.getFrames();
         if (!frames || frames.length === 0) return;
 
-        // Hide all frames
-        frames.forEach(f => f.setOpacity(0));
-
-        // Show the selected frame
-        frames[ts].setOpacity(CONFIG.DEFAULT_WILDFIRE_OPACITY);
-
-        // Force Leaflet to refresh rendering
-        const map = MapCore.getMap();
-        const c = map.getCenter();
-        map.setView(c, map.getZoom(), { animate: false });
+        // Show the selected frame (tile layers: only visible tiles are fetched)
+        WildfireSimulationLayer.showFrame(ts);
 
         currentTimestep = ts;
         updateTimestepControlsUI();
@@ -291,10 +283,7 @@ function setupLayerToggles() {
             // }
 
             // Toggle frames
-            frames.forEach(frame => {
-                if (e.target.checked) frame.addTo(map);
-                else map.removeLayer(frame);
-            });
+            WildfireSimulationLayer.setVisible(e.target.checked);
         });
     }
 
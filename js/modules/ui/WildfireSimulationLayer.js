@@ -1,8 +1,6 @@
 // WildfireSimulationLayer.js
 // Handles wildfire simulation frame loading, animation
 
-import parseGeoraster from "georaster";
-import GeoRasterLayer from "georaster-layer-for-leaflet";
 import CONFIG from "../../config.js";
 import MapCore from "./MapCore.js";
 import ForestLayer from "./ForestLayer.js";
@@ -10,7 +8,10 @@ import { showToast } from "../../utils/toast.js";
 // import { getCurrentCountyKey } from "../services/DataManager.js";
 
 let wildfireFrames = [];
+let wildfireManifest = null;
 let wildfireAnimTimer = null;
+let currentFrameIndex = -1;
+let wildfireVisible = true;
 
 let WILDFIRE_ANIMATION_INTERVAL = 2000; // milliseconds
 let WILDFIRE_FRAME_TIMEOUT = 100;   // milliseconds
@@ -21,50 +22,26 @@ async function loadWildfireFrames(outputDir) {
     if (!map || !selectedCounty) return;
 
     // Cleanup old frames
-    stopAnimation();
-    wildfireFrames.forEach(layer => {
-        try { map.removeLayer(layer); } catch {}
-    });
-    wildfireFrames = [];
-
-    let timestep = 0;
-    const maxTimesteps = 100;
-    const baseUrl = `${CONFIG.API_BASE_URL}/${outputDir}`;
-
-    while (timestep < maxTimesteps) {
-        const rasterUrl = `${baseUrl}/wildfire_t_${timestep.toString().padStart(3, "0")}.tif`;
-
-        try {
-            const headResp = await fetch(rasterUrl, { method: "HEAD" });
-            if (!headResp.ok) break;
-
-            const resp = await fetch(rasterUrl);
-            const arrayBuffer = await resp.arrayBuffer();
-            const simGeoRaster = await parseGeoraster(arrayBuffer);
-
-            const frameLayer = new GeoRasterLayer({
-                georaster: simGeoRaster,
-                pane: "wildfireSimPane",
-                opacity: 0,
-                // resolution: 256,
-                pixelValuesToColorFn: function(values) {
-                    const val = values[0];
-                    switch (val) {
-                        case 2: return "rgba(255,165,0,0.9)"; // orange - burning
-                        case 3: return "rgba(255,0,0,0.9)";   // red - burned
-                        default: return "rgba(0,0,0,0)";
-                    }
-                },
-                mask: selectedCounty.feature.geometry
-            });
-
-            frameLayer.addTo(map);
-            wildfireFrames.push(frameLayer);
-            timestep++;
-        } catch (err) {
-            console.error(`[ERROR] Failed to load frame ${timestep}:`, err);
-            break;
-        }
+    resetSimulation();
+
+    // One request for the manifest (frame list, bounds, stats); each frame is
+    // then an XYZ tile layer, so only the tiles in view are fetched and the
+    // backend renders (and caches) them.
+    try {
+        const manifestResp = await fetch(`${CONFIG.API_BASE_URL}/${outputDir}/manifest.json`);
+        if (!manifestResp.ok) throw new Error(`Manifest HTTP error! Status: ${manifestResp.status}`);
+        const manifest = await manifestResp.json();
+
+        const b = manifest.bounds_wgs84;
+        const bounds = b ? L.latLngBounds([b.south, b.west], [b.north, b.east]) : undefined;
+
+        wildfireManifest = manifest;
+        wildfireFrames = manifest.frames.map(frame => L.tileLayer(
+            `${CONFIG.API_BASE_URL}/tiles/${outputDir}/${frame.t}/{z}/{x}/{y}.png`,
+            { pane: "wildfireSimPane", opacity: 0, bounds }
+        ));
+    } catch (err) {
+        console.error(`[ERROR] Failed to load wildfire frames for ${outputDir}:`, err);
     }
 
     if (wildfireFrames.length === 0) {
@@ -82,37 +59,46 @@ async function loadWildfireFrames(outputDir) {
     return true;
 }
 
+/**
+ * Show frame `index`. Only that frame and the next one (kept transparent,
+ * so its tiles are prefetched) stay on the map.
+ */
+function showFrame(index) {
+    const map = MapCore.getMap();
+    if (!map || !wildfireFrames[index]) return;
+
+    currentFrameIndex = index;
+    wildfireFrames.forEach((layer, i) => {
+        const keep = wildfireVisible && (i === index || i === index + 1);
+        if (!keep) {
+            if (map.hasLayer(layer)) map.removeLayer(layer);
+            return;
+        }
+        if (!map.hasLayer(layer)) layer.addTo(map);
+        layer.setOpacity(i === index ? CONFIG.DEFAULT_WILDFIRE_OPACITY : 0);
+    });
+
+    console.log(`[DEBUG] Showing frame ${index}`);
+}
+
+function setVisible(visible) {
+    wildfireVisible = visible;
+    if (currentFrameIndex >= 0) showFrame(currentFrameIndex);
+}
+
 function startAnimation() {
     const map = MapCore.getMap();
     if (!map || wildfireFrames.length === 0) return;
 
     stopAnimation(); // Reset any existing animation
 
-    wildfireFrames.forEach(frame => frame.setOpacity(0));
     let currentFrame = 0;
-    
-    // Function to show a frame with proper rendering
-    const showFrame = (frameIndex) => {
-        wildfireFrames[frameIndex].setOpacity(CONFIG.DEFAULT_WILDFIRE_OPACITY);
-        
-        // Force canvas redraw by temporarily panning the map
-        const center = map.getCenter();
-        const zoom = map.getZoom();
-        map.setView(center, zoom, { animate: false });
-        
-        console.log(`[DEBUG] Showing frame ${frameIndex}`);
-    };
-    
+
     // Show first frame with a slight delay to ensure it's ready
     setTimeout(() => {
         showFrame(0);
     }, WILDFIRE_FRAME_TIMEOUT);
 
-    // cope, reset map view
-    // const map = MapCore.getMap();
-    const c = map.getCenter();
-    map.setView(c, map.getZoom(), { animate: false });
-
     wildfireAnimTimer = setInterval(() => {
         currentFrame++;
 
@@ -122,7 +108,6 @@ function startAnimation() {
             return;
         }
 
-        wildfireFrames[currentFrame - 1].setOpacity(0);
         showFrame(currentFrame);
     }, WILDFIRE_ANIMATION_INTERVAL);
 }
@@ -143,12 +128,17 @@ function resetSimulation() {
         try { map.removeLayer(frame); } catch {}
     });
     wildfireFrames = [];
+    wildfireManifest = null;
+    currentFrameIndex = -1;
 }
 
 export default {
     loadWildfireFrames,
     startAnimation,
     stopAnimation,
+    showFrame,
+    setVisible,
     resetSimulation,
-    getFrames: () => wildfireFrames
+    getFrames: () => wildfireFrames,
+    getManifest: () => wildfireManifest
 };
\ No newline at end of file
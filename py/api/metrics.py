@@ -0,0 +1,39 @@
+"""
+metrics.py
+---------------------------------------------
+Prometheus scrape endpoint and per-route request latency tracking.
+"""
+
+from flask import Blueprint, Response, g, request
+import time
+
+from utils import metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Expose all process metrics in the Prometheus text format."""
+    from wildfire_sim import kernels
+    metrics.KERNEL_BACKEND_INFO.labels(backend=kernels.get_backend()).set(1)
+    return Response(metrics.REGISTRY.render(), mimetype=None, content_type=metrics.CONTENT_TYPE_LATEST)
+
+
+def init_request_metrics(app):
+    """Record a latency observation for every request, labelled by route template."""
+
+    @app.before_request
+    def _start_request_timer():
+        g._metrics_request_start = time.perf_counter()
+
+    @app.after_request
+    def _observe_request_latency(response):
+        start = g.pop('_metrics_request_start', None)
+        if start is not None:
+            # Use the URL rule (e.g. /api/wildfire_output/<path:subpath>) to keep cardinality bounded
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            metrics.HTTP_REQUEST_SECONDS.labels(
+                route=route, method=request.method, status=response.status_code
+            ).observe(time.perf_counter() - start)
+        return response
@@ -4,29 +4,86 @@ routes.py
 Defines and registers all API blueprints for the application.
 """
 
-from flask import Blueprint, request, jsonify, send_from_directory, abort
+from flask import Blueprint, Response, current_app, request, jsonify, send_from_directory, abort
 import logging
 import traceback
 import os
 
 from config import (
     API_PREFIX, 
-    BASE_DIR,
+    GEE_ENABLED,
     GEE_PREFIX,
     GEOTIFF_DIR,
-    WILDFIRE_OUTPUT_BASE
+    WILDFIRE_OUTPUT_BASE,
+    BATCH_MAX_IGNITIONS,
+    POINT_QUERY_MAX_POINTS,
+    MAX_EXTEND_STEPS,
+    SWEEP_MAX_COMBINATIONS,
+    SWEEP_MAX_RUNS,
+    TILE_CACHE_DIR,
+    TILE_CACHE_MAX_BYTES
 )
-from wildfire_sim.sca import run_geotiff_simulation
+from wildfire_sim import run_catalog
+from utils.tile_cache import DiskLRUCache
+from utils.profiling import load_profile, summarize_profile
+
+# The simulation, raster and geometry modules (rasterio, scipy, shapely) are
+# imported inside the handlers that use them, so the app starts without them
 
 logger = logging.getLogger(__name__)
 
 # --- SIMULATION BLUEPRINT ---
 api_bp = Blueprint('api', __name__)
 
+tile_cache = DiskLRUCache(TILE_CACHE_DIR, TILE_CACHE_MAX_BYTES)
+# Tiles of a finished frame never change, so browsers may keep them forever
+TILE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+def _bool_arg(name, default=False):
+    """Parse a boolean query parameter ('1', 'true', 'yes', 'on')."""
+    value = request.args.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+def _to_output_path(output_dir_absolute):
+    """Map an absolute simulation output dir to the client-facing 'wildfire_output/...' path."""
+    output_root = os.path.abspath(WILDFIRE_OUTPUT_BASE)
+    if os.path.abspath(output_dir_absolute).startswith(output_root + os.path.sep):
+        relative_part = os.path.relpath(output_dir_absolute, output_root)
+    else:
+        # Fallback in rare case output is outside expected dir
+        relative_part = os.path.basename(output_dir_absolute)
+    return f"wildfire_output/{relative_part}".replace(os.path.sep, "/")
+
+def _from_output_path(output_dir):
+    """
+    Inverse of _to_output_path: resolve a client 'wildfire_output/...' path to
+    an absolute directory under WILDFIRE_OUTPUT_BASE (None if it escapes it).
+    """
+    relative_part = output_dir.strip('/')
+    if relative_part.startswith('wildfire_output/'):
+        relative_part = relative_part[len('wildfire_output/'):]
+    output_root = os.path.abspath(WILDFIRE_OUTPUT_BASE)
+    full_path = os.path.abspath(os.path.join(output_root, relative_part))
+    if not full_path.startswith(output_root + os.path.sep):
+        return None
+    return full_path
+
 @api_bp.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint."""
-    return jsonify({'status': 'healthy', 'message': 'Wildfire API is running'})
+    from wildfire_sim import kernels
+    health = {
+        'status': 'healthy',
+        'message': 'Wildfire API is running',
+        'kernel_backend': kernels.get_backend(),
+        'startup': current_app.config.get('STARTUP_TIMINGS'),
+    }
+    if GEE_ENABLED:
+        from earthengine.service import gee_status
+        health['gee'] = gee_status()
+    return jsonify(health)
 
 # serve static GeoTIFF files
 @api_bp.route('/data/shared/geotiffs/<path:filename>', methods=['GET'])
@@ -56,7 +113,12 @@ def simulate_wildfire():
     """
     Run wildfire simulation based on a local GeoTIFF file.
     Expects query parameters: countyKey, igniPointLat, igniPointLon
+    Optional: seed=<int> (reproducible run), profile=1 (per-phase timings +
+    peak memory, written to profile.json next to the frames), cprofile=1
+    (also dump cProfile stats), and run parameters timesteps, pIgnition,
+    pSpontaneous, crop=0|1, cropMargin (defaults from sca.py)
     """
+    from wildfire_sim.sca import run_geotiff_simulation, SimulationConfig
     try:
         # 1. Get arguments from the request
         county_key = request.args.get('countyKey')
@@ -77,29 +139,34 @@ def simulate_wildfire():
         except ValueError:
             return jsonify({'success': False, 'error': 'Invalid parameter format', 'message': 'igniPointLat and igniPointLon must be valid numbers.'}), 400
 
+        seed = request.args.get('seed', type=int)
+        profile = _bool_arg('profile')
+        cprofile = _bool_arg('cprofile')
+        try:
+            config = SimulationConfig.from_params(request.args)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': 'Invalid parameter format', 'message': str(e)}), 400
+
         # 3. Run the simulation (defined in sca_geotiff.py)
         logger.info(f"Running GeoTIFF simulation for {county_key} at ({igni_lat}, {igni_lon})")
         
         # This function will return an absolute path to the output directory
         # Run sim function here
-        output_dir_absolute = run_geotiff_simulation(county_key, igni_lat, igni_lon)
+        output_dir_absolute = run_geotiff_simulation(county_key, igni_lat, igni_lon, seed=seed,
+                                                     profile=profile, cprofile=cprofile, config=config)
 
         # 4. Format the output path
-        wildfire_root = os.path.join(BASE_DIR, "wildfire_output")
-
-        if output_dir_absolute.startswith(wildfire_root):
-            relative_part = os.path.relpath(output_dir_absolute, wildfire_root)
-            final_output_path = f"wildfire_output/{relative_part}".replace(os.path.sep, "/")
-        else:
-            # Fallback in rare case output is outside expected dir
-            final_output_path = f"wildfire_output/{os.path.basename(output_dir_absolute)}"
+        final_output_path = _to_output_path(output_dir_absolute)
 
         # 5. Return success response
-        return jsonify({
+        response = {
             "success": True,
             "message": f"Simulation for {county_key} complete.",
             "output_dir": final_output_path
-        })
+        }
+        if profile:
+            response["profile"] = summarize_profile(load_profile(output_dir_absolute))
+        return jsonify(response)
 
     # --- Error Handling (matching incinerate.py) ---
     except FileNotFoundError as e:
@@ -126,6 +193,519 @@ def simulate_wildfire():
             'traceback': traceback.format_exc()
         }), 500
 
+@api_bp.route('/simulate_wildfire/batch', methods=['POST'])
+def simulate_wildfire_batch():
+    """
+    Run many ignition points in one county against a single loaded raster.
+    Expects JSON: {"countyKey": str, "ignitions": [{"lat", "lon", "seed"?}, ...],
+                   "maxWorkers"?: int, "config"?: {"timesteps", "pIgnition", ...}}
+    Returns the batch manifest; invalid points are reported per entry rather
+    than failing the whole batch.
+    """
+    from wildfire_sim.sca import run_batch_simulation, SimulationConfig
+    try:
+        body = request.get_json(silent=True) or {}
+        county_key = body.get('countyKey')
+        ignitions = body.get('ignitions')
+
+        if not county_key or not isinstance(ignitions, list) or not ignitions:
+            return jsonify({'success': False, 'error': 'Missing parameters', 'message': 'countyKey and a non-empty ignitions list are required.'}), 400
+        if len(ignitions) > BATCH_MAX_IGNITIONS:
+            return jsonify({'success': False, 'error': 'Too many ignition points', 'message': f'At most {BATCH_MAX_IGNITIONS} ignition points per batch.'}), 400
+
+        try:
+            points = [{
+                'lat': float(p['lat']),
+                'lon': float(p['lon']),
+                'seed': int(p['seed']) if p.get('seed') is not None else None
+            } for p in ignitions]
+            max_workers = int(body['maxWorkers']) if body.get('maxWorkers') is not None else None
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'Invalid parameter format', 'message': 'Each ignition needs numeric lat and lon (and an optional integer seed).'}), 400
+        if max_workers is not None and max_workers < 1:
+            return jsonify({'success': False, 'error': 'Invalid parameter format', 'message': 'maxWorkers must be positive.'}), 400
+        try:
+            config = SimulationConfig.from_params(body.get('config') or {})
+        except (AttributeError, ValueError) as e:
+            return jsonify({'success': False, 'error': 'Invalid parameter format', 'message': f'Invalid config: {e}'}), 400
+
+        logger.info(f"Running batch GeoTIFF simulation for {county_key}: {len(points)} ignition(s)")
+        manifest = run_batch_simulation(county_key, points, max_workers=max_workers, config=config)
+
+        # The manifest holds paths relative to WILDFIRE_OUTPUT_BASE; expose client-facing ones
+        manifest['batch_dir'] = _to_output_path(os.path.join(WILDFIRE_OUTPUT_BASE, manifest['batch_dir']))
+        for entry in manifest['ignitions']:
+            if 'output_dir' in entry:
+                entry['output_dir'] = _to_output_path(os.path.join(WILDFIRE_OUTPUT_BASE, entry['output_dir']))
+        manifest.pop('input_file', None)
+
+        completed = sum(1 for e in manifest['ignitions'] if e['status'] == 'completed')
+        return jsonify({
+            "success": True,
+            "message": f"Batch simulation for {county_key} complete ({completed}/{len(points)} ignition points).",
+            "output_dir": manifest['batch_dir'],
+            "manifest": manifest
+        })
+
+    except FileNotFoundError as e:
+        logger.error(f"Batch simulation failed: File not found. {e}", exc_info=True)
+        return jsonify({'success': False, 'error': 'File not found', 'message': str(e)}), 404
+    except Exception as e:
+        logger.error("Batch simulation failed", exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error during batch simulation',
+            'message': str(e),
+            'traceback': traceback.format_exc()
+        }), 500
+
+@api_bp.route('/simulate_wildfire/extend', methods=['POST'])
+def extend_wildfire_simulation():
+    """
+    Run more timesteps of an existing simulation from its last checkpoint.
+    Expects JSON: {"outputDir": "wildfire_output/sim_run_...", "steps": int}
+    """
+    from wildfire_sim.sca import extend_simulation
+    try:
+        body = request.get_json(silent=True) or {}
+        run_dir = _from_output_path(body.get('outputDir') or '')
+        try:
+            steps = int(body.get('steps'))
+        except (TypeError, ValueError):
+            steps = 0
+        if not body.get('outputDir') or run_dir is None or not 0 < steps <= MAX_EXTEND_STEPS:
+            return jsonify({'success': False, 'error': 'Invalid parameters', 'message': f'outputDir and steps (1-{MAX_EXTEND_STEPS}) are required.'}), 400
+
+        stats = extend_simulation(run_dir, steps)
+        return jsonify({
+            "success": True,
+            "message": f"Simulation extended to t={stats['timesteps']}.",
+            "output_dir": _to_output_path(run_dir),
+            **stats
+        })
+
+    except FileNotFoundError as e:
+        logger.error(f"Simulation extend failed: {e}", exc_info=True)
+        return jsonify({'success': False, 'error': 'Not found', 'message': str(e)}), 404
+    except ValueError as e:
+        logger.error(f"Simulation extend failed: {e}", exc_info=True)
+        return jsonify({'success': False, 'error': 'Cannot extend run', 'message': str(e)}), 409
+    except Exception as e:
+        logger.error("Simulation extend failed", exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error while extending simulation',
+            'message': str(e),
+            'traceback': traceback.format_exc()
+        }), 500
+
+@api_bp.route('/simulate_wildfire/branch', methods=['POST'])
+def branch_wildfire_simulation():
+    """
+    Branch a simulation from checkpoint t after applying firebreaks.
+    Expects JSON: {"outputDir": "wildfire_output/sim_run_...", "t": int,
+                   "firebreaks"?: [GeoJSON geometry, ...], "steps"?: int, "seed"?: int}
+    Returns the new run's output_dir (frames 0..t are shared with the parent).
+    """
+    from wildfire_sim.sca import branch_simulation
+    try:
+        body = request.get_json(silent=True) or {}
+        run_dir = _from_output_path(body.get('outputDir') or '')
+        firebreaks = body.get('firebreaks') or []
+        try:
+            t = int(body.get('t'))
+            steps = int(body['steps']) if body.get('steps') is not None else None
+            seed = int(body['seed']) if body.get('seed') is not None else None
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'Invalid parameter format', 'message': 't, steps and seed must be integers.'}), 400
+        if not body.get('outputDir') or run_dir is None or t < 0 or not isinstance(firebreaks, list):
+            return jsonify({'success': False, 'error': 'Invalid parameters', 'message': 'outputDir, a checkpoint t >= 0 and a list of firebreak geometries are required.'}), 400
+        if steps is not None and not 0 <= steps <= MAX_EXTEND_STEPS:
+            return jsonify({'success': False, 'error': 'Invalid parameters', 'message': f'steps must be between 0 and {MAX_EXTEND_STEPS}.'}), 400
+
+        branch_dir = branch_simulation(run_dir, t, firebreaks=firebreaks, steps=steps, seed=seed)
+        return jsonify({
+            "success": True,
+            "message": f"Branched simulation from t={t}.",
+            "parent_output_dir": _to_output_path(run_dir),
+            "output_dir": _to_output_path(branch_dir)
+        })
+
+    except FileNotFoundError as e:
+        logger.error(f"Simulation branch failed: {e}", exc_info=True)
+        return jsonify({'success': False, 'error': 'Not found', 'message': str(e)}), 404
+    except ValueError as e:
+        logger.error(f"Simulation branch failed: {e}", exc_info=True)
+        return jsonify({'success': False, 'error': 'Cannot branch run', 'message': str(e)}), 409
+    except Exception as e:
+        logger.error("Simulation branch failed", exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error while branching simulation',
+            'message': str(e),
+            'traceback': traceback.format_exc()
+        }), 500
+
+@api_bp.route('/simulate_wildfire/sweep', methods=['POST'])
+def sweep_wildfire_simulation():
+    """
+    Burned-area curves for a grid of CA parameters from one ignition point,
+    computed as one batched in-memory run (no frames are written).
+    Expects JSON: {"countyKey": str, "lat": float, "lon": float,
+                   "pIgnition": [float, ...], "pSpontaneous"?: [float, ...],
+                   "runs"?: int, "seed"?: int, "timesteps"?: int}
+    Every pIgnition x pSpontaneous combination gets its mean curve over `runs`.
+    """
+    from wildfire_sim.sca import run_parameter_sweep, SimulationConfig
+    try:
+        body = request.get_json(silent=True) or {}
+        county_key = body.get('countyKey')
+        p_ignition = body.get('pIgnition') or []
+        p_spontaneous = body.get('pSpontaneous') or []
+        if not county_key or body.get('lat') is None or body.get('lon') is None or not isinstance(p_ignition, list) or not isinstance(p_spontaneous, list):
+            return jsonify({'success': False, 'error': 'Missing parameters', 'message': 'countyKey, lat, lon and a pIgnition list are required.'}), 400
+
+        try:
+            lat, lon = float(body['lat']), float(body['lon'])
+            p_ignition = [float(p) for p in p_ignition]
+            p_spontaneous = [float(p) for p in p_spontaneous]
+            runs = int(body.get('runs', 1))
+            seed = int(body['seed']) if body.get('seed') is not None else None
+            config = SimulationConfig.from_params({'timesteps': body.get('timesteps')})
+        except (TypeError, ValueError) as e:
+            return jsonify({'success': False, 'error': 'Invalid parameter format', 'message': f'lat, lon and the probabilities must be numbers; runs, seed and timesteps integers. ({e})'}), 400
+        if not all(0 <= p <= 1 for p in p_ignition + p_spontaneous):
+            return jsonify({'success': False, 'error': 'Invalid parameter format', 'message': 'pIgnition and pSpontaneous values must be between 0 and 1.'}), 400
+        combinations = max(len(p_ignition), 1) * max(len(p_spontaneous), 1)
+        if combinations > SWEEP_MAX_COMBINATIONS or not 1 <= runs <= SWEEP_MAX_RUNS:
+            return jsonify({'success': False, 'error': 'Sweep too large', 'message': f'At most {SWEEP_MAX_COMBINATIONS} parameter combinations and 1-{SWEEP_MAX_RUNS} runs per sweep.'}), 400
+
+        logger.info(f"Running parameter sweep for {county_key} at ({lat}, {lon}): {combinations} combination(s) x {runs} run(s)")
+        result = run_parameter_sweep(county_key, lat, lon, p_ignition=p_ignition, p_spontaneous=p_spontaneous,
+                                     runs=runs, seed=seed, config=config)
+        return jsonify({"success": True, **result})
+
+    except FileNotFoundError as e:
+        logger.error(f"Parameter sweep failed: File not found. {e}", exc_info=True)
+        return jsonify({'success': False, 'error': 'File not found', 'message': str(e)}), 404
+    except (IndexError, ValueError) as e:
+        logger.error(f"Parameter sweep failed: Invalid ignition point. {e}", exc_info=True)
+        return jsonify({'success': False, 'error': 'Invalid ignition point', 'message': str(e)}), 400
+    except Exception as e:
+        logger.error("Parameter sweep failed", exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error during parameter sweep',
+            'message': str(e),
+            'traceback': traceback.format_exc()
+        }), 500
+
+@api_bp.route('/ignition_points/query', methods=['POST'])
+def query_ignition_points():
+    """
+    Check many candidate ignition points at once and snap each to the
+    nearest forest pixel.
+    Expects JSON: {"countyKey": str, "points": [{"lat", "lon"}, ...],
+                   "maxSnapDistance"?: pixels}
+    """
+    from wildfire_sim.point_query import query_points
+    try:
+        body = request.get_json(silent=True) or {}
+        county_key = body.get('countyKey')
+        points = body.get('points')
+
+        if not county_key or not isinstance(points, list) or not points:
+            return jsonify({'success': False, 'error': 'Missing parameters', 'message': 'countyKey and a non-empty points list are required.'}), 400
+        if len(points) > POINT_QUERY_MAX_POINTS:
+            return jsonify({'success': False, 'error': 'Too many points', 'message': f'At most {POINT_QUERY_MAX_POINTS} points per query.'}), 400
+
+        try:
+            points = [{'lat': float(p['lat']), 'lon': float(p['lon'])} for p in points]
+            max_snap = float(body['maxSnapDistance']) if body.get('maxSnapDistance') is not None else None
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'Invalid parameter format', 'message': 'Each point needs numeric lat and lon.'}), 400
+
+        results = query_points(county_key, points, max_snap_distance=max_snap)
+        return jsonify({"success": True, "countyKey": county_key, "points": results})
+
+    except FileNotFoundError as e:
+        logger.error(f"Ignition point query failed: File not found. {e}", exc_info=True)
+        return jsonify({'success': False, 'error': 'File not found', 'message': str(e)}), 404
+    except Exception as e:
+        logger.error("Ignition point query failed", exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error during ignition point query',
+            'message': str(e),
+            'traceback': traceback.format_exc()
+        }), 500
+
+def _risk_job_response(info):
+    """Job info with client-facing output paths."""
+    info = dict(info)
+    info['job_dir'] = _to_output_path(info['job_dir'])
+    if info.get('risk_file'):
+        info['risk_file'] = _to_output_path(info['risk_file'])
+    return info
+
+@api_bp.route('/risk_map', methods=['POST'])
+def start_risk_map():
+    """
+    Start (or resume) a background ignition-risk map job for a county.
+    Expects JSON: {"countyKey": str, "stride"?: px, "runsPerPoint"?: int,
+                   "seed"?: int, "maxWorkers"?: int,
+                   "config"?: {"timesteps", "pIgnition", "pSpontaneous"}}
+    Returns 202 with the job info; poll GET /risk_map/<job_id>.
+    """
+    from wildfire_sim.risk_map import start_risk_map_job
+    from wildfire_sim.sca import SimulationConfig
+    try:
+        body = request.get_json(silent=True) or {}
+        county_key = body.get('countyKey')
+        if not county_key:
+            return jsonify({'success': False, 'error': 'Missing parameters', 'message': 'countyKey is required.'}), 400
+
+        try:
+            options = {
+                'stride': int(body['stride']) if body.get('stride') is not None else None,
+                'runs_per_point': int(body['runsPerPoint']) if body.get('runsPerPoint') is not None else None,
+                'seed': int(body.get('seed') or 0),
+                'max_workers': int(body['maxWorkers']) if body.get('maxWorkers') is not None else None,
+            }
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'Invalid parameter format', 'message': 'stride, runsPerPoint, seed and maxWorkers must be integers.'}), 400
+        if any(options[k] is not None and options[k] < 1 for k in ('stride', 'runs_per_point', 'max_workers')):
+            return jsonify({'success': False, 'error': 'Invalid parameter format', 'message': 'stride, runsPerPoint and maxWorkers must be positive.'}), 400
+        try:
+            options['config'] = SimulationConfig.from_params(body.get('config') or {})
+        except (AttributeError, ValueError) as e:
+            return jsonify({'success': False, 'error': 'Invalid parameter format', 'message': f'Invalid config: {e}'}), 400
+
+        info = start_risk_map_job(county_key, **options)
+        return jsonify({"success": True, "job": _risk_job_response(info)}), 202
+
+    except FileNotFoundError as e:
+        logger.error(f"Risk map job failed to start: File not found. {e}", exc_info=True)
+        return jsonify({'success': False, 'error': 'File not found', 'message': str(e)}), 404
+    except Exception as e:
+        logger.error("Risk map job failed to start", exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error while starting risk map job',
+            'message': str(e),
+            'traceback': traceback.format_exc()
+        }), 500
+
+@api_bp.route('/risk_map/<job_id>', methods=['GET'])
+def risk_map_status(job_id):
+    """Progress of a risk map job; includes risk_file once completed."""
+    from wildfire_sim.risk_map import get_risk_map_job
+    info = get_risk_map_job(job_id)
+    if info is None:
+        return jsonify({'success': False, 'error': 'Not found', 'message': f'No risk map job {job_id}.'}), 404
+    return jsonify({"success": True, "job": _risk_job_response(info)})
+
+@api_bp.route('/runs', methods=['GET'])
+def list_runs():
+    """
+    List catalogued simulation runs, newest first.
+    Query params (all optional):
+        countyKey: only runs of this county
+        bbox: west,south,east,north (WGS84); only runs whose extent intersects it
+        limit: max runs (default 50)
+    Example:
+        /runs?countyKey=Door_WI&limit=10
+        /runs?bbox=-87.5,44.8,-87.0,45.3
+    """
+    try:
+        bbox = request.args.get('bbox')
+        if bbox:
+            bbox = tuple(float(v) for v in bbox.split(','))
+            if len(bbox) != 4:
+                raise ValueError("bbox must be west,south,east,north")
+        limit = int(request.args.get('limit', 50))
+        if limit < 1:
+            raise ValueError("limit must be positive")
+    except ValueError as e:
+        return jsonify({'success': False, 'error': 'Invalid parameters', 'message': str(e)}), 400
+
+    try:
+        runs = run_catalog.find_runs(county_key=request.args.get('countyKey'), bbox=bbox, limit=limit)
+    except Exception as e:
+        logger.error(f"Failed to query run catalog: {e}", exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': 'Run catalog query failed',
+            'message': str(e),
+            'traceback': traceback.format_exc()
+        }), 500
+
+    for run in runs:
+        run['output_dir'] = f"wildfire_output/{run['run_key']}"
+    return jsonify({"success": True, "runs": runs})
+
+@api_bp.route('/counties', methods=['GET'])
+def lookup_counties():
+    """
+    Look up counties in the local county index (no Earth Engine call).
+    Query params (one of):
+        lat, lon: the county containing the point
+        bbox: west,south,east,north; counties intersecting it
+        countyKey: a county key (Dane_WI) or 5-digit FIPS code
+        state: every county of a state (abbreviation or FIPS)
+    Add geometry=1 to include each county's GeoJSON geometry.
+    Example:
+        /counties?lat=43.07&lon=-89.4
+    """
+    from utils.county_index import get_index as get_county_index
+    index = get_county_index()
+    try:
+        if request.args.get('lat') is not None and request.args.get('lon') is not None:
+            record = index.at(float(request.args['lon']), float(request.args['lat']))
+            counties = [record] if record else []
+        elif request.args.get('bbox'):
+            bbox = tuple(float(v) for v in request.args['bbox'].split(','))
+            if len(bbox) != 4:
+                raise ValueError("bbox must be west,south,east,north")
+            counties = index.intersecting(*bbox)
+        elif request.args.get('countyKey'):
+            record = index.get(request.args['countyKey'])
+            counties = [record] if record else []
+        elif request.args.get('state'):
+            counties = index.in_state(request.args['state'])
+        else:
+            raise ValueError("Provide lat and lon, bbox, countyKey or state")
+    except ValueError as e:
+        return jsonify({'success': False, 'error': 'Invalid parameters', 'message': str(e)}), 400
+
+    if _bool_arg('geometry'):
+        for county in counties:
+            county['geometry'] = index.geometry(county['fips'])
+    return jsonify({"success": True, "counties": counties})
+
+@api_bp.route('/simulation_frames/<path:output_dir>', methods=['GET'])
+def serve_simulation_frames(output_dir):
+    """
+    Serve every frame of a run as one multi-band GeoTIFF (band i+1 = timestep i).
+    Example:
+        /simulation_frames/wildfire_output/sim_run_Door_WI_20251121_120635
+    The frame list, bounds and per-frame stats are in <output_dir>/manifest.json.
+    """
+    from wildfire_sim.frame_bundle import get_bundle
+    run_dir = _from_output_path(output_dir)
+    if run_dir is None:
+        logger.warning(f"Attempted access outside wildfire_output: {output_dir}")
+        abort(403)
+    run_catalog.touch(run_dir)
+    try:
+        bundle_path = get_bundle(run_dir)
+    except FileNotFoundError as e:
+        logger.warning(f"No frame manifest for {output_dir}: {e}")
+        return jsonify({'success': False, 'error': 'Not found', 'message': str(e)}), 404
+    except Exception as e:
+        logger.error(f"Failed to build frame bundle for {output_dir}: {e}", exc_info=True)
+        return jsonify({
+            "error": "Failed to build frame bundle",
+            "message": str(e)
+        }), 500
+
+    directory, filename = os.path.split(bundle_path)
+    logger.info(f"Serving frame bundle: {bundle_path}")
+    return send_from_directory(directory, filename, mimetype='image/tiff')
+
+def _png_response(data, cache_status, cache_control=TILE_CACHE_CONTROL):
+    response = Response(data, mimetype='image/png')
+    response.headers['Cache-Control'] = cache_control
+    response.headers['X-Tile-Cache'] = cache_status
+    return response
+
+@api_bp.route('/tiles/<path:output_dir>/<int:t>/<int:z>/<int:x>/<int:y>.png', methods=['GET'])
+def serve_simulation_tile(output_dir, t, z, x, y):
+    """
+    Serve a Web Mercator XYZ tile of frame t of a run as a paletted PNG
+    (orange = burning, red = burnt, transparent elsewhere).
+    Example:
+        /tiles/wildfire_output/sim_run_Door_WI_20251121_120635/5/12/1043/1480.png
+    """
+    from wildfire_sim.frame_bundle import render_tile
+    from utils.tiles import valid_tile
+    run_dir = _from_output_path(output_dir)
+    if run_dir is None:
+        logger.warning(f"Attempted access outside wildfire_output: {output_dir}")
+        abort(403)
+    if not valid_tile(z, x, y):
+        abort(404)
+
+    run_catalog.touch(run_dir)
+    cache_key = f"runs/{os.path.relpath(run_dir, WILDFIRE_OUTPUT_BASE)}/{t}/{z}/{x}/{y}.png"
+    data = tile_cache.get(cache_key)
+    if data is not None:
+        return _png_response(data, 'HIT')
+
+    try:
+        data = render_tile(run_dir, t, z, x, y)
+    except FileNotFoundError as e:
+        logger.warning(f"Tile not available: {e}")
+        abort(404)
+    except Exception as e:
+        logger.error(f"Failed to render tile {output_dir}/{t}/{z}/{x}/{y}: {e}", exc_info=True)
+        return jsonify({
+            "error": "Failed to render tile",
+            "message": str(e)
+        }), 500
+
+    tile_cache.put(cache_key, data)
+    return _png_response(data, 'MISS')
+
+@api_bp.route('/forest_tiles/<county_key>/<int:z>/<int:x>/<int:y>.png', methods=['GET'])
+def serve_forest_tile(county_key, z, x, y):
+    """
+    Serve a Web Mercator XYZ tile of the county's forest layer, rendered from
+    its local GeoTIFF (green = forest, transparent elsewhere).
+    URLs carrying the raster version (?v=..., see /earthengine/get_layer)
+    are cached by browsers indefinitely.
+    Example:
+        /forest_tiles/Door_WI/11/520/740.png?v=1732200000000000000
+    """
+    from wildfire_sim import forest_tiles
+    from utils.tiles import valid_tile
+    if not valid_tile(z, x, y):
+        abort(404)
+
+    try:
+        source_path, version = forest_tiles.tile_source(county_key)
+    except FileNotFoundError as e:
+        logger.warning(f"No local forest raster: {e}")
+        abort(404)
+    except Exception as e:
+        logger.error(f"Failed to prepare forest tiles for {county_key}: {e}", exc_info=True)
+        return jsonify({
+            "error": "Failed to prepare forest tiles",
+            "message": str(e)
+        }), 500
+
+    cache_control = TILE_CACHE_CONTROL if request.args.get('v') == version else 'no-cache'
+    source_name = os.path.splitext(os.path.basename(source_path))[0]
+    cache_key = f"forest/{source_name}/{z}/{x}/{y}.png"
+    data = tile_cache.get(cache_key)
+    if data is not None:
+        return _png_response(data, 'HIT', cache_control)
+
+    try:
+        data, _ = forest_tiles.render_tile(county_key, z, x, y)
+    except FileNotFoundError as e:
+        logger.warning(f"No local forest raster: {e}")
+        abort(404)
+    except Exception as e:
+        logger.error(f"Failed to render forest tile {county_key}/{z}/{x}/{y}: {e}", exc_info=True)
+        return jsonify({
+            "error": "Failed to render tile",
+            "message": str(e)
+        }), 500
+
+    tile_cache.put(cache_key, data)
+    return _png_response(data, 'MISS', cache_control)
+
 # serve raster geotiff files for wildfire simulation
 @api_bp.route('/wildfire_output/<path:subpath>', methods=['GET'])
 def serve_wildfire_output(subpath):
@@ -153,6 +733,7 @@ def serve_wildfire_output(subpath):
         # Extract parent directory and filename for send_from_directory
         directory, filename = os.path.split(full_path)
         logger.info(f"Serving wildfire output file: {full_path}")
+        run_catalog.touch(directory)
 
         return send_from_directory(directory, filename)
     except Exception as e:
@@ -166,8 +747,13 @@ def serve_wildfire_output(subpath):
 # --- CENTRAL REGISTRATION FUNCTION ---
 def register_routes(app):
     """Registers all API blueprints with the Flask app."""
-    from earthengine.routes import gee_bp
+    from api.metrics import metrics_bp, init_request_metrics
     # this apparently avoids circular import issues
     # Register the main API blueprint
     app.register_blueprint(api_bp, url_prefix=API_PREFIX)
-    app.register_blueprint(gee_bp, url_prefix=GEE_PREFIX)
\ No newline at end of file
+    if GEE_ENABLED:
+        from earthengine.routes import gee_bp
+        app.register_blueprint(gee_bp, url_prefix=GEE_PREFIX)
+    # Prometheus scrape endpoint at /metrics (unprefixed, as scrapers expect)
+    app.register_blueprint(metrics_bp)
+    init_request_metrics(app)
\ No newline at end of file
@@ -5,8 +5,18 @@ Entry point for the Wildfire Simulation backend API.
 
 This lightweight Flask app exposes a single route:
     POST /api/simulate  → runs wildfire simulation based on ignition point.
+
+Startup is kept fast: simulation, raster and Earth Engine modules are
+imported on first use, and Earth Engine is initialised according to
+GEE_INIT_MODE (background by default). WILDFIRE_ENABLE_GEE=0 starts a
+simulation-only worker that never imports or initialises Earth Engine.
+Import / ready / GEE init timings are logged and reported by /api/health.
 """
 
+import time
+
+_IMPORT_START = time.perf_counter()
+
 from flask import Flask
 from flask_cors import CORS
 import logging
@@ -14,9 +24,10 @@ import logging
 from api.routes import register_routes
 from api.errors import register_error_handlers
 from utils.logger import configure_logging
-from config import DEFAULT_HOST, DEFAULT_PORT, DEBUG_MODE, GEE_PROJECT_NAME, SERVICE_ACCOUNT_JSON_PATH
+from utils.metrics import APP_STARTUP_SECONDS
+from config import DEFAULT_HOST, DEFAULT_PORT, DEBUG_MODE, GEE_ENABLED, GEE_INIT_MODE
 
-from earthengine.service import initialize_gee
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_START
 
 
 def create_app():
@@ -32,24 +43,44 @@ def create_app():
     configure_logging()
     logger = logging.getLogger(__name__)
     logger.info("Starting Backend...")
-    
-    # Authenticate and initialize GEE on startup
-    logger.info("Initializing Google Earth Engine...")
-    try:
-        initialize_gee(project=GEE_PROJECT_NAME, service_account_json_path=SERVICE_ACCOUNT_JSON_PATH)
-        logger.info("Google Earth Engine initialized.")
-    except Exception as e:
-        logger.exception("GEE initialization failed.")
-        raise e
-    
+
+    if GEE_ENABLED:
+        from earthengine.service import start_gee
+        from earthengine import export_poller
+
+        # Eager mode blocks (and fails) here; background / lazy modes do not
+        logger.info(f"Starting Google Earth Engine ({GEE_INIT_MODE})...")
+        try:
+            start_gee(GEE_INIT_MODE)
+        except Exception as e:
+            logger.exception("GEE initialization failed.")
+            raise e
+    else:
+        logger.info("Earth Engine disabled (WILDFIRE_ENABLE_GEE=0): simulation-only worker.")
+
     # Register route blueprints and error handlers
     logger.info("Registering API routes...")
     register_routes(app)
     register_error_handlers(app)
 
+    if GEE_ENABLED:
+        # Track running GEE exports in the background (one worker polls at a time)
+        export_poller.start()
+
+    ready_seconds = time.perf_counter() - _IMPORT_START
+    app.config['STARTUP_TIMINGS'] = {
+        'import_seconds': round(IMPORT_SECONDS, 4),
+        'ready_seconds': round(ready_seconds, 4),
+        'gee_enabled': GEE_ENABLED,
+        'gee_init_mode': GEE_INIT_MODE if GEE_ENABLED else None,
+    }
+    APP_STARTUP_SECONDS.labels(phase="import").set(IMPORT_SECONDS)
+    APP_STARTUP_SECONDS.labels(phase="ready").set(ready_seconds)
+    logger.info(f"Backend ready: imports {IMPORT_SECONDS:.3f}s, ready {ready_seconds:.3f}s.")
+
     return app
 
 
 if __name__ == "__main__":
     app = create_app()
-    app.run(host=DEFAULT_HOST, port=DEFAULT_PORT, debug=DEBUG_MODE)
\ No newline at end of file
+    app.run(host=DEFAULT_HOST, port=DEFAULT_PORT, debug=DEBUG_MODE)
@@ -0,0 +1,371 @@
+"""
+asgi.py
+---------------------------------------------
+ASGI entry point: the API of app.py served from one event loop, so a single
+process can hold hundreds of open export pollers and tile requests.
+
+Requests are dispatched by what they wait on:
+
+    check-status?wait=    long-polls wait on the event loop for the export's
+                          registry entry to change (one registry query per
+                          interval for all waiting requests); the Flask view
+                          then answers
+    simulations           /api/simulate_wildfire[/batch|/extend|/branch] and
+                          /api/ignition_points/query run the Flask app in
+                          ASGI_SIM_PROCESSES spawned worker processes
+    everything else       the Flask app in a pool of ASGI_THREAD_WORKERS
+                          threads (GEE and GCS calls, tiles, file downloads),
+                          streaming response bodies chunk by chunk
+
+The views are those of api/routes.py and earthengine/routes.py, so both entry
+points give the same responses. Unlike app.py, simulations run in separate
+processes: state they share goes through files (run directories are locked
+with utils/locks.py while being extended or branched), and simulation
+metrics are recorded in the simulation processes (scrape /metrics per
+process, as with several workers).
+
+Run from py/ with any ASGI server, e.g.:
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+
+import asyncio
+import io
+import json
+import logging
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import parse_qsl, urlencode
+
+# Only the standard library at import time: simulation worker processes
+# import this module before setting up their own (simulation-only) app
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+# Response bytes read per thread pool hop: smaller responses (JSON, tiles) are
+# read by the call that runs the view, larger ones are streamed in batches
+STREAM_BATCH_BYTES = 64 * 1024
+
+# Flask app of a simulation worker process (see _init_sim_worker)
+_worker_app = None
+
+
+# --- WSGI BRIDGE ---
+
+def _wsgi_environ(scope, body):
+    """WSGI environ for an ASGI HTTP scope, without wsgi.input / wsgi.errors (so it pickles)."""
+    root_path = scope.get("root_path", "")
+    path = scope["path"]
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": root_path.encode("utf-8").decode("latin-1"),
+        "PATH_INFO": path.encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": str(server[0]),
+        "SERVER_PORT": str(server[1] if server[1] is not None else 80),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"] = scope["client"][0]
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value
+        elif name != "CONTENT_LENGTH":
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def _with_input(environ, body):
+    return dict(environ, **{"wsgi.input": io.BytesIO(body), "wsgi.errors": sys.stderr})
+
+
+def _read_batch(chunks, limit=STREAM_BATCH_BYTES):
+    """Body chunks up to about `limit` bytes: (data, finished)."""
+    batch, size = [], 0
+    while size < limit:
+        chunk = next(chunks, _END)
+        if chunk is _END:
+            return b"".join(batch), True
+        batch.append(chunk)
+        size += len(chunk)
+    return b"".join(batch), False
+
+
+def _start_wsgi(wsgi_app, environ, limit=STREAM_BATCH_BYTES):
+    """
+    Call a WSGI app and read the first batch of its body:
+    (status, headers, result, chunks or None if finished, first batch).
+    """
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response["status"], response["headers"] = status, headers
+
+    result = wsgi_app(environ, start_response)
+    chunks = iter(result)
+    try:
+        data, finished = _read_batch(chunks, limit)
+    except BaseException:
+        _close(result)
+        raise
+    if finished:
+        _close(result)
+        chunks = None
+    return response["status"], response["headers"], result, chunks, data
+
+
+def _close(result):
+    if hasattr(result, "close"):
+        result.close()
+
+
+def _response_start(status, headers):
+    return {
+        "type": "http.response.start",
+        "status": int(status.split(" ", 1)[0]),
+        "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers],
+    }
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+
+# --- SIMULATION WORKER PROCESSES ---
+
+def _init_sim_worker():
+    """Simulation process: a simulation-only Flask app (no Earth Engine, no export poller)."""
+    global _worker_app
+    os.environ["WILDFIRE_ENABLE_GEE"] = "0"
+    from app import create_app
+    _worker_app = create_app()
+
+
+def _run_in_sim_worker(environ, body):
+    """Serve one request with the worker's Flask app: (status, headers, body bytes)."""
+    status, headers, _, _, data = _start_wsgi(_worker_app, _with_input(environ, body), limit=float("inf"))
+    return status, headers, data
+
+
+# --- LONG POLLING ---
+
+class RegistryWatch:
+    """
+    Waits on export registry entries for every long-polling request of the
+    event loop with one registry query per interval, however many wait.
+    """
+
+    def __init__(self, run_in_thread, interval=0.5):
+        self._run_in_thread = run_in_thread
+        self._interval = interval
+        self._waiters = set()  # (filename_key, status, future)
+        self._task = None
+
+    async def wait_for_change(self, filename_key, status, timeout):
+        """The entry once its status differs from `status`, or None after `timeout` seconds."""
+        future = asyncio.get_running_loop().create_future()
+        waiter = (filename_key, status, future)
+        self._waiters.add(waiter)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._watch())
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self._waiters.discard(waiter)
+
+    async def _watch(self):
+        from earthengine import export_registry
+        while self._waiters:
+            await asyncio.sleep(self._interval)
+            keys = {key for key, _, _ in self._waiters}
+            if not keys:
+                break
+            try:
+                entries = await self._run_in_thread(export_registry.get_many, keys)
+            except Exception as e:
+                logger.warning(f"Export registry watch failed: {e}")
+                continue
+            for key, status, future in list(self._waiters):
+                entry = entries.get(key)
+                if not future.done() and (entry is None or entry["status"] != status):
+                    future.set_result(entry)
+
+
+# --- ASGI APPLICATION ---
+
+class AsgiApp:
+    def __init__(self, wsgi_app=None, thread_workers=None, sim_processes=None):
+        """
+        Args:
+            wsgi_app: The Flask app to serve (default: app.create_app(), built at startup).
+            thread_workers (int, optional): Default ASGI_THREAD_WORKERS.
+            sim_processes (int, optional): Default ASGI_SIM_PROCESSES, else one per CPU.
+        """
+        self.wsgi_app = wsgi_app
+        self._thread_workers = thread_workers
+        self._sim_processes = sim_processes
+        self._threads = None
+        self._sims = None
+        self._watch = None
+        self._started = False
+
+    def _startup(self):
+        if self._started:
+            return
+        from config import API_PREFIX, GEE_ENABLED, GEE_PREFIX, ASGI_THREAD_WORKERS, ASGI_SIM_PROCESSES
+
+        if self.wsgi_app is None:
+            from app import create_app
+            self.wsgi_app = create_app()
+        self._thread_workers = self._thread_workers or ASGI_THREAD_WORKERS
+        self._sim_processes = self._sim_processes or ASGI_SIM_PROCESSES or os.cpu_count()
+        self._threads = ThreadPoolExecutor(max_workers=self._thread_workers, thread_name_prefix="asgi")
+        self._sim_prefixes = (f"{API_PREFIX}/simulate_wildfire", f"{API_PREFIX}/ignition_points/query")
+        self._status_prefix = f"{GEE_PREFIX}/check-status/" if GEE_ENABLED else None
+        self._watch = RegistryWatch(self._in_thread)
+        self._started = True
+        logger.info(f"ASGI app ready: {self._thread_workers} I/O threads, "
+                    f"up to {self._sim_processes} simulation processes.")
+
+    def _shutdown(self):
+        if self._sims is not None:
+            self._sims.shutdown(wait=False, cancel_futures=True)
+            self._sims = None
+        if self._threads is not None:
+            self._threads.shutdown(wait=False)
+
+    def _sim_pool(self):
+        if self._sims is None:
+            # Spawned workers: forking a threaded server process is not safe
+            self._sims = ProcessPoolExecutor(max_workers=self._sim_processes,
+                                             mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=_init_sim_worker)
+        return self._sims
+
+    def _in_thread(self, fn, *args):
+        return asyncio.get_running_loop().run_in_executor(self._threads, fn, *args)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return  # no websocket routes
+
+        self._startup()
+        body = await _read_body(receive)
+        environ = _wsgi_environ(scope, body)
+        path = environ["PATH_INFO"]
+        if path.startswith(self._sim_prefixes):
+            await self._simulate(environ, body, send)
+            return
+        if self._status_prefix and path.startswith(self._status_prefix):
+            environ = await self._await_status_change(environ, path[len(self._status_prefix):])
+        await self._serve(environ, body, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    self._startup()
+                except Exception as e:
+                    logger.exception("ASGI startup failed.")
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self._shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _serve(self, environ, body, send):
+        """Run the Flask app in the thread pool, streaming its response body."""
+        status, headers, result, chunks, data = await self._in_thread(
+            _start_wsgi, self.wsgi_app, _with_input(environ, body))
+        if chunks is None:
+            await send(_response_start(status, headers))
+            await send({"type": "http.response.body", "body": data, "more_body": False})
+            return
+        try:
+            await send(_response_start(status, headers))
+            finished = False
+            while not finished:
+                await send({"type": "http.response.body", "body": data, "more_body": True})
+                data, finished = await self._in_thread(_read_batch, chunks)
+            await send({"type": "http.response.body", "body": data, "more_body": False})
+        finally:
+            await self._in_thread(_close, result)
+
+    async def _simulate(self, environ, body, send):
+        """Run the Flask app in a simulation process."""
+        loop = asyncio.get_running_loop()
+        try:
+            status, headers, data = await loop.run_in_executor(self._sim_pool(), _run_in_sim_worker, environ, body)
+        except BrokenProcessPool as e:
+            # A worker died (e.g. out of memory); start a fresh pool for the next request
+            logger.error(f"Simulation worker process failed: {e}")
+            self._sims = None
+            status, headers = "500 INTERNAL SERVER ERROR", [("Content-Type", "application/json")]
+            data = json.dumps({
+                'success': False,
+                'error': 'Simulation worker failed',
+                'message': str(e) or 'A simulation worker process terminated abruptly.'
+            }).encode()
+        await send(_response_start(status, headers))
+        await send({"type": "http.response.body", "body": data, "more_body": False})
+
+    async def _await_status_change(self, environ, task_id):
+        """
+        check-status?wait=: wait for the export's registry entry to change on
+        the event loop rather than in a thread, then pass the request on
+        without `wait` so the Flask view answers at once.
+        """
+        from config import EXPORT_STATUS_MAX_WAIT_SECONDS
+        from earthengine import export_registry, export_poller
+
+        params = parse_qsl(environ["QUERY_STRING"], keep_blank_values=True)
+        args = dict(params)
+        try:
+            wait = min(float(args.get("wait", 0)), EXPORT_STATUS_MAX_WAIT_SECONDS)
+        except ValueError:
+            wait = 0
+        filename_key = args.get("filename_key")
+        if wait <= 0 or not filename_key:
+            return environ
+
+        environ = dict(environ, QUERY_STRING=urlencode([(k, v) for k, v in params if k != "wait"]))
+        entry = await self._in_thread(export_registry.get, filename_key)
+        # Same conditions as the view's registry path; otherwise it asks GEE itself
+        if (export_poller.POLLER.is_running() and entry is not None and entry["task_id"] == task_id
+                and entry["status"] in export_registry.IN_FLIGHT):
+            await self._watch.wait_for_change(filename_key, entry["status"], wait)
+        return environ
+
+
+app = AsgiApp()
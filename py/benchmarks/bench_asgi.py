@@ -0,0 +1,268 @@
+"""
+bench_asgi.py
+---------------------------------------------
+Offline benchmark of the ASGI entry point (asgi.py) against the Flask app
+served from a fixed pool of threads, as a threaded WSGI worker would.
+
+Requests are driven in-process (no server or sockets) against the fake `ee`
+and temporary data directories:
+
+    - pollers: many clients long-polling check-status?wait= on a few running
+               exports, which the (scripted) export poller completes after a
+               delay, plus /api/health probes sent while they wait. With a
+               thread per waiting poll the WSGI worker answers the probes only
+               once the exports finish; the ASGI app waits on its loop.
+    - tiles:   concurrent forest tile requests for a synthetic county raster
+               (first pass renders, second pass hits the tile cache)
+
+    python py/benchmarks/bench_asgi.py
+    python py/benchmarks/bench_asgi.py --pollers 500 --threads 16 --output asgi.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# The fake must be selected before config / earthengine.service are imported;
+# export completion is scripted below instead of run by the export poller
+os.environ["WILDFIRE_FAKE_EE"] = "1"
+os.environ["WILDFIRE_EXPORT_POLLER"] = "0"
+
+PY_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if PY_DIR not in sys.path:
+    sys.path.insert(0, PY_DIR)
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+import config
+
+COUNTY_KEY = "Bench_WI"
+# Synthetic county raster: 0.3 x 0.3 degrees north-west of (-89.5, 43.0)
+WEST, NORTH, RES, SIZE = -89.5, 43.3, 0.0003, 1000
+
+
+def use_workdir(workdir):
+    """Point every data directory at workdir (before the app modules are imported)."""
+    config.GEOTIFF_DIR = os.path.join(workdir, "geotiff")
+    config.TILE_CACHE_DIR = os.path.join(workdir, "tiles")
+    config.FOREST_TILE_SOURCE_DIR = os.path.join(workdir, "forest_sources")
+    config.EXPORT_REGISTRY_PATH = os.path.join(workdir, "export_registry.sqlite3")
+    config.RUN_CATALOG_PATH = os.path.join(workdir, "run_catalog.sqlite3")
+    config.PREFETCH_JOB_DIR = os.path.join(workdir, "prefetch")
+    config.GEE_CACHE_DIR = os.path.join(workdir, "ee")
+    os.makedirs(config.GEOTIFF_DIR)
+
+
+def write_raster():
+    rng = np.random.default_rng(0)
+    data = (rng.random((SIZE, SIZE)) < 0.6).astype("uint8")
+    path = os.path.join(config.GEOTIFF_DIR, f"ForestCover_{COUNTY_KEY}_2024.tif")
+    with rasterio.open(path, "w", driver="GTiff", dtype="uint8", count=1, width=SIZE, height=SIZE,
+                       crs="EPSG:4326", transform=from_origin(WEST, NORTH, RES, RES)) as dst:
+        dst.write(data, 1)
+
+
+def tile_paths(z):
+    """XYZ tiles of zoom z covering the synthetic raster."""
+    def tile_xy(lon, lat):
+        n = 2 ** z
+        x = int((lon + 180) / 360 * n)
+        y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+        return x, y
+
+    x0, y0 = tile_xy(WEST, NORTH)
+    x1, y1 = tile_xy(WEST + SIZE * RES, NORTH - SIZE * RES)
+    return [f"{config.API_PREFIX}/forest_tiles/{COUNTY_KEY}/{z}/{x}/{y}.png"
+            for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+
+# --- REQUEST DRIVERS ---
+
+async def asgi_get(app, path, query=""):
+    """One GET through the ASGI app: (status, body bytes)."""
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": query.encode(),
+        "headers": [(b"host", b"localhost:5000")], "server": ("localhost", 5000), "client": ("127.0.0.1", 1),
+    }
+    received = False
+    messages = []
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    return messages[0]["status"], b"".join(m.get("body", b"") for m in messages[1:])
+
+
+def run_asgi(app, requests):
+    """
+    Issue all (path, query) requests at once; per request (status, body,
+    seconds from issuing the batch to its response).
+    """
+    start = time.perf_counter()
+
+    async def timed(path, query):
+        status, body = await asgi_get(app, path, query)
+        return status, body, time.perf_counter() - start
+
+    async def main():
+        return await asyncio.gather(*(timed(p, q) for p, q in requests))
+
+    return asyncio.run(main())
+
+
+def run_wsgi(flask_app, requests, threads):
+    """Issue all requests through the Flask app from a pool of `threads` threads (timed as run_asgi)."""
+    client = flask_app.test_client()
+    start = time.perf_counter()
+
+    def timed(request):
+        path, query = request
+        response = client.get(f"{path}?{query}" if query else path)
+        return response.status_code, response.data, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(timed, requests))
+
+
+class ThreadPeak:
+    """Samples the number of live threads while a scenario runs."""
+
+    def __init__(self):
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(0.01):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def summarize(name, results, wall, peak_threads, ok, probes=0):
+    """Latency summary; the last `probes` results are reported separately as probe_p95_ms."""
+    probe_latencies = np.array([r[2] for r in results[len(results) - probes:]]) if probes else None
+    results = results[:len(results) - probes]
+    latencies = np.array([r[2] for r in results])
+    return {
+        "scenario": name,
+        "requests": len(results),
+        "ok": sum(1 for r in results if ok(r)),
+        "wall_s": round(wall, 3),
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 1),
+        "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 1),
+        "max_ms": round(float(latencies.max()) * 1000, 1),
+        "probe_p95_ms": round(float(np.percentile(probe_latencies, 95)) * 1000, 1) if probes else None,
+        "peak_threads": peak_threads,
+    }
+
+
+def measure(name, run, ok, probes=0):
+    with ThreadPeak() as threads:
+        start = time.perf_counter()
+        results = run()
+        wall = time.perf_counter() - start
+    return summarize(name, results, wall, threads.peak, ok, probes)
+
+
+# --- SCENARIOS ---
+
+def pollers(name, run, n_pollers, n_probes, n_exports, complete_after, wait):
+    from earthengine import export_registry
+
+    keys = [f"bench_{name}_{i}" for i in range(n_exports)]
+    for i, key in enumerate(keys):
+        export_registry.claim(key)
+        export_registry.set_task(key, f"TASK_{name}_{i}")
+    timer = threading.Timer(complete_after, lambda: [
+        export_registry.complete(key, os.path.join(config.GEOTIFF_DIR, f"{key}.tif")) for key in keys])
+    requests = [(f"{config.GEE_PREFIX}/check-status/TASK_{name}_{i % n_exports}",
+                 f"filename_key={keys[i % n_exports]}&wait={wait}") for i in range(n_pollers)]
+    requests += [(f"{config.API_PREFIX}/health", "")] * n_probes
+    timer.start()
+    try:
+        return measure(name, lambda: run(requests), lambda r: json.loads(r[1]).get("status") == "COMPLETED",
+                       probes=n_probes)
+    finally:
+        timer.cancel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ASGI entry point against a threaded WSGI worker.")
+    parser.add_argument("--pollers", type=int, default=300, help="Concurrent check-status long polls.")
+    parser.add_argument("--probes", type=int, default=20, help="Health requests sent while the pollers wait.")
+    parser.add_argument("--exports", type=int, default=4, help="Exports the pollers wait on.")
+    parser.add_argument("--complete-after", type=float, default=2.0, help="Seconds until the exports complete.")
+    parser.add_argument("--wait", type=float, default=10, help="check-status ?wait= seconds.")
+    parser.add_argument("--threads", type=int, default=16, help="Threads of the WSGI worker.")
+    parser.add_argument("--zoom", type=int, default=14, help="Zoom level of the tile scenario.")
+    parser.add_argument("--output", help="Optional JSON output path.")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="asgi_bench_")
+    results = []
+    try:
+        use_workdir(workdir)
+        write_raster()
+
+        import asgi
+        from app import create_app
+        from earthengine import export_poller
+
+        flask_app = create_app()
+        # Stands in for the poller: the views answer from the registry
+        export_poller.POLLER.is_running = lambda: True
+        app = asgi.AsgiApp(flask_app, sim_processes=1)
+
+        results.append(pollers("pollers_wsgi", lambda reqs: run_wsgi(flask_app, reqs, args.threads),
+                               args.pollers, args.probes, args.exports, args.complete_after, args.wait))
+        results.append(pollers("pollers_asgi", lambda reqs: run_asgi(app, reqs),
+                               args.pollers, args.probes, args.exports, args.complete_after, args.wait))
+
+        paths = [(p, "") for p in tile_paths(args.zoom)]
+        png_ok = lambda r: r[0] == 200
+        results.append(measure("tiles_wsgi", lambda: run_wsgi(flask_app, paths, args.threads), png_ok))
+        shutil.rmtree(config.TILE_CACHE_DIR, ignore_errors=True)
+        results.append(measure("tiles_asgi", lambda: run_asgi(app, paths), png_ok))
+        results.append(measure("tiles_asgi_cached", lambda: run_asgi(app, paths), png_ok))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    cols = ("scenario", "requests", "ok", "wall_s", "p50_ms", "p95_ms", "max_ms", "probe_p95_ms", "peak_threads")
+    print(" ".join(f"{c:>16}" for c in cols))
+    for r in results:
+        print(" ".join(f"{str(r[c]):>16}" for c in cols))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+bench_gee_cache.py
+---------------------------------------------
+Offline benchmark of the Earth Engine map-ID cache (earthengine/cache.py).
+
+Runs get_clipped_layer_url against the fake `ee` (earthengine/fake_ee.py)
+with a configurable getMapId latency and reports, per scenario, cache hit
+rate, request latency percentiles and the number of remote calls made:
+
+    - uncached: every request calls getMapId
+    - cached:   requests over a few county geometries (skewed, like real traffic)
+    - stale:    short refresh interval; stale entries are served while a
+                background refresh runs
+    - worker:   a second cache instance (another worker) sharing the directory
+
+    python py/benchmarks/bench_gee_cache.py
+    python py/benchmarks/bench_gee_cache.py --requests 500 --latency 0.2 --output gee.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# The fake must be selected before config / earthengine.service are imported
+os.environ["WILDFIRE_FAKE_EE"] = "1"
+
+PY_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if PY_DIR not in sys.path:
+    sys.path.insert(0, PY_DIR)
+
+import numpy as np
+
+from earthengine import fake_ee, service
+from earthengine.cache import TTLCache
+from utils.metrics import GEE_CACHE_REQUESTS
+
+
+def county_geometries(n):
+    """n distinct county-like boxes."""
+    geometries = []
+    for i in range(n):
+        west, south = -90.0 + i * 0.5, 44.0
+        ring = [[west, south], [west + 0.4, south], [west + 0.4, south + 0.4], [west, south + 0.4], [west, south]]
+        geometries.append({"type": "Polygon", "coordinates": [ring]})
+    return geometries
+
+
+def run_requests(geometries, n_requests, seed=0, spacing=0.0):
+    """Issue n_requests get_clipped_layer_url calls with Zipf-like geometry popularity."""
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, len(geometries) + 1)
+    picks = rng.choice(len(geometries), size=n_requests, p=weights / weights.sum())
+    latencies = []
+    for i in picks:
+        start = time.perf_counter()
+        service.get_clipped_layer_url(geometries[i])
+        latencies.append(time.perf_counter() - start)
+        if spacing:
+            time.sleep(spacing)
+    return np.array(latencies)
+
+
+def _counts(cache_name):
+    return {r: int(GEE_CACHE_REQUESTS.labels(cache_name, r).get()) for r in ("hit", "stale", "miss")}
+
+
+def summarize(name, latencies, calls, counts):
+    lookups = sum(counts.values())
+    served_from_cache = counts["hit"] + counts["stale"]
+    return {
+        "scenario": name,
+        "requests": len(latencies),
+        "hit_rate": round(served_from_cache / lookups, 4) if lookups else None,
+        **counts,
+        "getMapId_calls": calls,
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 3),
+        "max_ms": round(float(latencies.max()) * 1000, 3),
+        "total_s": round(float(latencies.sum()), 3),
+    }
+
+
+def scenario(name, cache, geometries, n_requests, spacing=0.0, settle=0.0):
+    service.MAP_ID_CACHE = cache
+    fake_ee.reset_stats()
+    before = _counts(cache.name)
+    latencies = run_requests(geometries, n_requests, spacing=spacing)
+    if settle:
+        time.sleep(settle)  # let background refreshes finish before counting calls
+    counts = {r: n - before[r] for r, n in _counts(cache.name).items()}
+    return summarize(name, latencies, fake_ee.CALLS["getMapId"], counts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the GEE map-ID cache against the fake ee.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--counties", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.1, help="Fake getMapId latency in seconds.")
+    parser.add_argument("--output", help="Optional JSON output path.")
+    args = parser.parse_args(argv)
+
+    fake_ee.configure(latency={"getMapId": args.latency})
+    geometries = county_geometries(args.counties)
+    workdir = tempfile.mkdtemp(prefix="gee_cache_bench_")
+    results = []
+    try:
+        # Baseline: no cache at all
+        fake_ee.reset_stats()
+        start_calls = []
+        for g in geometries[:1] * min(args.requests, 20):
+            t = time.perf_counter()
+            service._forest_mask_tile_url(g)
+            start_calls.append(time.perf_counter() - t)
+        results.append(summarize("uncached", np.array(start_calls), fake_ee.CALLS["getMapId"],
+                                 {"hit": 0, "stale": 0, "miss": len(start_calls)}))
+
+        shared_dir = os.path.join(workdir, "shared")
+        results.append(scenario("cached", TTLCache("bench_cached", directory=shared_dir),
+                                geometries, args.requests))
+        # Same cache name and directory, empty memory: another worker process
+        results.append(scenario("worker", TTLCache("bench_cached", directory=shared_dir),
+                                geometries, args.requests))
+
+        # Refresh after ~a quarter of the run; entries stay servable for the whole run
+        spacing = 0.002
+        refresh_after = max(args.requests * spacing / 4, 0.05)
+        stale_cache = TTLCache("bench_stale", ttl=3600, refresh_after=refresh_after,
+                               directory=os.path.join(workdir, "stale"))
+        results.append(scenario("stale", stale_cache, geometries, args.requests,
+                                spacing=spacing, settle=args.latency * 2))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    cols = ("scenario", "requests", "hit_rate", "hit", "stale", "miss", "getMapId_calls", "p50_ms", "p95_ms", "max_ms")
+    print(" ".join(f"{c:>14}" for c in cols))
+    for r in results:
+        print(" ".join(f"{str(r[c]):>14}" for c in cols))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"latency": args.latency, "results": results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
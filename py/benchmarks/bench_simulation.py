@@ -0,0 +1,373 @@
+"""
+bench_simulation.py
+---------------------------------------------
+Micro- and macro-benchmarks for the wildfire simulation engines.
+
+Generates synthetic forest GeoTIFFs locally (no GEE / GCS access needed)
+and times:
+    - sca._run_ca_step                      (micro)
+    - sca._save_raster, cropped and full    (micro)
+    - sca.run_geotiff_simulation, crop on/off (macro)
+    - incinerate.run_wildfire_simulation at several NODES values (macro)
+
+Each case reports steps/second, cells/second and peak traced memory.
+Results are written as JSON so runs from different commits can be compared:
+
+    python py/benchmarks/bench_simulation.py
+    python py/benchmarks/bench_simulation.py --quick --output before.json
+    python py/benchmarks/bench_simulation.py --compare before.json after.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+# Make the backend packages (config, wildfire_sim, ...) importable when run as a script
+PY_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if PY_DIR not in sys.path:
+    sys.path.insert(0, PY_DIR)
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from wildfire_sim import kernels
+from wildfire_sim import sca
+
+logger = logging.getLogger(__name__)
+
+RESULTS_DIR = os.path.join(PY_DIR, "benchmarks", "results")
+
+# Synthetic rasters are written in EPSG:4326 so (lat, lon) indexing works directly
+BENCH_ORIGIN_LON = -90.0
+BENCH_ORIGIN_LAT = 45.0
+BENCH_PIXEL_DEG = 0.0003  # ~30 m
+
+FULL_SIZES = [256, 1024, 2048]
+FULL_DENSITIES = [0.3, 0.6, 0.9]
+FULL_NODES = [20 * 20, 30 * 30, 50 * 50]
+
+QUICK_SIZES = [256, 512]
+QUICK_DENSITIES = [0.6]
+QUICK_NODES = [10 * 10, 20 * 20]
+
+
+# --- SYNTHETIC DATA ---
+
+def make_forest_grid(size, density, seed=0):
+    """Random forest/non-forest grid with the centre pixel forced to FOREST."""
+    rng = np.random.default_rng(seed)
+    grid = np.where(rng.random((size, size)) < density, sca.FOREST, sca.NO_FOREST).astype(np.uint8)
+    grid[size // 2, size // 2] = sca.FOREST
+    return grid
+
+
+def write_forest_geotiff(directory, county_key, grid):
+    """Write `grid` as ForestCover_<county_key>_2024.tif, the name sca.py searches for."""
+    path = os.path.join(directory, f"ForestCover_{county_key}_2024.tif")
+    meta = {
+        "driver": "GTiff",
+        "dtype": "uint8",
+        "count": 1,
+        "height": grid.shape[0],
+        "width": grid.shape[1],
+        "crs": "EPSG:4326",
+        "transform": from_origin(BENCH_ORIGIN_LON, BENCH_ORIGIN_LAT, BENCH_PIXEL_DEG, BENCH_PIXEL_DEG),
+    }
+    with rasterio.open(path, "w", **meta) as dst:
+        dst.write(grid, 1)
+    return path, meta
+
+
+def center_lat_lon(size):
+    """Geographic coordinates of the centre pixel of a synthetic raster."""
+    lon = BENCH_ORIGIN_LON + (size // 2 + 0.5) * BENCH_PIXEL_DEG
+    lat = BENCH_ORIGIN_LAT - (size // 2 + 0.5) * BENCH_PIXEL_DEG
+    return lat, lon
+
+
+def write_forest_cover_csv(path, rows, seed=0):
+    """Synthetic stand-in for covtype.csv with the columns incinerate.py reads."""
+    rng = np.random.default_rng(seed)
+    elevation = rng.integers(1800, 3800, rows)
+    slope = rng.integers(0, 45, rows)
+    aspect = rng.integers(0, 360, rows)
+    with open(path, "w") as f:
+        f.write("Elevation,Aspect,Slope\n")
+        for e, a, s in zip(elevation, aspect, slope):
+            f.write(f"{e},{a},{s}\n")
+    return path
+
+
+# --- MEASUREMENT ---
+
+def measure(fn, repeat=1):
+    """
+    Run fn() `repeat` times untraced for timing, then once under tracemalloc
+    for peak memory. Returns (best_seconds, peak_bytes, last_result).
+    """
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak, result
+
+
+def record(name, group, seconds, peak_bytes, steps, cells_per_step, **params):
+    """Build one result row."""
+    return {
+        "name": name,
+        "group": group,
+        "params": params,
+        "seconds": round(seconds, 6),
+        "steps": steps,
+        "steps_per_second": round(steps / seconds, 3) if seconds > 0 else None,
+        "cells_per_second": round(steps * cells_per_step / seconds, 1) if seconds > 0 else None,
+        "peak_memory_bytes": int(peak_bytes),
+    }
+
+
+# --- BENCHMARK CASES ---
+
+def bench_ca_step(sizes, densities, steps, repeat):
+    results = []
+    for size in sizes:
+        for density in densities:
+            base = make_forest_grid(size, density)
+            # Pre-burn a disk so the step sees a realistic fire front
+            yy, xx = np.ogrid[:size, :size]
+            disk = (yy - size // 2) ** 2 + (xx - size // 2) ** 2 <= (size // 8) ** 2
+            ring = disk & ~((yy - size // 2) ** 2 + (xx - size // 2) ** 2 <= (size // 8 - 1) ** 2)
+            base[disk & (base == sca.FOREST)] = sca.BURNT
+            base[ring] = sca.BURNING
+
+            def run():
+                grid = base
+                rng = np.random.default_rng(0)
+                for _ in range(steps):
+                    grid = sca._run_ca_step(grid, sca.P_IGNITION, sca.P_SPONTANEOUS, rng)
+                return grid
+
+            seconds, peak, _ = measure(run, repeat)
+            results.append(record(f"ca_step[{size}x{size},d={density}]", "ca_step",
+                                  seconds, peak, steps, size * size, size=size, density=density))
+            logger.info(f"ca_step {size}x{size} d={density}: {seconds:.4f}s for {steps} steps")
+    return results
+
+
+def bench_save_raster(workdir, sizes, frames, repeat):
+    results = []
+    for size in sizes:
+        grid = make_forest_grid(size, 0.6)
+        _, meta = write_forest_geotiff(workdir, f"SaveBench_{size}", grid)
+        out_dir = os.path.join(workdir, f"save_{size}")
+        os.makedirs(out_dir, exist_ok=True)
+        c = size // 2
+        # A 200x200 window, the size of a mid-sized fire's frames
+        b = min(100, c)
+        crop = rasterio.windows.Window(col_off=c - b, row_off=c - b, width=2 * b, height=2 * b)
+
+        for label, window, cells in (("full", None, size * size), ("cropped", crop, 4 * b * b)):
+            def run(window=window):
+                for t in range(frames):
+                    sca._save_raster(grid, meta.copy(), t, out_dir, crop_window=window)
+
+            seconds, peak, _ = measure(run, repeat)
+            results.append(record(f"save_raster[{size}x{size},{label}]", "save_raster",
+                                  seconds, peak, frames, cells, size=size, crop=label))
+            logger.info(f"save_raster {size}x{size} {label}: {seconds:.4f}s for {frames} frames")
+    return results
+
+
+def bench_geotiff_simulation(workdir, sizes, densities, repeat):
+    results = []
+    geotiff_dir = os.path.join(workdir, "geotiff")
+    output_dir = os.path.join(workdir, "wildfire_output")
+    os.makedirs(geotiff_dir, exist_ok=True)
+    os.makedirs(output_dir, exist_ok=True)
+
+    saved = (sca.GEOTIFF_DIR, sca.WILDFIRE_OUTPUT_BASE, sca.ENABLE_CROP)
+    sca.GEOTIFF_DIR = geotiff_dir
+    sca.WILDFIRE_OUTPUT_BASE = output_dir
+    try:
+        for size in sizes:
+            for density in densities:
+                county_key = f"Bench_{size}_{int(density * 100)}"
+                write_forest_geotiff(geotiff_dir, county_key, make_forest_grid(size, density))
+                lat, lon = center_lat_lon(size)
+
+                for crop in (True, False):
+                    sca.ENABLE_CROP = crop
+
+                    def run():
+                        run_dir = sca.run_geotiff_simulation(county_key, lat, lon, seed=0)
+                        n_frames = len([f for f in os.listdir(run_dir) if f.endswith(".tif")])
+                        shutil.rmtree(run_dir, ignore_errors=True)
+                        return n_frames - 1  # frame 0 is the ignition
+
+                    seconds, peak, steps = measure(run, repeat)
+                    label = "crop" if crop else "nocrop"
+                    results.append(record(f"run_geotiff_simulation[{size}x{size},d={density},{label}]",
+                                          "run_geotiff_simulation", seconds, peak, steps, size * size,
+                                          size=size, density=density, crop=crop))
+                    logger.info(f"run_geotiff_simulation {size}x{size} d={density} {label}: {seconds:.4f}s")
+    finally:
+        sca.GEOTIFF_DIR, sca.WILDFIRE_OUTPUT_BASE, sca.ENABLE_CROP = saved
+    return results
+
+
+def bench_incinerate(workdir, nodes_list, timesteps, repeat):
+    # Imported here: incinerate pulls in pandas, networkx and matplotlib
+    from wildfire_sim import incinerate
+
+    results = []
+    csv_path = write_forest_cover_csv(os.path.join(workdir, "covtype_bench.csv"), max(nodes_list))
+    output_dir = os.path.join(workdir, "incinerate_output")
+    os.makedirs(output_dir, exist_ok=True)
+    # Square covering the whole synthetic landscape
+    forest_shape = {"type": "Polygon", "coordinates": [[[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]]}
+
+    saved = (incinerate.CSV_FILE, incinerate.NODES, incinerate.TIMESTEPS, incinerate.WILDFIRE_OUTPUT_BASE)
+    incinerate.CSV_FILE = csv_path
+    incinerate.TIMESTEPS = timesteps
+    incinerate.WILDFIRE_OUTPUT_BASE = output_dir
+    try:
+        for nodes in nodes_list:
+            incinerate.NODES = nodes
+
+            def run():
+                random.seed(0)
+                result = incinerate.run_wildfire_simulation(forest_shape=forest_shape)
+                if not result.get("success"):
+                    raise RuntimeError(f"incinerate failed: {result.get('error')}")
+                shutil.rmtree(result["output_dir"], ignore_errors=True)
+                return max(result["final_timestep"], 1)
+
+            seconds, peak, steps = measure(run, repeat)
+            results.append(record(f"incinerate[nodes={nodes}]", "incinerate",
+                                  seconds, peak, steps, nodes, nodes=nodes))
+            logger.info(f"incinerate NODES={nodes}: {seconds:.4f}s for {steps} steps")
+    finally:
+        incinerate.CSV_FILE, incinerate.NODES, incinerate.TIMESTEPS, incinerate.WILDFIRE_OUTPUT_BASE = saved
+    return results
+
+
+# --- REPORTING ---
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=PY_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def environment_info():
+    return {
+        "git_commit": _git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "rasterio": rasterio.__version__,
+        "kernel_backend": kernels.get_backend(),
+    }
+
+
+def print_table(results):
+    print(f"{'benchmark':<62} {'seconds':>10} {'steps/s':>10} {'Mcells/s':>10} {'peak MiB':>9}")
+    for r in results:
+        cps = r["cells_per_second"]
+        print(f"{r['name']:<62} {r['seconds']:>10.4f} {r['steps_per_second'] or 0:>10.2f} "
+              f"{(cps or 0) / 1e6:>10.2f} {r['peak_memory_bytes'] / 2**20:>9.1f}")
+
+
+def compare(baseline_path, candidate_path):
+    """Print per-benchmark speed ratios (baseline seconds / candidate seconds)."""
+    with open(baseline_path) as f:
+        baseline = {r["name"]: r for r in json.load(f)["results"]}
+    with open(candidate_path) as f:
+        candidate = json.load(f)["results"]
+
+    print(f"{'benchmark':<62} {'base s':>10} {'new s':>10} {'speedup':>8} {'mem ratio':>9}")
+    for r in candidate:
+        b = baseline.get(r["name"])
+        if not b:
+            continue
+        speedup = b["seconds"] / r["seconds"] if r["seconds"] else float("inf")
+        mem = r["peak_memory_bytes"] / b["peak_memory_bytes"] if b["peak_memory_bytes"] else float("nan")
+        print(f"{r['name']:<62} {b['seconds']:>10.4f} {r['seconds']:>10.4f} {speedup:>7.2f}x {mem:>9.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the wildfire simulation engines.")
+    parser.add_argument("--quick", action="store_true", help="Small sizes only (smoke run).")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed repetitions per case (best is kept).")
+    parser.add_argument("--steps", type=int, default=20, help="CA steps per _run_ca_step case.")
+    parser.add_argument("--only", nargs="+", choices=["ca_step", "save_raster", "geotiff", "incinerate"],
+                        help="Run only these groups.")
+    parser.add_argument("--output", help="JSON output path (default: benchmarks/results/bench_<commit>_<time>.json).")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CANDIDATE"),
+                        help="Compare two result files instead of running.")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s [%(levelname)s] %(name)s - %(message)s")
+    logger.setLevel(logging.INFO)
+
+    sizes = QUICK_SIZES if args.quick else FULL_SIZES
+    densities = QUICK_DENSITIES if args.quick else FULL_DENSITIES
+    nodes_list = QUICK_NODES if args.quick else FULL_NODES
+    groups = set(args.only or ["ca_step", "save_raster", "geotiff", "incinerate"])
+
+    env = environment_info()
+    results = []
+    workdir = tempfile.mkdtemp(prefix="wildfire_bench_")
+    try:
+        if "ca_step" in groups:
+            results += bench_ca_step(sizes, densities, args.steps, args.repeat)
+        if "save_raster" in groups:
+            results += bench_save_raster(workdir, sizes, frames=5, repeat=args.repeat)
+        if "geotiff" in groups:
+            results += bench_geotiff_simulation(workdir, sizes, densities, args.repeat)
+        if "incinerate" in groups:
+            results += bench_incinerate(workdir, nodes_list, timesteps=20, repeat=1)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"bench_{env['git_commit'] or 'nogit'}_{stamp}.json")
+    with open(output, "w") as f:
+        json.dump({"environment": env, "results": results}, f, indent=2)
+
+    print_table(results)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,21 +10,118 @@ import os
 DEFAULT_HOST = "0.0.0.0"
 DEFAULT_PORT = 5000
 DEBUG_MODE = False
+# ASGI serving (asgi.py): routes waiting on GEE, GCS or disk run in a pool of
+# ASGI_THREAD_WORKERS threads, simulations in ASGI_SIM_PROCESSES spawned
+# worker processes (None = one per CPU)
+ASGI_THREAD_WORKERS = 64
+ASGI_SIM_PROCESSES = None
+# Logging (utils/logger.py): "async" hands records to a background thread
+# through a queue so callers never block on the stream; "sync" writes inline
+LOG_MODE = os.environ.get("WILDFIRE_LOG_MODE", "async").lower()
+LOG_LEVEL = os.environ.get("WILDFIRE_LOG_LEVEL", "INFO").upper()
 
 # ------------------ GOOGLE CONFIG ------------------ #
 GEE_PROJECT_NAME = "dmml-volunteering"
 
 GCS_BUCKET_NAME = "dmml-gee-exports"
 GCS_FOREST_EXPORTS_FOLDER = "forest_exports"
+# Exports of at least GCS_PARALLEL_MIN_BYTES are fetched as parallel ranged
+# chunks of GCS_CHUNK_BYTES
+GCS_DOWNLOAD_WORKERS = 8
+GCS_CHUNK_BYTES = 16 * 1024 * 1024
+GCS_PARALLEL_MIN_BYTES = 32 * 1024 * 1024
 
 GEOTIFF_EXPORT_SCALE = 30  # in meters
 GEOTIFF_EXPORT_CRS = "EPSG:3857"  # standard
 
+# Use the offline Earth Engine stand-in (earthengine/fake_ee.py) instead of
+# the real API, e.g. for tests and benchmarks
+GEE_FAKE = os.environ.get("WILDFIRE_FAKE_EE", "").lower() in ("1", "true", "yes")
+
+# WILDFIRE_ENABLE_GEE=0 runs a simulation-only worker: no /earthengine
+# routes, export poller, `ee` import or credentials
+GEE_ENABLED = os.environ.get("WILDFIRE_ENABLE_GEE", "1").lower() in ("1", "true", "yes")
+# When Earth Engine is initialised: "eager" (blocks startup, fails hard),
+# "background" (thread at startup) or "lazy" (first request that needs it).
+# Requests wait up to GEE_INIT_TIMEOUT_SECONDS for it; a failed start is
+# retried after GEE_INIT_RETRY_SECONDS
+GEE_INIT_MODE = os.environ.get("WILDFIRE_GEE_INIT", "background").lower()
+GEE_INIT_TIMEOUT_SECONDS = 30
+GEE_INIT_RETRY_SECONDS = 60
+
+# Cache of GEE map IDs / computed results: entries are served until
+# GEE_CACHE_TTL_SECONDS old and refreshed in the background once older than
+# GEE_CACHE_REFRESH_SECONDS (map IDs expire, so keep the TTL below a day)
+GEE_CACHE_TTL_SECONDS = 6 * 3600
+GEE_CACHE_REFRESH_SECONDS = 4 * 3600
+GEE_CACHE_MAX_ENTRIES = 256
+
+# Background poller for running exports: one worker (holding a lease in the
+# export registry) checks all tasks with one batched getTaskStatus call per
+# EXPORT_POLL_BATCH_SIZE tasks. Each task is re-checked after
+# EXPORT_POLL_INTERVAL_SECONDS, backing off to EXPORT_POLL_MAX_BACKOFF_SECONDS,
+# and finished exports are downloaded right away.
+EXPORT_POLLER_ENABLED = os.environ.get("WILDFIRE_EXPORT_POLLER", "1").lower() in ("1", "true", "yes")
+EXPORT_POLL_INTERVAL_SECONDS = 5.0
+EXPORT_POLL_MAX_BACKOFF_SECONDS = 60.0
+EXPORT_POLL_BATCH_SIZE = 50
+EXPORT_DOWNLOAD_WORKERS = 2
+# Longest a check-status request may block waiting for a change (?wait=)
+EXPORT_STATUS_MAX_WAIT_SECONDS = 30
+# Bulk prefetch jobs: max exports running at once per job (GEE limits
+# concurrent batch tasks per project) and threads ingesting downloaded rasters
+EXPORT_PREFETCH_CONCURRENCY = 10
+PREFETCH_INGEST_WORKERS = 4
+
 # ------------------ API CONFIG ------------------ #
 # Central prefix for all API routes
 API_PREFIX = "/api"
 GEE_PREFIX = "/earthengine"
 
+# ------------------ SIMULATION CONFIG ------------------ #
+# CA kernel backend: "auto" (Numba if installed, else NumPy), "numba" or "numpy"
+CA_KERNEL_BACKEND = os.environ.get("WILDFIRE_KERNEL_BACKEND", "auto")
+# Save a state checkpoint every N timesteps (0 = final state only); used to
+# extend or branch runs without recomputing from t=0
+CHECKPOINT_INTERVAL = 5
+# Simulations log one summary line per run; set to N to also log progress
+# every N timesteps (0 = summary only). Per-frame lines are DEBUG
+SIM_LOG_EVERY = 0
+# Max timesteps a single extend/branch request may add, and a run may request
+MAX_EXTEND_STEPS = 200
+MAX_SIM_TIMESTEPS = 200
+# Parameter sweeps: max probability combinations and replicates per request;
+# members are stepped together in stacks of at most SWEEP_MAX_CELLS cells
+SWEEP_MAX_COMBINATIONS = 256
+SWEEP_MAX_RUNS = 32
+SWEEP_MAX_CELLS = 32 * 1024 * 1024
+# Decoded county rasters kept in memory between runs
+RASTER_CACHE_SIZE = 4
+# Batch simulations: max ignition points per request and concurrent runs
+BATCH_MAX_IGNITIONS = 200
+BATCH_MAX_WORKERS = 4
+# Max points per /ignition_points/query request
+POINT_QUERY_MAX_POINTS = 10000
+# Ignition-risk maps: sample spacing (pixels), seeded runs per sample,
+# process pool size (None = CPU count), samples per task, checkpoint interval
+RISK_SAMPLE_STRIDE = 10
+RISK_RUNS_PER_POINT = 3
+RISK_MAX_WORKERS = None
+RISK_CHUNK_SIZE = 64
+RISK_CHECKPOINT_SECONDS = 30
+# Float (Dynamic World 'trees' probability) rasters: cells at or above this
+# value count as forest
+FOREST_TREES_THRESHOLD = 0.5
+
+# Shared runtime state (state.py): an in-process LRU of at most
+# STATE_MAX_BYTES, or with WILDFIRE_STATE_BACKEND=sqlite a SQLite file shared
+# by all workers (STATE_DB_PATH, defined below). Compiled objects such as
+# forest-shape predicates always stay in process memory
+STATE_BACKEND = os.environ.get("WILDFIRE_STATE_BACKEND", "memory").lower()
+STATE_MAX_BYTES = 64 * 1024 * 1024
+# Forest shapes and their compiled predicates / grid masks expire after this
+FOREST_SHAPE_TTL_SECONDS = 6 * 3600
+
 # ------------------ PATHS ------------------ #
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, os.pardir))
@@ -38,6 +135,48 @@ GEOJSON_DIR = os.path.join(PROJECT_ROOT, "data", "shared", "geojson")
 # Directory to store GEE inputs (e.g., downloaded GeoTIFFs)
 GEOTIFF_DIR = os.path.join(PROJECT_ROOT, "data", "shared", "geotiff")
 
+# GEE cache entries shared by all workers (small JSON files)
+GEE_CACHE_DIR = os.path.join(PROJECT_ROOT, "data", "cache", "ee")
+GEE_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+# Cross-worker registry of in-flight GEE exports (one task per filename_key);
+# a claim whose task did not start within EXPORT_START_TIMEOUT_SECONDS, or a
+# task older than EXPORT_MAX_AGE_SECONDS, may be restarted
+EXPORT_REGISTRY_PATH = os.path.join(PROJECT_ROOT, "data", "export_registry.sqlite3")
+EXPORT_START_TIMEOUT_SECONDS = 120
+# How long start-export waits for the task id of an export another request
+# is starting before answering PROCESSING without one (the client then polls
+# check-status by filename_key)
+EXPORT_ATTACH_WAIT_SECONDS = 3
+EXPORT_MAX_AGE_SECONDS = 6 * 3600
+
+# Progress files of bulk prefetch jobs (earthengine/prefetch.py)
+PREFETCH_JOB_DIR = os.path.join(PROJECT_ROOT, "data", "cache", "prefetch")
+
+# County boundaries shipped with the frontend (GeoJSON keyed by FIPS)
+COUNTIES_GEOJSON_PATH = os.path.join(PROJECT_ROOT, "public", "geojson-counties-fips.json")
+
+# Shared state file for STATE_BACKEND = "sqlite"
+STATE_DB_PATH = os.path.join(PROJECT_ROOT, "data", "state.sqlite3")
+
+# SQLite catalog of simulation runs in WILDFIRE_OUTPUT_BASE
+RUN_CATALOG_PATH = os.path.join(PROJECT_ROOT, "data", "run_catalog.sqlite3")
+# Disk quota for catalogued runs (bytes, 0 = unlimited); least recently
+# accessed runs are deleted past it, except runs used in the last
+# RUN_CATALOG_MIN_IDLE_SECONDS
+WILDFIRE_OUTPUT_QUOTA_BYTES = int(os.environ.get("WILDFIRE_OUTPUT_QUOTA_BYTES", 20 * 1024 ** 3))
+RUN_CATALOG_MIN_IDLE_SECONDS = 300
+# Last-access updates for the same run are written at most this often
+RUN_CATALOG_TOUCH_SECONDS = 60
+
+# On-disk LRU cache of rendered map tiles
+TILE_CACHE_DIR = os.path.join(PROJECT_ROOT, "data", "cache", "tiles")
+TILE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Forest-class copies of county rasters, with overviews, used to render
+# forest-layer tiles locally
+FOREST_TILE_SOURCE_DIR = os.path.join(PROJECT_ROOT, "data", "cache", "forest_sources")
+
 # Directory to saved service-account JSON (as secret)
 SERVICE_ACCOUNT_JSON_PATH = os.path.join(PROJECT_ROOT, "secrets", "dmml-volunteering-4b1d82bffdc0.json")
 
@@ -48,3 +187,6 @@ ROOSEVELT_FOREST_COVER_CSV = os.path.join(PROJECT_ROOT, "covtype.csv")
 os.makedirs(WILDFIRE_OUTPUT_BASE, exist_ok=True)
 os.makedirs(GEOJSON_DIR, exist_ok=True)
 os.makedirs(GEOTIFF_DIR, exist_ok=True)
+os.makedirs(TILE_CACHE_DIR, exist_ok=True)
+os.makedirs(GEE_CACHE_DIR, exist_ok=True)
+os.makedirs(FOREST_TILE_SOURCE_DIR, exist_ok=True)
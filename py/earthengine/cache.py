@@ -0,0 +1,169 @@
+"""
+earthengine/cache.py
+---------------------------------------------
+TTL cache for slow Earth Engine results (map IDs, small getInfo values).
+
+Entries are keyed by a hash of their parameters (dataset, date range,
+visualisation params, geometry hash, ...) and kept both in process memory
+(bounded LRU) and as small JSON files in GEE_CACHE_DIR, so every worker
+shares them. An entry is:
+    fresh    younger than refresh_after      -> served
+    stale    younger than ttl                -> served, refreshed in the background
+    expired  older than ttl (or missing)     -> recomputed before returning
+
+Concurrent misses for the same key in one process wait for a single call.
+
+    url = MAP_ID_CACHE.get_or_compute({"dataset": ..., "geometry": geometry_hash(g)}, compute)
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from config import (
+    GEE_CACHE_DIR,
+    GEE_CACHE_MAX_BYTES,
+    GEE_CACHE_MAX_ENTRIES,
+    GEE_CACHE_REFRESH_SECONDS,
+    GEE_CACHE_TTL_SECONDS,
+)
+from utils.metrics import GEE_CACHE_REQUESTS
+from utils.tile_cache import DiskLRUCache
+
+logger = logging.getLogger(__name__)
+
+# Background refreshes are rare and each is one GEE call
+_refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="gee-cache-refresh")
+
+
+def geometry_hash(geometry):
+    """Stable hash of a GeoJSON geometry (dict or JSON string)."""
+    if isinstance(geometry, str):
+        geometry = json.loads(geometry)
+    canonical = json.dumps(geometry, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class TTLCache:
+    def __init__(self, name, ttl=GEE_CACHE_TTL_SECONDS, refresh_after=GEE_CACHE_REFRESH_SECONDS,
+                 max_entries=GEE_CACHE_MAX_ENTRIES, directory=GEE_CACHE_DIR, max_bytes=GEE_CACHE_MAX_BYTES):
+        self.name = name
+        self.ttl = ttl
+        self.refresh_after = min(refresh_after, ttl)
+        self.max_entries = max_entries
+        self._memory = OrderedDict()  # key -> {"created": epoch seconds, "value": ...}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._refreshing = set()
+        self._disk = DiskLRUCache(directory, max_bytes) if directory else None
+
+    def _key(self, params):
+        digest = hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+        return f"{self.name}_{digest}"
+
+    # --- storage ---
+
+    def _load(self, key):
+        """Newest entry for key from memory or the shared directory."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+        if entry is not None and time.time() - entry["created"] < self.refresh_after:
+            return entry
+        if self._disk is not None:
+            data = self._disk.get(f"{key}.json")
+            if data is not None:
+                try:
+                    shared = json.loads(data)
+                except ValueError:
+                    shared = None
+                # Another worker may have refreshed it
+                if shared is not None and (entry is None or shared["created"] > entry["created"]):
+                    self._remember(key, shared)
+                    entry = shared
+        return entry
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _store(self, key, value):
+        entry = {"created": time.time(), "value": value}
+        self._remember(key, entry)
+        if self._disk is not None:
+            try:
+                self._disk.put(f"{key}.json", json.dumps(entry).encode())
+            except OSError as e:
+                logger.warning(f"GEE cache {self.name}: failed to persist entry: {e}")
+        return entry
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    # --- public API ---
+
+    def get_or_compute(self, params, compute):
+        """
+        Cached value for params (any JSON-serialisable dict), calling
+        compute() when there is no usable entry. compute() must return a
+        JSON-serialisable value; its exceptions propagate on a miss.
+        """
+        key = self._key(params)
+        entry = self._load(key)
+        age = time.time() - entry["created"] if entry is not None else None
+
+        if entry is not None and age < self.refresh_after:
+            GEE_CACHE_REQUESTS.labels(self.name, "hit").inc()
+            return entry["value"]
+
+        if entry is not None and age < self.ttl:
+            GEE_CACHE_REQUESTS.labels(self.name, "stale").inc()
+            self._refresh_in_background(key, compute)
+            return entry["value"]
+
+        GEE_CACHE_REQUESTS.labels(self.name, "miss").inc()
+        with self._key_lock(key):
+            # Another thread may have filled it while we waited
+            entry = self._load(key)
+            if entry is not None and time.time() - entry["created"] < self.refresh_after:
+                return entry["value"]
+            return self._store(key, compute())["value"]
+
+    def _refresh_in_background(self, key, compute):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                with self._key_lock(key):
+                    self._store(key, compute())
+                logger.info(f"GEE cache {self.name}: refreshed {key}")
+            except Exception as e:
+                # The stale value keeps being served until the TTL runs out
+                logger.warning(f"GEE cache {self.name}: background refresh of {key} failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        _refresh_pool.submit(refresh)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+
+
+# Map IDs (tile URLs) for visualisation layers
+MAP_ID_CACHE = TTLCache("mapid")
+# Small computed values (e.g. materialised export regions)
+INFO_CACHE = TTLCache("info")
@@ -0,0 +1,195 @@
+"""
+earthengine/export_poller.py
+---------------------------------------------
+Background poller for running Earth Engine exports.
+
+Instead of every /check-status request calling ee.data.getTaskStatus (and
+listing GCS), one worker at a time holds the 'export_poller' lease in the
+export registry and:
+
+    - checks all running tasks with one getTaskStatus call per
+      EXPORT_POLL_BATCH_SIZE tasks,
+    - re-checks each task after EXPORT_POLL_INTERVAL_SECONDS, doubling the
+      delay up to EXPORT_POLL_MAX_BACKOFF_SECONDS while it keeps running,
+    - downloads and ingests a finished export right away
+      (EXPORT_DOWNLOAD_WORKERS at a time) and marks it completed or failed
+      in the registry.
+
+Status requests read the registry, so the number of GEE calls depends on
+the number of tasks, not on the number of clients polling them. The other
+workers' pollers only renew-or-skip the lease.
+
+    export_poller.start()        # from create_app()
+    export_poller.POLLER.poll_once()
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from config import (
+    EXPORT_DOWNLOAD_WORKERS,
+    EXPORT_POLL_BATCH_SIZE,
+    EXPORT_POLL_INTERVAL_SECONDS,
+    EXPORT_POLL_MAX_BACKOFF_SECONDS,
+    EXPORT_POLLER_ENABLED,
+    EXPORT_START_TIMEOUT_SECONDS,
+    GCS_BUCKET_NAME,
+    GCS_FOREST_EXPORTS_FOLDER,
+    GEE_PROJECT_NAME,
+    GEOTIFF_DIR,
+)
+from earthengine import export_registry
+from earthengine.service import get_task_statuses, download_gcs_file_to_local
+from utils.metrics import EXPORT_TASKS_PENDING
+
+logger = logging.getLogger(__name__)
+
+LEASE_NAME = "export_poller"
+
+
+class ExportPoller:
+    def __init__(self, interval=EXPORT_POLL_INTERVAL_SECONDS, max_backoff=EXPORT_POLL_MAX_BACKOFF_SECONDS,
+                 batch_size=EXPORT_POLL_BATCH_SIZE, download_workers=EXPORT_DOWNLOAD_WORKERS):
+        self.interval = interval
+        self.max_backoff = max(max_backoff, interval)
+        self.batch_size = batch_size
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._downloads = ThreadPoolExecutor(max_workers=download_workers, thread_name_prefix="export-download")
+        self._schedule = {}       # task_id -> (next check at, current delay)
+        self._downloading = set()  # filename_keys with a download in flight here
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- lifecycle ---
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="export-poller", daemon=True)
+            self._thread.start()
+            logger.info(f"Export poller started ({self.owner}).")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 2)
+        export_registry.release_lease(LEASE_NAME, self.owner)
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def wake(self):
+        """Check now instead of at the next tick (e.g. after a task was started)."""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.error(f"Export poller iteration failed: {e}", exc_info=True)
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    # --- polling ---
+
+    def poll_once(self):
+        """
+        One polling round (if this worker holds the lease).
+
+        Returns:
+            int: Number of tasks whose status was requested from GEE.
+        """
+        if not export_registry.acquire_lease(LEASE_NAME, self.owner, ttl=max(self.interval * 3, 30)):
+            return 0
+
+        entries = export_registry.pending(stale_downloads_after=EXPORT_START_TIMEOUT_SECONDS)
+        with self._lock:
+            entries = [e for e in entries if e["filename_key"] not in self._downloading]
+        EXPORT_TASKS_PENDING.set(len(entries))
+
+        now = time.time()
+        live_ids = {e["task_id"] for e in entries}
+        with self._lock:
+            for task_id in list(self._schedule):
+                if task_id not in live_ids:
+                    del self._schedule[task_id]
+        due = [e for e in entries if self._schedule.get(e["task_id"], (0, 0))[0] <= now]
+
+        for i in range(0, len(due), self.batch_size):
+            batch = due[i:i + self.batch_size]
+            try:
+                statuses = get_task_statuses(e["task_id"] for e in batch)
+            except Exception as e:
+                logger.warning(f"Batched getTaskStatus for {len(batch)} tasks failed: {e}")
+                for entry in batch:
+                    self._back_off(entry["task_id"])
+                continue
+            for entry in batch:
+                self._handle(entry, statuses.get(entry["task_id"], {}))
+        return len(due)
+
+    def _back_off(self, task_id):
+        with self._lock:
+            _, delay = self._schedule.get(task_id, (0, self.interval / 2))
+            delay = min(delay * 2, self.max_backoff)
+            self._schedule[task_id] = (time.time() + delay, delay)
+
+    def _handle(self, entry, info):
+        filename_key, task_id = entry["filename_key"], entry["task_id"]
+        status = info.get("status")
+        if status == "PROCESSING":
+            self._back_off(task_id)
+        elif status == "DONE":
+            with self._lock:
+                self._schedule.pop(task_id, None)
+                self._downloading.add(filename_key)
+            export_registry.set_downloading(filename_key)
+            self._downloads.submit(self._download, filename_key, task_id)
+        else:
+            error = info.get("error") or f"Unexpected task state: {status}"
+            logger.error(f"Export {filename_key} (task {task_id}) failed: {error}")
+            with self._lock:
+                self._schedule.pop(task_id, None)
+            export_registry.fail(filename_key, error, task_id=task_id)
+
+    def _download(self, filename_key, task_id):
+        from wildfire_sim import ingest  # rasterio
+
+        blob_prefix = f"{GCS_FOREST_EXPORTS_FOLDER.rstrip('/')}/{filename_key}"
+        local_path = os.path.join(GEOTIFF_DIR, f"{filename_key}.tif")
+        try:
+            path = download_gcs_file_to_local(GCS_BUCKET_NAME, blob_prefix, local_path, project=GEE_PROJECT_NAME)
+            ingest.ingest_raster(path)
+            export_registry.complete(filename_key, path)
+            logger.info(f"Export {filename_key} (task {task_id}) downloaded to {path}.")
+        except FileNotFoundError:
+            # Task reported done before the object is listable; check again later
+            logger.info(f"Export {filename_key} done but not in GCS yet; retrying.")
+            export_registry.set_task(filename_key, task_id)
+            self._back_off(task_id)
+        except Exception as e:
+            logger.error(f"Downloading export {filename_key} failed: {e}", exc_info=True)
+            export_registry.fail(filename_key, e, task_id=task_id)
+        finally:
+            with self._lock:
+                self._downloading.discard(filename_key)
+
+
+POLLER = ExportPoller()
+
+
+def start():
+    """Start this worker's poller thread unless disabled (WILDFIRE_EXPORT_POLLER=0)."""
+    if EXPORT_POLLER_ENABLED:
+        POLLER.start()
+
@@ -0,0 +1,244 @@
+"""
+earthengine/export_registry.py
+---------------------------------------------
+Cross-worker registry of Earth Engine forest exports, keyed by filename_key.
+
+Starting an export first claims its key inside a SQLite write transaction,
+so of several concurrent requests (in any worker) for the same county only
+one starts a GEE batch task; the others attach to its task id. Entries:
+
+    starting     claimed, task not started yet (other requests wait for the id)
+    running      GEE task started
+    downloading  task finished; the export poller is fetching the GeoTIFF
+    completed    GeoTIFF downloaded to local_path
+    failed     export or download failed; the next request starts afresh
+
+A 'starting' claim older than EXPORT_START_TIMEOUT_SECONDS (its worker died)
+or a 'running' task older than EXPORT_MAX_AGE_SECONDS can be reclaimed.
+
+The registry also holds named leases, so one worker at a time runs the
+export poller (earthengine/export_poller.py).
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from config import EXPORT_REGISTRY_PATH, EXPORT_START_TIMEOUT_SECONDS, EXPORT_MAX_AGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+STATUS_STARTING = "starting"
+STATUS_RUNNING = "running"
+STATUS_DOWNLOADING = "downloading"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+# Statuses that still change (what check-status?wait= waits on)
+IN_FLIGHT = (STATUS_STARTING, STATUS_RUNNING, STATUS_DOWNLOADING)
+
+# claim() outcomes
+CLAIMED = "claimed"
+ATTACHED = "attached"
+COMPLETED = "completed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS exports (
+    filename_key  TEXT PRIMARY KEY,
+    task_id       TEXT,
+    status        TEXT NOT NULL,
+    local_path    TEXT,
+    error         TEXT,
+    created       REAL NOT NULL,
+    updated       REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS exports_task ON exports (task_id);
+CREATE INDEX IF NOT EXISTS exports_status ON exports (status);
+CREATE TABLE IF NOT EXISTS leases (
+    name     TEXT PRIMARY KEY,
+    owner    TEXT NOT NULL,
+    expires  REAL NOT NULL
+);
+"""
+
+_local = threading.local()
+
+
+def _connect():
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "path", None) != EXPORT_REGISTRY_PATH:
+        os.makedirs(os.path.dirname(EXPORT_REGISTRY_PATH), exist_ok=True)
+        conn = sqlite3.connect(EXPORT_REGISTRY_PATH, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        _local.conn, _local.path = conn, EXPORT_REGISTRY_PATH
+    return conn
+
+
+def _is_live(row, now):
+    if row["status"] == STATUS_STARTING:
+        return now - row["updated"] < EXPORT_START_TIMEOUT_SECONDS
+    if row["status"] in (STATUS_RUNNING, STATUS_DOWNLOADING):
+        return now - row["created"] < EXPORT_MAX_AGE_SECONDS
+    return False
+
+
+def claim(filename_key):
+    """
+    Atomically decide who starts the export for filename_key.
+
+    Returns:
+        (outcome, entry): (CLAIMED, None) if the caller must start the task
+        and then call set_task() or fail(); (ATTACHED, entry) if an export
+        is already starting or running; (COMPLETED, entry) if it finished
+        and its file is still on disk.
+    """
+    conn = _connect()
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute("SELECT * FROM exports WHERE filename_key = ?", (filename_key,)).fetchone()
+        if row is not None:
+            if _is_live(row, now):
+                conn.execute("COMMIT")
+                return ATTACHED, dict(row)
+            if row["status"] == STATUS_COMPLETED and row["local_path"] and os.path.exists(row["local_path"]):
+                conn.execute("COMMIT")
+                return COMPLETED, dict(row)
+            if row["status"] in IN_FLIGHT:
+                logger.warning(f"Reclaiming stale {row['status']} export {filename_key} (task {row['task_id']}).")
+        conn.execute(
+            "INSERT OR REPLACE INTO exports (filename_key, task_id, status, local_path, error, created, updated) "
+            "VALUES (?, NULL, ?, NULL, NULL, ?, ?)",
+            (filename_key, STATUS_STARTING, now, now))
+        conn.execute("COMMIT")
+        return CLAIMED, None
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _update(filename_key, **fields):
+    fields["updated"] = time.time()
+    columns = ", ".join(f"{k} = ?" for k in fields)
+    _connect().execute(f"UPDATE exports SET {columns} WHERE filename_key = ?", (*fields.values(), filename_key))
+
+
+def set_task(filename_key, task_id):
+    _update(filename_key, task_id=task_id, status=STATUS_RUNNING)
+
+
+def set_downloading(filename_key):
+    _update(filename_key, status=STATUS_DOWNLOADING)
+
+
+def complete(filename_key, local_path):
+    _update(filename_key, status=STATUS_COMPLETED, local_path=local_path, error=None)
+
+
+def fail(filename_key, error, task_id=None):
+    """
+    Mark the export failed. With task_id, only if the entry still belongs to
+    that task (not to a newer export of the same key started since).
+    """
+    if task_id is None:
+        _update(filename_key, status=STATUS_FAILED, error=str(error))
+        return
+    _connect().execute(
+        "UPDATE exports SET status = ?, error = ?, updated = ? WHERE filename_key = ? AND task_id = ?",
+        (STATUS_FAILED, str(error), time.time(), filename_key, task_id))
+
+
+def get(filename_key):
+    row = _connect().execute("SELECT * FROM exports WHERE filename_key = ?", (filename_key,)).fetchone()
+    return dict(row) if row is not None else None
+
+
+def get_many(filename_keys):
+    """Entries of several exports in one query: {filename_key: entry} (missing keys omitted)."""
+    keys = list(filename_keys)
+    entries = {}
+    conn = _connect()
+    for i in range(0, len(keys), 500):
+        chunk = keys[i:i + 500]
+        placeholders = ", ".join("?" * len(chunk))
+        for row in conn.execute(f"SELECT * FROM exports WHERE filename_key IN ({placeholders})", chunk):
+            entries[row["filename_key"]] = dict(row)
+    return entries
+
+
+def pending(stale_downloads_after=None):
+    """
+    Entries the export poller has to look at: running tasks, plus downloads
+    not touched for stale_downloads_after seconds (their worker died).
+    """
+    query = "SELECT * FROM exports WHERE status = ? AND task_id IS NOT NULL"
+    params = [STATUS_RUNNING]
+    if stale_downloads_after is not None:
+        query += " OR (status = ? AND updated < ?)"
+        params += [STATUS_DOWNLOADING, time.time() - stale_downloads_after]
+    return [dict(row) for row in _connect().execute(query, params)]
+
+
+def acquire_lease(name, owner, ttl):
+    """
+    Take or renew the lease `name` for `owner` for ttl seconds.
+
+    Returns:
+        bool: True if owner holds the lease now.
+    """
+    conn = _connect()
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute("SELECT owner, expires FROM leases WHERE name = ?", (name,)).fetchone()
+        if row is not None and row["owner"] != owner and row["expires"] > now:
+            conn.execute("COMMIT")
+            return False
+        conn.execute("INSERT OR REPLACE INTO leases (name, owner, expires) VALUES (?, ?, ?)",
+                     (name, owner, now + ttl))
+        conn.execute("COMMIT")
+        return True
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def release_lease(name, owner):
+    _connect().execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+
+
+def wait_for_change(filename_key, status, timeout, interval=0.5):
+    """
+    Long-poll helper: the entry once its status differs from `status`, or
+    the current entry after `timeout` seconds. Reads only the local
+    registry, never Earth Engine.
+    """
+    deadline = time.time() + timeout
+    while True:
+        entry = get(filename_key)
+        if entry is None or entry["status"] != status or time.time() >= deadline:
+            return entry
+        time.sleep(interval)
+
+
+def wait_for_task(filename_key, timeout=None, interval=0.25):
+    """
+    Wait for an export that another request is starting to get its task id.
+
+    Returns:
+        dict | None: The entry once it is running (or finished), None if the
+        start failed or did not happen within `timeout` seconds.
+    """
+    deadline = time.time() + (EXPORT_START_TIMEOUT_SECONDS if timeout is None else timeout)
+    while True:
+        entry = get(filename_key)
+        if entry is None or entry["status"] == STATUS_FAILED:
+            return None
+        if entry["status"] != STATUS_STARTING:
+            return entry
+        if time.time() >= deadline:
+            return None
+        time.sleep(interval)
@@ -0,0 +1,228 @@
+"""
+earthengine/fake_ee.py
+---------------------------------------------
+Offline stand-in for the subset of the `ee` API used by this backend.
+
+Objects only record how they were built; the calls that reach Earth
+Engine for real (getMapId, getInfo, getTaskStatus, task.start) sleep for a
+configurable latency, are counted, and return plausible fake results. This
+lets cache hit rates and request latency be measured without credentials:
+
+    WILDFIRE_FAKE_EE=1 python app.py          # whole backend on the fake
+
+    from earthengine import fake_ee
+    fake_ee.configure(latency={"getMapId": 0.5})
+    fake_ee.CALLS["getMapId"]                 # calls made so far
+"""
+
+import itertools
+import json
+import threading
+import time
+from collections import Counter
+
+# Seconds each remote operation takes
+LATENCY = {
+    "initialize": 0.0,
+    "getMapId": 1.0,
+    "getInfo": 0.2,
+    "getTaskStatus": 0.1,
+    "export_start": 0.3,
+}
+# Seconds after start() at which a fake export task reports COMPLETED
+TASK_SECONDS = 5.0
+
+CALLS = Counter()
+_calls_lock = threading.Lock()
+_ids = itertools.count(1)
+_tasks = {}  # task id -> {"started": epoch seconds, "config": {...}}
+
+
+def configure(latency=None, task_seconds=None):
+    """Override per-operation latencies and/or the fake export duration."""
+    global TASK_SECONDS
+    if latency:
+        LATENCY.update(latency)
+    if task_seconds is not None:
+        TASK_SECONDS = task_seconds
+
+
+def reset_stats():
+    with _calls_lock:
+        CALLS.clear()
+
+
+def _remote(operation):
+    with _calls_lock:
+        CALLS[operation] += 1
+    delay = LATENCY.get(operation, 0.0)
+    if delay:
+        time.sleep(delay)
+
+
+def Initialize(project=None, **kwargs):
+    _remote("initialize")
+
+
+class _Node:
+    """A lazily built expression; getInfo() 'evaluates' it."""
+
+    def __init__(self, op, *args):
+        self._op = op
+        self._args = args
+
+    def getInfo(self):
+        _remote("getInfo")
+        return {"op": self._op}
+
+    def __repr__(self):
+        return f"<fake_ee.{type(self).__name__} {self._op}>"
+
+
+class Filter(_Node):
+    @staticmethod
+    def date(start, end=None):
+        return Filter("date", start, end)
+
+    @staticmethod
+    def eq(name, value):
+        return Filter("eq", name, value)
+
+    @staticmethod
+    def And(*filters):
+        return Filter("and", *filters)
+
+
+class Geometry(_Node):
+    def __init__(self, geojson, *args):
+        if isinstance(geojson, str):
+            geojson = json.loads(geojson)
+        super().__init__("geometry", geojson)
+        self._geojson = geojson
+
+    def bounds(self):
+        coords = list(_flatten_coords(self._geojson.get("coordinates", [])))
+        if not coords:
+            return Geometry(self._geojson)
+        xs, ys = zip(*coords)
+        ring = [[min(xs), min(ys)], [max(xs), min(ys)], [max(xs), max(ys)], [min(xs), max(ys)], [min(xs), min(ys)]]
+        return Geometry({"type": "Polygon", "coordinates": [ring]})
+
+    def getInfo(self):
+        _remote("getInfo")
+        return self._geojson
+
+
+def _flatten_coords(coords):
+    if coords and isinstance(coords[0], (int, float)):
+        yield tuple(coords[:2])
+        return
+    for c in coords:
+        yield from _flatten_coords(c)
+
+
+class Image(_Node):
+    def _derive(self, op, *args):
+        return Image(op, self, *args)
+
+    def select(self, band):
+        return self._derive("select", band)
+
+    def eq(self, value):
+        return self._derive("eq", value)
+
+    def clip(self, geometry):
+        return self._derive("clip", geometry)
+
+    def selfMask(self):
+        return self._derive("selfMask")
+
+    def updateMask(self, mask):
+        return self._derive("updateMask", mask)
+
+    def projection(self):
+        return _Node("projection", self)
+
+    def reduceToVectors(self, **kwargs):
+        return FeatureCollection("reduceToVectors", self)
+
+
+class ImageCollection(_Node):
+    def __init__(self, dataset, *args):
+        super().__init__("collection", dataset, *args)
+
+    def filter(self, f):
+        return ImageCollection(self._args[0], self, f)
+
+    def filterBounds(self, geometry):
+        return ImageCollection(self._args[0], self, geometry)
+
+    def median(self):
+        return Image("median", self)
+
+
+class FeatureCollection(_Node):
+    def __init__(self, source, *args):
+        super().__init__("features", source, *args)
+
+    def filter(self, f):
+        return FeatureCollection(self, f)
+
+    def first(self):
+        return _Node("first", self)
+
+    def geometry(self):
+        # A county-sized box so bounds().getInfo() has coordinates
+        return Geometry({"type": "Polygon", "coordinates": [[[-88.0, 44.0], [-87.0, 44.0], [-87.0, 45.0],
+                                                              [-88.0, 45.0], [-88.0, 44.0]]]})
+
+
+class _Task:
+    def __init__(self, config):
+        self.id = f"FAKE{next(_ids):08d}"
+        self.config = config
+
+    def start(self):
+        _remote("export_start")
+        _tasks[self.id] = {"started": time.time(), "config": self.config}
+
+
+class _Export:
+    @staticmethod
+    def toCloudStorage(**kwargs):
+        return _Task(kwargs)
+
+    @staticmethod
+    def toDrive(**kwargs):
+        return _Task(kwargs)
+
+
+class batch:
+    class Export:
+        image = _Export
+        table = _Export
+
+
+class data:
+    @staticmethod
+    def getMapId(params):
+        _remote("getMapId")
+        return {"mapid": f"projects/fake-ee/maps/{next(_ids):08d}", "token": ""}
+
+    @staticmethod
+    def getTaskStatus(task_ids):
+        _remote("getTaskStatus")
+        if isinstance(task_ids, str):
+            task_ids = [task_ids]
+        statuses = []
+        for task_id in task_ids:
+            task = _tasks.get(task_id)
+            if task is None:
+                statuses.append({"id": task_id, "state": "UNKNOWN"})
+            elif time.time() - task["started"] < TASK_SECONDS:
+                statuses.append({"id": task_id, "state": "RUNNING"})
+            else:
+                cfg = task["config"]
+                uri = f"gs://{cfg.get('bucket')}/{cfg.get('fileNamePrefix')}.tif"
+                statuses.append({"id": task_id, "state": "COMPLETED", "destination_uris": [uri]})
+        return statuses
@@ -0,0 +1,258 @@
+"""
+earthengine/gcs.py
+---------------------------------------------
+Download path for rasters exported from Earth Engine to Cloud Storage.
+
+- One storage.Client per project, reused across requests (connection pool).
+- Large .tif objects are fetched as parallel ranged chunks written in place
+  into a preallocated temp file; all chunks are pinned to the object's
+  generation so a concurrent overwrite cannot mix versions.
+- .tif.gz objects are decompressed while streaming, and .zip exports are
+  read through a seekable blob reader, so no compressed copy touches disk.
+- The object's CRC32C (or MD5) is verified before the file is atomically
+  renamed to its final path; a failed download leaves nothing behind. For
+  zips the checksum is fed by the reads the extraction makes anyway, and
+  only the bytes it did not read in order (usually just the central
+  directory) are fetched again at the end.
+
+Set STORAGE_EMULATOR_HOST (e.g. http://localhost:4443 for fake-gcs-server)
+to run against a local fake GCS server with anonymous credentials.
+"""
+
+import base64
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import google_crc32c
+except ImportError:  # installed with google-cloud-storage; MD5 is used without it
+    google_crc32c = None
+
+from config import GCS_DOWNLOAD_WORKERS, GCS_CHUNK_BYTES, GCS_PARALLEL_MIN_BYTES
+from utils.metrics import GCS_CALL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+# Read size for streaming (gzip / zip) downloads
+STREAM_CHUNK_BYTES = 8 * 1024 * 1024
+
+
+def get_client(project=None):
+    """Shared storage.Client for project (anonymous when STORAGE_EMULATOR_HOST is set)."""
+    from google.cloud import storage  # ~150 ms; only workers that download need it
+
+    with _clients_lock:
+        client = _clients.get(project)
+        if client is None:
+            if os.environ.get("STORAGE_EMULATOR_HOST"):
+                from google.auth.credentials import AnonymousCredentials
+                client = storage.Client(project=project or "emulator", credentials=AnonymousCredentials())
+                logger.info(f"Using GCS emulator at {os.environ['STORAGE_EMULATOR_HOST']}")
+            else:
+                client = storage.Client(project=project)
+            _clients[project] = client
+        return client
+
+
+class ChecksumMismatch(IOError):
+    pass
+
+
+class _Digest:
+    """Running checksum matching what GCS stores for the object (CRC32C, else MD5)."""
+
+    def __init__(self, blob):
+        if blob.crc32c and google_crc32c is not None:
+            self.kind, self.expected, self._h = "crc32c", blob.crc32c, google_crc32c.Checksum()
+        elif blob.md5_hash:
+            self.kind, self.expected, self._h = "md5", blob.md5_hash, hashlib.md5()
+        else:
+            self.kind, self.expected, self._h = None, None, None
+
+    def update(self, data):
+        if self._h is not None:
+            self._h.update(data)
+
+    def verify(self, name):
+        if self._h is None:
+            logger.warning(f"No checksum available for gs://{name}; skipping verification.")
+            return
+        actual = base64.b64encode(self._h.digest()).decode()
+        if actual != self.expected:
+            raise ChecksumMismatch(f"{self.kind} mismatch for gs://{name}: expected {self.expected}, got {actual}")
+
+
+class _DigestReader:
+    """
+    Seekable reader that adds every byte read in order from the start of the
+    object to a _Digest; finish() reads whatever was skipped or not reached.
+    """
+
+    def __init__(self, src, digest):
+        self._src = src
+        self._digest = digest
+        self._hashed = 0  # bytes [0, _hashed) are in the digest
+
+    def read(self, size=-1):
+        pos = self._src.tell()
+        data = self._src.read(size)
+        if pos <= self._hashed < pos + len(data):
+            self._digest.update(memoryview(data)[self._hashed - pos:])
+            self._hashed = pos + len(data)
+        return data
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self._src.seek(offset, whence)
+
+    def tell(self):
+        return self._src.tell()
+
+    def seekable(self):
+        return True
+
+    def finish(self):
+        self._src.seek(self._hashed)
+        for _ in iter(lambda: self.read(STREAM_CHUNK_BYTES), b""):
+            pass
+
+
+def select_blob(bucket_name, blob_prefix, project=None):
+    """
+    Exported object for blob_prefix, preferring TIFF-like names.
+
+    Raises:
+        FileNotFoundError: If nothing matches the prefix.
+    """
+    client = get_client(project)
+    with GCS_CALL_SECONDS.labels(operation="list_blobs").time():
+        blobs = list(client.list_blobs(bucket_name, prefix=blob_prefix))
+
+    if not blobs:
+        raise FileNotFoundError(f"No GCS objects found for prefix: {blob_prefix}")
+
+    preferred = [b for b in blobs if b.name.lower().endswith(('.tif', '.tif.gz', '.tif.zip', '.zip'))]
+    # fallback to first blob if no preferred extension
+    return preferred[0] if preferred else blobs[0]
+
+
+def _download_ranged(blob, tmp_path, workers, chunk_bytes):
+    """Parallel ranged download into tmp_path; returns bytes written."""
+    size = blob.size
+    with open(tmp_path, "wb") as f:
+        f.truncate(size)
+    ranges = [(start, min(start + chunk_bytes, size) - 1) for start in range(0, size, chunk_bytes)]
+    fd = os.open(tmp_path, os.O_WRONLY)
+
+    def fetch(byte_range):
+        start, end = byte_range
+        data = blob.download_as_bytes(start=start, end=end, raw_download=True, checksum=None,
+                                      if_generation_match=blob.generation)
+        if len(data) != end - start + 1:
+            raise IOError(f"Short read for bytes {start}-{end} of gs://{blob.bucket.name}/{blob.name}")
+        os.pwrite(fd, data, start)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gcs-range") as pool:
+            list(pool.map(fetch, ranges))
+    finally:
+        os.close(fd)
+
+    # Chunks arrive out of order, so the object checksum is computed afterwards
+    digest = _Digest(blob)
+    with open(tmp_path, "rb") as f:
+        for block in iter(lambda: f.read(STREAM_CHUNK_BYTES), b""):
+            digest.update(block)
+    digest.verify(f"{blob.bucket.name}/{blob.name}")
+    return size
+
+
+def _download_stream(blob, tmp_path, gunzip=False):
+    """Sequential download (optionally gunzipping on the fly), checksummed as it streams."""
+    digest = _Digest(blob)
+    decompressor = zlib.decompressobj(wbits=31) if gunzip else None
+    written = 0
+    with blob.open("rb", chunk_size=STREAM_CHUNK_BYTES, raw_download=True,
+                   if_generation_match=blob.generation) as src, open(tmp_path, "wb") as out:
+        for block in iter(lambda: src.read(STREAM_CHUNK_BYTES), b""):
+            digest.update(block)
+            if decompressor is not None:
+                block = decompressor.decompress(block)
+            out.write(block)
+            written += len(block)
+        if decompressor is not None:
+            tail = decompressor.flush()
+            out.write(tail)
+            written += len(tail)
+            if not decompressor.eof:
+                raise IOError(f"Truncated gzip stream in gs://{blob.bucket.name}/{blob.name}")
+    digest.verify(f"{blob.bucket.name}/{blob.name}")
+    return written
+
+
+def _extract_zip(blob, tmp_path):
+    """Extract the first .tif of a zip object via ranged reads, checksumming the object as they go."""
+    digest = _Digest(blob)
+    with blob.open("rb", chunk_size=STREAM_CHUNK_BYTES, raw_download=True,
+                   if_generation_match=blob.generation) as raw:
+        src = _DigestReader(raw, digest)
+        with zipfile.ZipFile(src) as z:
+            tif_names = [n for n in z.namelist() if n.lower().endswith('.tif')]
+            if not tif_names:
+                raise FileNotFoundError("Zip did not contain any .tif files")
+            # ZipFile checks the member's CRC-32 when it is read to the end
+            with z.open(tif_names[0]) as member, open(tmp_path, "wb") as out:
+                shutil.copyfileobj(member, out, STREAM_CHUNK_BYTES)
+        if digest.kind is not None:
+            src.finish()
+    digest.verify(f"{blob.bucket.name}/{blob.name}")
+    return os.path.getsize(tmp_path)
+
+
+def download_blob(blob, local_path, workers=None, chunk_bytes=None, parallel_min_bytes=None):
+    """
+    Download an exported raster object to local_path (decompressing .gz /
+    .zip), verify it, and move it into place atomically.
+
+    Returns:
+        str: local_path
+    """
+    workers = workers or GCS_DOWNLOAD_WORKERS
+    chunk_bytes = chunk_bytes or GCS_CHUNK_BYTES
+    parallel_min_bytes = GCS_PARALLEL_MIN_BYTES if parallel_min_bytes is None else parallel_min_bytes
+
+    name = blob.name.lower()
+    os.makedirs(os.path.dirname(local_path) or ".", exist_ok=True)
+    tmp_path = f"{local_path}.{os.getpid()}.{threading.get_ident()}.part"
+    try:
+        with GCS_CALL_SECONDS.labels(operation="download").time():
+            if name.endswith('.gz'):
+                written = _download_stream(blob, tmp_path, gunzip=True)
+                mode = "streamed gunzip"
+            elif name.endswith('.zip'):
+                written = _extract_zip(blob, tmp_path)
+                mode = "zip extract"
+            elif blob.size and blob.size >= parallel_min_bytes and workers > 1:
+                written = _download_ranged(blob, tmp_path, workers, chunk_bytes)
+                mode = f"{workers}-way ranged"
+            else:
+                written = _download_stream(blob, tmp_path)
+                mode = "streamed"
+        os.replace(tmp_path, local_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    logger.info(f"Downloaded gs://{blob.bucket.name}/{blob.name} -> {local_path} ({written} bytes, {mode})")
+    return local_path
@@ -0,0 +1,311 @@
+"""
+earthengine/prefetch.py
+---------------------------------------------
+Bulk prefetch of county forest rasters, e.g. to onboard a whole state.
+
+A PrefetchJob takes county keys ("Dane_WI") or a state abbreviation and,
+for each county without a local GeoTIFF:
+
+    1. claims and starts its GEE export through the export registry (so it
+       shares tasks with clicks in the UI), keeping at most
+       EXPORT_PREFETCH_CONCURRENCY exports running to stay within GEE quotas,
+    2. lets the export poller (earthengine/export_poller.py) download it,
+    3. ingests the downloaded raster (uint8 classes, see wildfire_sim/ingest.py,
+       and its forest tile source) in a pool of PREFETCH_INGEST_WORKERS threads.
+
+County geometries come from the local county index (utils/county_index.py),
+so no Earth Engine call is needed to find them. Progress is kept in memory
+and written to PREFETCH_JOB_DIR/<job_id>.json for other workers:
+
+    POST /earthengine/prefetch  {"state": "WI"}  -> 202 + job
+    GET  /earthengine/prefetch/<job_id>
+
+From py/:
+    python -m earthengine.prefetch --state WI
+    python -m earthengine.prefetch Dane_WI Sauk_WI
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from config import (
+    EXPORT_PREFETCH_CONCURRENCY,
+    GCS_BUCKET_NAME,
+    GEOTIFF_EXPORT_CRS,
+    GEOTIFF_EXPORT_SCALE,
+    PREFETCH_INGEST_WORKERS,
+    PREFETCH_JOB_DIR,
+)
+from earthengine import export_registry, export_poller
+from earthengine.service import export_forest_raster_async
+from utils.constants import STATE_ABBR_TO_FIPS
+from utils.county_index import get_index
+from wildfire_sim import forest_tiles, ingest
+
+logger = logging.getLogger(__name__)
+
+# Per-county stages
+QUEUED = "queued"
+EXPORTING = "exporting"
+DOWNLOADING = "downloading"
+INGESTING = "ingesting"
+DONE = "done"
+FAILED = "failed"
+
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+
+# Seconds between registry checks while exports run
+POLL_SECONDS = 2.0
+
+_jobs = {}  # job_id -> PrefetchJob (jobs started by this process)
+_jobs_lock = threading.Lock()
+
+
+def resolve_counties(county_keys=None, state=None):
+    """
+    County keys to prefetch: the given keys, or every county of a state.
+
+    Raises:
+        ValueError: On an unknown state abbreviation or county key, or if
+            neither is given.
+    """
+    index = get_index()
+    if state:
+        if state.strip().upper() not in STATE_ABBR_TO_FIPS:
+            raise ValueError(f"Unknown state abbreviation: {state}")
+        keys = [record["county_key"] for record in index.in_state(state)]
+    elif county_keys:
+        keys = []
+        for key in county_keys:
+            record = index.get(key)
+            if record is None:
+                raise ValueError(f"Unknown county key: {key}")
+            keys.append(record["county_key"])
+    else:
+        raise ValueError("Provide county keys or a state abbreviation.")
+    return list(dict.fromkeys(keys))
+
+
+class PrefetchJob:
+    def __init__(self, county_keys, concurrency=None, ingest_workers=None, label=None):
+        self.job_id = f"prefetch_{uuid.uuid4().hex[:12]}"
+        self.label = label
+        # Never above the GEE concurrent-task budget, whatever the client asks for
+        self.concurrency = min(concurrency or EXPORT_PREFETCH_CONCURRENCY, EXPORT_PREFETCH_CONCURRENCY)
+        self.ingest_workers = ingest_workers or PREFETCH_INGEST_WORKERS
+        self.counties = {key: {"stage": QUEUED, "task_id": None, "error": None} for key in county_keys}
+        self.status = STATUS_RUNNING
+        self.error = None
+        self.started = datetime.now().isoformat(timespec="seconds")
+        self._lock = threading.Lock()
+        self._thread = None
+
+    # --- progress ---
+
+    def _set(self, key, stage, **fields):
+        with self._lock:
+            self.counties[key].update(stage=stage, **fields)
+
+    def info(self, details=True):
+        with self._lock:
+            stages = Counter(c["stage"] for c in self.counties.values())
+            counties = {k: dict(v) for k, v in self.counties.items()} if details else None
+        total = len(self.counties)
+        finished = stages[DONE] + stages[FAILED]
+        info = {
+            "job_id": self.job_id,
+            "label": self.label,
+            "status": self.status,
+            "error": self.error,
+            "started": self.started,
+            "total": total,
+            "stages": dict(stages),
+            "progress": round(finished / total, 4) if total else 1.0,
+        }
+        if details:
+            info["counties"] = counties
+        return info
+
+    def _write_job_file(self):
+        info = self.info()
+        info["updated"] = datetime.now().isoformat(timespec="seconds")
+        os.makedirs(PREFETCH_JOB_DIR, exist_ok=True)
+        path = os.path.join(PREFETCH_JOB_DIR, f"{self.job_id}.json")
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(info, f, indent=2)
+        os.replace(tmp, path)
+
+    # --- execution ---
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name=self.job_id, daemon=True)
+        self._thread.start()
+        return self
+
+    def join(self, timeout=None):
+        """Wait for a started job; True once it has finished."""
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def run(self):
+        try:
+            self._run()
+            self.status = STATUS_COMPLETED
+            logger.info(f"Prefetch {self.job_id} finished: {self.info(details=False)['stages']}")
+        except Exception as e:
+            logger.error(f"Prefetch {self.job_id} failed: {e}", exc_info=True)
+            self.status = STATUS_FAILED
+            self.error = str(e)
+        self._write_job_file()
+        return self.info()
+
+    def _run(self):
+        # Downloads are done by the export poller; make sure one is running
+        export_poller.POLLER.start()
+        index = get_index()
+        queue = []
+        for key in self.counties:
+            try:
+                forest_tiles.find_forest_raster(key)
+            except FileNotFoundError:
+                queue.append(key)
+            else:
+                self._set(key, INGESTING)
+        queue.reverse()
+
+        with ThreadPoolExecutor(max_workers=self.ingest_workers, thread_name_prefix="prefetch-ingest") as ingest_pool:
+            for key in self.counties:
+                if self.counties[key]["stage"] == INGESTING:
+                    ingest_pool.submit(self._ingest, key)
+
+            while True:
+                active = 0
+                for key, county in list(self.counties.items()):
+                    if county["stage"] in (EXPORTING, DOWNLOADING):
+                        self._refresh(key, ingest_pool)
+                    if self.counties[key]["stage"] in (EXPORTING, DOWNLOADING):
+                        active += 1
+                while queue and active < self.concurrency:
+                    key = queue.pop()
+                    if self._start_export(key, index.geometry(key)):
+                        active += 1
+                    else:
+                        self._refresh(key, ingest_pool)
+                if not queue and active == 0:
+                    break
+                self._write_job_file()
+                time.sleep(POLL_SECONDS)
+            # Leaving the block waits for the remaining ingests
+
+    def _start_export(self, key, geometry):
+        """Claim and start (or attach to) the county's export; True if one is in flight."""
+        filename_key = forest_tiles.export_key(key)
+        outcome, entry = export_registry.claim(filename_key)
+        if outcome == export_registry.COMPLETED:
+            self._set(key, DOWNLOADING)
+            return False
+        if outcome == export_registry.ATTACHED:
+            self._set(key, EXPORTING, task_id=entry["task_id"])
+            return True
+        try:
+            task_id = export_forest_raster_async(geometry, GCS_BUCKET_NAME, filename_key,
+                                                 scale=GEOTIFF_EXPORT_SCALE, crs=GEOTIFF_EXPORT_CRS)
+        except Exception as e:
+            export_registry.fail(filename_key, e)
+            logger.error(f"Prefetch {self.job_id}: starting export for {key} failed: {e}")
+            self._set(key, FAILED, error=str(e))
+            return False
+        export_registry.set_task(filename_key, task_id)
+        export_poller.POLLER.wake()
+        self._set(key, EXPORTING, task_id=task_id)
+        return True
+
+    def _refresh(self, key, ingest_pool):
+        """Advance a county from its export registry entry."""
+        entry = export_registry.get(forest_tiles.export_key(key))
+        if entry is None:
+            self._set(key, FAILED, error="Export registry entry disappeared.")
+        elif entry["status"] == export_registry.STATUS_COMPLETED:
+            self._set(key, INGESTING)
+            ingest_pool.submit(self._ingest, key)
+        elif entry["status"] == export_registry.STATUS_FAILED:
+            self._set(key, FAILED, error=entry["error"])
+        elif entry["status"] == export_registry.STATUS_DOWNLOADING:
+            self._set(key, DOWNLOADING, task_id=entry["task_id"])
+        else:
+            self._set(key, EXPORTING, task_id=entry["task_id"])
+
+    def _ingest(self, key):
+        try:
+            ingest.ingest_raster(forest_tiles.find_forest_raster(key))
+            forest_tiles.tile_source(key)
+            self._set(key, DONE)
+        except Exception as e:
+            logger.error(f"Prefetch {self.job_id}: ingesting {key} failed: {e}", exc_info=True)
+            self._set(key, FAILED, error=str(e))
+
+
+# --- PUBLIC API ---
+
+def start_prefetch_job(county_keys=None, state=None, concurrency=None):
+    """
+    Start a prefetch job in the background.
+
+    Returns:
+        dict: The job info (see PrefetchJob.info).
+
+    Raises:
+        ValueError: See resolve_counties.
+    """
+    keys = resolve_counties(county_keys, state)
+    job = PrefetchJob(keys, concurrency=concurrency, label=state.upper() if state else None)
+    with _jobs_lock:
+        _jobs[job.job_id] = job
+    job.start()
+    return job.info()
+
+
+def get_prefetch_job(job_id, details=True):
+    """Job info from memory, or from its job file for jobs of another worker."""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    if job is not None:
+        return job.info(details)
+
+    path = os.path.join(PREFETCH_JOB_DIR, f"{os.path.basename(job_id)}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        info = json.load(f)
+    if not details:
+        info.pop("counties", None)
+    return info
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s - %(message)s")
+
+    parser = argparse.ArgumentParser(description="Export, download and ingest forest rasters for many counties.")
+    parser.add_argument("county_keys", nargs="*", help="County keys such as Dane_WI.")
+    parser.add_argument("--state", help="Prefetch every county of this state (e.g. WI).")
+    parser.add_argument("--concurrency", type=int, default=None, help="Max exports running at once.")
+    args = parser.parse_args()
+
+    job = PrefetchJob(resolve_counties(args.county_keys, args.state), concurrency=args.concurrency,
+                      label=args.state).start()
+    while not job.join(timeout=10):
+        info = job.info(details=False)
+        print(f"{info['progress']:.0%} {info['stages']}", flush=True)
+    print(json.dumps(job.info(), indent=2))
@@ -9,21 +9,29 @@ import os
 import logging
 import re
 
+from urllib.parse import quote
+
 from config import (
+    API_PREFIX,
     GCS_BUCKET_NAME,
     GCS_FOREST_EXPORTS_FOLDER,
     GEE_PROJECT_NAME,
     GEOTIFF_EXPORT_SCALE,
     GEOTIFF_EXPORT_CRS,
     GEOTIFF_DIR,
+    EXPORT_STATUS_MAX_WAIT_SECONDS,
+    EXPORT_ATTACH_WAIT_SECONDS,
 )
 
 from earthengine.service import (
+    GEEUnavailable,
     get_clipped_layer_url,
     export_forest_raster_async,
     get_task_status,
     download_gcs_file_to_local,
 )
+from earthengine import export_registry, export_poller
+from utils.metrics import EXPORT_STATUS_REQUESTS
 
 logger = logging.getLogger(__name__)
 
@@ -38,18 +46,37 @@ def get_dynamic_gee_layer():
     """
     This endpoint receives a GeoJSON geometry and returns a
     dynamic, clipped GEE tile URL. (For visualization)
+
+    If the body also names a 'countyKey' whose GeoTIFF is already in
+    GEOTIFF_DIR, the layer is served as local tiles instead (no Earth
+    Engine round trip); the response then has source='local' and bounds.
     """
     try:
         data = request.json
         if not data or 'geometry' not in data:
             logger.warning("API Call: /get_layer missing 'geometry'")
             return jsonify({"error": "Missing 'geometry' in request body"}), 400
-        
+
+        county_key = data.get('countyKey')
+        if county_key:
+            from wildfire_sim import forest_tiles  # rasterio
+            try:
+                info = forest_tiles.layer_info(county_key)
+            except FileNotFoundError:
+                logger.info(f"No local forest raster for {county_key}; using GEE layer.")
+            else:
+                url = (f"{request.host_url.rstrip('/')}{API_PREFIX}/forest_tiles/"
+                       f"{quote(county_key, safe='')}/{{z}}/{{x}}/{{y}}.png?v={info['version']}")
+                return jsonify({'url': url, 'source': 'local', 'bounds': info['bounds_wgs84']})
+
         # Call the service function to do the GEE work
         url = get_clipped_layer_url(data['geometry'])
         
-        return jsonify({ 'url': url })
+        return jsonify({ 'url': url, 'source': 'gee' })
 
+    except GEEUnavailable as e:
+        logger.warning(f"API Call: /get_layer while GEE is unavailable: {e}")
+        return jsonify({ 'error': str(e) }), 503
     except Exception as e:
         logger.error(f"API Error: /get_layer failed: {e}")
         return jsonify({ 'error': 'Failed to process GEE request' }), 500
@@ -81,41 +108,99 @@ def start_export():
     if os.path.exists(local_tif_path):
         return jsonify(status='COMPLETED', local_path=local_tif_path, filename_key=filename_key)
 
+    # Only one export per county at a time, across requests and workers:
+    # later requests attach to the task that is already running
+    outcome, entry = export_registry.claim(filename_key)
+    if outcome == export_registry.COMPLETED:
+        return jsonify(status='COMPLETED', local_path=entry['local_path'], filename_key=filename_key)
+    if outcome == export_registry.ATTACHED:
+        if not entry['task_id']:
+            # Briefly; if the task is still starting, answer without its id and
+            # let the client poll check-status by filename_key
+            entry = export_registry.wait_for_task(filename_key, timeout=EXPORT_ATTACH_WAIT_SECONDS)
+            if entry is None:
+                entry = export_registry.get(filename_key)
+                if entry is None or entry['status'] == export_registry.STATUS_FAILED:
+                    return jsonify(status='ERROR', error='Export for this county failed to start; retry.'), 503
+        logger.info(f"Export for {filename_key} already in progress; attaching to task {entry['task_id']}.")
+        return jsonify(status='PROCESSING', task_id=entry['task_id'], filename_key=filename_key, attached=True)
+
     # Start raster export via Earth Engine -> GCS
     try:
         task_id = export_forest_raster_async(geometry, GCS_BUCKET_NAME, filename_key,
                                              scale=GEOTIFF_EXPORT_SCALE, crs=GEOTIFF_EXPORT_CRS)
+    except GEEUnavailable as e:
+        export_registry.fail(filename_key, e)
+        return jsonify(status='ERROR', error=str(e)), 503
     except Exception as e:
+        export_registry.fail(filename_key, e)
         current_app.logger.exception("Failed to start raster export")
         return jsonify(status='ERROR', error=str(e)), 500
 
+    export_registry.set_task(filename_key, task_id)
+    export_poller.POLLER.wake()
     return jsonify(status='PROCESSING', task_id=task_id, filename_key=filename_key)
 
+@gee_bp.route('/check-status', defaults={'task_id': None}, methods=['GET'])
 @gee_bp.route('/check-status/<task_id>', methods=['GET'])
 def check_export_status(task_id):
     filename_key = request.args.get('filename_key')
     if not filename_key:
         return jsonify(status='ERROR', error='missing filename_key param'), 400
 
+    # Another request may already have downloaded it
+    local_path = os.path.join(GEOTIFF_DIR, f"{filename_key}.tif")
+    if os.path.exists(local_path):
+        return jsonify(status='COMPLETED', local_path=local_path)
+
+    # With the export poller running, answer from the registry it keeps up
+    # to date (no GEE call); ?wait=<seconds> long-polls for the next change
+    entry = export_registry.get(filename_key)
+    if task_id is None:
+        # Attached to an export whose task had not started yet: follow the
+        # registry entry until it has a task id (returned to the client)
+        if entry is None:
+            return jsonify(status='ERROR', error=f'No export for {filename_key}'), 404
+        if not entry['task_id']:
+            wait = min(request.args.get('wait', 0, type=float), EXPORT_STATUS_MAX_WAIT_SECONDS)
+            if wait > 0 and entry['status'] == export_registry.STATUS_STARTING:
+                entry = export_registry.wait_for_change(filename_key, entry['status'], wait) or entry
+            if not entry['task_id']:
+                return _registry_status_response(entry)
+        task_id = entry['task_id']
+
+    if export_poller.POLLER.is_running() and entry is not None and entry['task_id'] == task_id:
+        EXPORT_STATUS_REQUESTS.labels("registry").inc()
+        wait = min(request.args.get('wait', 0, type=float), EXPORT_STATUS_MAX_WAIT_SECONDS)
+        if wait > 0 and entry['status'] in export_registry.IN_FLIGHT:
+            entry = export_registry.wait_for_change(filename_key, entry['status'], wait) or entry
+        return _registry_status_response(entry)
+
+    EXPORT_STATUS_REQUESTS.labels("gee").inc()
     # get_task_status should map EE states to 'PROCESSING'/'DONE'/'FAILED'
     try:
         status_info = get_task_status(task_id)
+    except GEEUnavailable as e:
+        return jsonify(status='ERROR', error=str(e)), 503
     except Exception as e:
         current_app.logger.exception("Failed to get task status")
         return jsonify(status='ERROR', error=str(e)), 500
 
     status = status_info.get('status')
     if status == 'PROCESSING':
-        return jsonify(status='PROCESSING')
+        return jsonify(status='PROCESSING', task_id=task_id)
 
     if status == 'FAILED':
+        export_registry.fail(filename_key, status_info.get('error'), task_id=task_id)
         return jsonify(status='FAILED', error=status_info.get('error')), 500
 
     # status == 'DONE' (or equivalent)
     blob_prefix = f"{GCS_FOREST_EXPORTS_FOLDER.rstrip('/')}/{filename_key}"
-    local_path = os.path.join(GEOTIFF_DIR, f"{filename_key}.tif")
+    from wildfire_sim import ingest  # rasterio
     try:
         downloaded_path = download_gcs_file_to_local(GCS_BUCKET_NAME, blob_prefix, local_path, project=GEE_PROJECT_NAME)
+        ingest.ingest_raster(downloaded_path)
+        export_registry.complete(filename_key, downloaded_path)
         return jsonify(status='COMPLETED', local_path=downloaded_path)
     except FileNotFoundError:
         # GCS object not yet available — let the frontend poll again
@@ -124,3 +209,51 @@ def check_export_status(task_id):
     except Exception as e:
         current_app.logger.exception("Error downloading exported file from GCS")
         return jsonify(status='ERROR', error=str(e)), 500
+
+
+@gee_bp.route('/prefetch', methods=['POST'])
+def start_prefetch():
+    """
+    Export, download and ingest forest rasters for many counties ahead of time.
+
+    Body: {"state": "WI"} or {"counties": ["Dane_WI", ...]}, optional
+    "concurrency" (max exports running at once). Returns 202 with the job;
+    poll GET /prefetch/<job_id> (?details=0 omits the per-county list).
+    """
+    from earthengine.prefetch import start_prefetch_job  # county index, rasterio
+
+    data = request.get_json(silent=True) or {}
+    try:
+        concurrency = int(data['concurrency']) if data.get('concurrency') is not None else None
+    except (TypeError, ValueError):
+        concurrency = 0
+    if concurrency is not None and concurrency < 1:
+        return jsonify({'success': False, 'error': 'Bad request', 'message': 'concurrency must be a positive integer.'}), 400
+    try:
+        info = start_prefetch_job(county_keys=data.get('counties'), state=data.get('state'),
+                                  concurrency=concurrency)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': 'Bad request', 'message': str(e)}), 400
+    return jsonify({'success': True, 'job': info}), 202
+
+
+@gee_bp.route('/prefetch/<job_id>', methods=['GET'])
+def prefetch_status(job_id):
+    """Progress of a prefetch job: counties per stage and, by default, each county's stage."""
+    from earthengine.prefetch import get_prefetch_job
+
+    info = get_prefetch_job(job_id, details=request.args.get('details', '1') != '0')
+    if info is None:
+        return jsonify({'success': False, 'error': 'Not found', 'message': f'No prefetch job {job_id}.'}), 404
+    return jsonify({'success': True, 'job': info})
+
+
+def _registry_status_response(entry):
+    """check-status response for an export registry entry."""
+    status = entry['status']
+    if status == export_registry.STATUS_COMPLETED:
+        return jsonify(status='COMPLETED', local_path=entry['local_path'])
+    if status == export_registry.STATUS_FAILED:
+        return jsonify(status='FAILED', error=entry['error']), 500
+    # starting / running / downloading
+    return jsonify(status='PROCESSING', stage=status, task_id=entry['task_id'])
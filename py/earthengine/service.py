@@ -5,25 +5,58 @@ Handles all Google Earth Engine (GEE) authentication,
 initialization, and data processing.
 """
 
-import ee
 import json
 import logging
 import os
-import gzip
-import shutil
-import zipfile
-
-from google.cloud import storage
+import threading
+import time
+from functools import lru_cache
 
 from config import (
+    GEE_FAKE,
+    GEE_INIT_MODE,
+    GEE_INIT_RETRY_SECONDS,
+    GEE_INIT_TIMEOUT_SECONDS,
     GEE_PROJECT_NAME,
     GCS_FOREST_EXPORTS_FOLDER,
     SERVICE_ACCOUNT_JSON_PATH,
 )
+from earthengine import gcs
+from earthengine.cache import MAP_ID_CACHE, INFO_CACHE, geometry_hash
 from utils.constants import STATE_ABBR_TO_FIPS
+from utils.metrics import GEE_CALL_SECONDS, APP_STARTUP_SECONDS
 
 logger = logging.getLogger(__name__)
 
+# The `ee` module (or earthengine/fake_ee.py), imported on first use: it takes
+# a few hundred ms and is not needed by simulation-only workers
+ee = None
+
+_init_lock = threading.Lock()
+_init_done = threading.Event()
+_init_error = None
+_init_failed_at = None
+_init_thread = None
+# Seconds spent importing `ee` and in ee.Initialize (see gee_status)
+GEE_TIMINGS = {}
+
+
+class GEEUnavailable(RuntimeError):
+    """Earth Engine is still initialising or could not be initialised."""
+
+
+def _import_ee():
+    global ee
+    if ee is None:
+        start = time.perf_counter()
+        if GEE_FAKE:
+            from earthengine import fake_ee as module
+        else:
+            import ee as module
+        ee = module
+        GEE_TIMINGS["import_seconds"] = round(time.perf_counter() - start, 4)
+    return ee
+
 # --- GEE Initialization ---
 def initialize_gee(project=GEE_PROJECT_NAME, service_account_json_path=SERVICE_ACCOUNT_JSON_PATH):
     """
@@ -33,6 +66,11 @@ def initialize_gee(project=GEE_PROJECT_NAME, service_account_json_path=SERVICE_A
 
     Raises a clear error if neither is available.
     """
+    _import_ee()
+    if GEE_FAKE:
+        ee.Initialize(project=project)
+        logger.warning("Using the offline Earth Engine stand-in (WILDFIRE_FAKE_EE); no real GEE calls are made.")
+        return
 
     # Case 1: Explicit path provided via config.py
     if service_account_json_path:
@@ -63,12 +101,111 @@ def initialize_gee(project=GEE_PROJECT_NAME, service_account_json_path=SERVICE_A
 
     # Initialize Earth Engine (ADC is now guaranteed)
     try:
-        ee.Initialize(project=project)
+        with GEE_CALL_SECONDS.labels(operation="initialize").time():
+            ee.Initialize(project=project)
         logger.info("Earth Engine initialized successfully (project=%s).", project)
     except Exception as e:
         logger.exception("Earth Engine initialization failed.")
         raise
 
+
+def _initialize():
+    """Run initialize_gee once (per failure retry window) and record the outcome."""
+    global _init_error, _init_failed_at
+    with _init_lock:
+        if _init_done.is_set():
+            return
+        start = time.perf_counter()
+        try:
+            initialize_gee()
+            _init_error = None
+        except Exception as e:
+            _init_error, _init_failed_at = e, time.time()
+        GEE_TIMINGS["init_seconds"] = round(time.perf_counter() - start, 4)
+        APP_STARTUP_SECONDS.labels(phase="gee_init").set(GEE_TIMINGS["init_seconds"])
+        _init_done.set()
+
+
+def start_gee(mode=GEE_INIT_MODE):
+    """
+    Start Earth Engine according to GEE_INIT_MODE:
+        eager       initialise now; raises if it fails (the old behaviour)
+        background  initialise in a thread; requests wait for it (ensure_gee)
+        lazy        initialise on the first request that needs Earth Engine
+    """
+    global _init_thread
+    if mode == "eager":
+        _initialize()
+        if _init_error is not None:
+            raise _init_error
+    elif mode == "background":
+        if _init_thread is None:
+            _init_thread = threading.Thread(target=_initialize, name="gee-init", daemon=True)
+            _init_thread.start()
+    elif mode != "lazy":
+        raise ValueError(f"Unknown GEE_INIT_MODE: {mode}")
+
+
+def ensure_gee(timeout=GEE_INIT_TIMEOUT_SECONDS):
+    """
+    The initialised `ee` module, initialising it first if needed (waiting
+    up to `timeout` seconds for a background start). A failed start is
+    retried after GEE_INIT_RETRY_SECONDS.
+
+    Raises:
+        GEEUnavailable: If Earth Engine is not ready.
+    """
+    if _init_done.is_set() and _init_error is not None and time.time() - _init_failed_at >= GEE_INIT_RETRY_SECONDS:
+        _init_done.clear()
+    if not _init_done.is_set():
+        if _init_thread is not None and _init_thread.is_alive():
+            _init_done.wait(timeout)
+        else:
+            _initialize()
+    if not _init_done.is_set():
+        raise GEEUnavailable("Earth Engine is still initialising; retry shortly.")
+    if _init_error is not None:
+        raise GEEUnavailable(f"Earth Engine is unavailable: {_init_error}")
+    return ee
+
+
+def gee_status():
+    """Initialisation state ('not_started', 'initializing', 'ready', 'failed') and timings."""
+    if _init_done.is_set():
+        state = "failed" if _init_error is not None else "ready"
+    elif _init_thread is not None or _init_lock.locked():
+        state = "initializing"
+    else:
+        state = "not_started"
+    return {"state": state, "error": str(_init_error) if _init_error else None, **GEE_TIMINGS}
+
+# --- Dynamic World composite ---
+DW_DATASET = 'GOOGLE/DYNAMICWORLD/V1'
+DW_START_DATE = '2024-01-01'
+DW_END_DATE = '2024-12-31'
+FOREST_MASK_VIS_PARAMS = {'min': 0, 'max': 1, 'palette': ['000000', '00ff00']}
+
+
+@lru_cache(maxsize=8)
+def _dw_median(start_date=DW_START_DATE, end_date=DW_END_DATE):
+    """Median Dynamic World composite for a date range (expression built once per process)."""
+    return ee.ImageCollection(DW_DATASET).filter(ee.Filter.date(start_date, end_date)).median()
+
+def county_region(county_name: str, state_fips_or_abbr: str):
+    """
+    Export region (bounding-box polygon coordinates) of a county from the
+    local county index; falls back to TIGER on Earth Engine for counties
+    the index does not know.
+    """
+    from utils.county_index import get_index  # shapely; built on first use
+
+    record = get_index().by_name(county_name, state_fips_or_abbr)
+    if record is None:
+        logger.warning(f"{county_name} ({state_fips_or_abbr}) not in the local county index; using TIGER.")
+        return region_from_tiger(county_name, state_fips_or_abbr)
+    west, south, east, north = record["bbox"]
+    return [[[west, south], [east, south], [east, north], [west, north], [west, south]]]
+
 # Helper for region aoi definition using TIGER dataCollection
 
 def region_from_tiger(county_name: str, state_fips_or_abbr: str):
@@ -80,28 +217,36 @@ def region_from_tiger(county_name: str, state_fips_or_abbr: str):
         st = STATE_ABBR_TO_FIPS.get(st.upper(), st)
     st = str(st).zfill(2)
 
-    counties = ee.FeatureCollection('TIGER/2018/Counties')
-    fc = counties.filter(ee.Filter.And(
-        ee.Filter.eq('STATEFP', st),
-        ee.Filter.eq('NAME', county_name)
-    ))
+    def compute():
+        ensure_gee()
+        counties = ee.FeatureCollection('TIGER/2018/Counties')
+        fc = counties.filter(ee.Filter.And(
+            ee.Filter.eq('STATEFP', st),
+            ee.Filter.eq('NAME', county_name)
+        ))
 
 
-    feat = fc.first()
-    if feat is None:
-        raise ValueError(f"County not found: {county_name} ({state_fips_or_abbr})")
+        feat = fc.first()
+        if feat is None:
+            raise ValueError(f"County not found: {county_name} ({state_fips_or_abbr})")
 
-    geom = fc.geometry().bounds()
+        geom = fc.geometry().bounds()
 
-    try:
-        geom_info = geom.getInfo()
-    except Exception as e:
-        raise RuntimeError("Failed to materialize county geometry") from e
+        try:
+            with GEE_CALL_SECONDS.labels(operation="getInfo").time():
+                geom_info = geom.getInfo()
+        except Exception as e:
+            raise RuntimeError("Failed to materialize county geometry") from e
+
+        if "coordinates" not in geom_info:
+            raise RuntimeError("Unexpected geometry format from TIGER")
 
-    if "coordinates" not in geom_info:
-        raise RuntimeError("Unexpected geometry format from TIGER")
+        return geom_info["coordinates"]
 
-    return geom_info["coordinates"]
+    # County boundaries do not change; cache the materialised bounds
+    return INFO_CACHE.get_or_compute(
+        {"op": "county_bounds", "dataset": "TIGER/2018/Counties", "state": st, "county": county_name},
+        compute)
 
 # These should be defined in config
 # GCS_BUCKET_NAME = os.environ.get('GCS_BUCKET_NAME')
@@ -115,29 +260,23 @@ def export_forest_raster_async(geometry_geojson=None, bucket_name=None, filename
                                county_name: str = None, state_fips_or_abbr: str = None):
     if bucket_name is None or filename_key is None:
         raise ValueError("bucket_name and filename_key are required")
+    ensure_gee()
 
     if county_name and state_fips_or_abbr:
-        region = region_from_tiger(county_name, state_fips_or_abbr)
-        geom_obj = ee.Geometry(region)
-    else:
-        if geometry_geojson is None:
-            raise ValueError("Either county_name+state_fips_or_abbr or geometry_geojson must be provided")
+        region = county_region(county_name, state_fips_or_abbr)
+        geom_obj = ee.Geometry({"type": "Polygon", "coordinates": region})
+    elif geometry_geojson is not None:
+        # Already GeoJSON: used as the export region as-is, no getInfo round trip
         if isinstance(geometry_geojson, str):
-            geom_obj = ee.Geometry(json.loads(geometry_geojson))
-        else:
-            geom_obj = ee.Geometry(geometry_geojson)
-        try:
-            region = geom_obj.getInfo()
-        except Exception:
-            # try bounds as a safer fallback
-            try:
-                region = geom_obj.bounds().getInfo()
-            except Exception as e:
-                raise RuntimeError("Failed to serialize AOI for export; provide a simpler geometry or use county_name/state") from e
+            geometry_geojson = json.loads(geometry_geojson)
+        region = geometry_geojson
+        geom_obj = ee.Geometry(geometry_geojson)
+    else:
+        raise ValueError("Either county_name+state_fips_or_abbr or geometry_geojson must be provided")
 
     dw_image = (
-        ee.ImageCollection('GOOGLE/DYNAMICWORLD/V1')
-        .filter(ee.Filter.date('2024-01-01', '2024-12-31'))
+        ee.ImageCollection(DW_DATASET)
+        .filter(ee.Filter.date(DW_START_DATE, DW_END_DATE))
         .filterBounds(geom_obj)
         .median()
     )
@@ -157,7 +296,8 @@ def export_forest_raster_async(geometry_geojson=None, bucket_name=None, filename
         maxPixels=int(max_pixels),
         fileFormat=file_format
     )
-    task.start()
+    with GEE_CALL_SECONDS.labels(operation="export_start").time():
+        task.start()
     return task.id
 
 
@@ -166,6 +306,10 @@ def get_clipped_layer_url(geometry):
     """
     Generates a dynamic GEE tile URL for the 'trees' layer,
     clipped to the provided GeoJSON geometry.
+
+    Map IDs are cached (see earthengine/cache.py) by dataset, date range,
+    visualisation params and geometry hash, so repeated requests for the
+    same county skip the getMapId round trip.
     
     :param geometry: A GeoJSON geometry (as a Python dict)
     :return: A string containing the tile URL
@@ -174,26 +318,29 @@ def get_clipped_layer_url(geometry):
         logger.warning("get_clipped_layer_url called with no geometry.")
         raise ValueError("No geometry provided for clipping.")
 
+    params = {
+        "op": "forest_mask",
+        "dataset": DW_DATASET,
+        "date_range": [DW_START_DATE, DW_END_DATE],
+        "vis": FOREST_MASK_VIS_PARAMS,
+        "geometry": geometry_hash(geometry),
+    }
+    return MAP_ID_CACHE.get_or_compute(params, lambda: _forest_mask_tile_url(geometry))
+
+
+def _forest_mask_tile_url(geometry):
+    ensure_gee()
     try:
         ee_geometry = ee.Geometry(geometry)
-        dwCollection = ee.ImageCollection('GOOGLE/DYNAMICWORLD/V1')
-        recentImage = dwCollection \
-            .filter(ee.Filter.date('2024-01-01', '2024-12-31')) \
-            .median()
-        
-        forestMask = recentImage.select('label').eq(1)
-        forestLayer = recentImage.updateMask(forestMask)
-        clippedLayer = forestLayer.clip(ee_geometry)
-
-        # build a binary mask image for visualization
-        forestMaskVis = forestMask.selfMask()
-        visParams = {
-            'min': 0, 'max': 1, 'palette': ['000000','00ff00']
-        }
-        map_id_object = ee.data.getMapId({
-            'image': forestMaskVis,
-            'visParams': visParams,
-        })
+        forestMask = _dw_median().select('label').eq(1)
+
+        # build a binary mask image for visualization, clipped to the geometry
+        forestMaskVis = forestMask.clip(ee_geometry).selfMask()
+        with GEE_CALL_SECONDS.labels(operation="getMapId").time():
+            map_id_object = ee.data.getMapId({
+                'image': forestMaskVis,
+                'visParams': FOREST_MASK_VIS_PARAMS,
+            })
 
         logger.info(f"GEE getMapId() response object: {map_id_object}")
 
@@ -220,45 +367,76 @@ def get_task_status(task_id):
     """
     if not task_id:
         raise ValueError("No task_id provided to check status.")
+    ensure_gee()
     
     try:
         # ee.data.getTaskStatus returns a list of tasks.
         # We need to get the first (and only) item from that list.
-        status_list = ee.data.getTaskStatus(task_id)
+        with GEE_CALL_SECONDS.labels(operation="getTaskStatus").time():
+            status_list = ee.data.getTaskStatus(task_id)
         
         if not status_list:
             logger.error(f"No task found with ID {task_id}")
             return {'status': 'FAILED', 'error': 'Task ID not found.'}
 
-        status = status_list[0]
-        task_state = status.get('state')
-        
-        if task_state == 'RUNNING' or task_state == 'READY':
-            logger.info(f"Task {task_id} is still {task_state}.")
-            return { 'status': 'PROCESSING', 'task_id': task_id }
-        
-        elif task_state == 'COMPLETED':
-            gcs_uri = status.get('destination_uris', [None])[0]
-            if not gcs_uri:
-                logger.error(f"Task {task_id} COMPLETED but no destination_uris found.")
-                return {'status': 'FAILED', 'error': 'Completed but no file path found.'}
-            logger.info(f"Task {task_id} is COMPLETED. File at: {gcs_uri}")
-            return { 'status': 'DONE', 'task_id': task_id, 'gcs_uri': gcs_uri }
-
-        elif task_state == 'FAILED':
-            error_msg = status.get('error_message', 'Unknown error')
-            logger.error(f"Task {task_id} FAILED: {error_msg}")
-            return { 'status': 'FAILED', 'task_id': task_id, 'error': error_msg }
-        
-        else:
-            logger.warning(f"Task {task_id} has unhandled state: {task_state}")
-            return {'status': task_state}
+        return _task_status_info(task_id, status_list[0])
 
     except Exception as e:
         logger.error(f"Error checking status for task {task_id}: {e}")
         raise
 
 
+def get_task_statuses(task_ids):
+    """
+    Status of several GEE tasks with a single getTaskStatus call.
+
+    Returns:
+        dict: task_id -> the same dict get_task_status returns.
+    """
+    task_ids = list(task_ids)
+    if not task_ids:
+        return {}
+    ensure_gee()
+    with GEE_CALL_SECONDS.labels(operation="getTaskStatus").time():
+        status_list = ee.data.getTaskStatus(task_ids)
+
+    by_id = {status.get('id'): status for status in status_list or []}
+    results = {}
+    for task_id in task_ids:
+        status = by_id.get(task_id)
+        if status is None:
+            results[task_id] = {'status': 'FAILED', 'task_id': task_id, 'error': 'Task ID not found.'}
+        else:
+            results[task_id] = _task_status_info(task_id, status)
+    return results
+
+
+def _task_status_info(task_id, status):
+    """Map one ee.data.getTaskStatus entry to PROCESSING / DONE / FAILED."""
+    task_state = status.get('state')
+
+    if task_state == 'RUNNING' or task_state == 'READY':
+        logger.info(f"Task {task_id} is still {task_state}.")
+        return { 'status': 'PROCESSING', 'task_id': task_id }
+
+    elif task_state == 'COMPLETED':
+        gcs_uri = status.get('destination_uris', [None])[0]
+        if not gcs_uri:
+            logger.error(f"Task {task_id} COMPLETED but no destination_uris found.")
+            return {'status': 'FAILED', 'error': 'Completed but no file path found.'}
+        logger.info(f"Task {task_id} is COMPLETED. File at: {gcs_uri}")
+        return { 'status': 'DONE', 'task_id': task_id, 'gcs_uri': gcs_uri }
+
+    elif task_state == 'FAILED':
+        error_msg = status.get('error_message', 'Unknown error')
+        logger.error(f"Task {task_id} FAILED: {error_msg}")
+        return { 'status': 'FAILED', 'task_id': task_id, 'error': error_msg }
+
+    else:
+        logger.warning(f"Task {task_id} has unhandled state: {task_state}")
+        return {'status': task_state}
+
+
 def download_gcs_file_to_local(bucket_name, blob_prefix, local_path, project=None):
     """
     List blobs in bucket_name matching blob_prefix and download an appropriate GeoTIFF.
@@ -266,54 +444,12 @@ def download_gcs_file_to_local(bucket_name, blob_prefix, local_path, project=Non
     - local_path: final path on local disk (e.g., /data/tifs/county_key.tif)
     Returns: path to the downloaded local file.
     Raises FileNotFoundError if nothing found.
-    """
-    storage_client = storage.Client(project=project)
-    blobs = list(storage_client.list_blobs(bucket_name, prefix=blob_prefix))
 
-    if not blobs:
-        raise FileNotFoundError(f"No GCS objects found for prefix: {blob_prefix}")
-
-    # Prefer common TIFF-like objects
-    preferred = []
-    for b in blobs:
-        name = b.name.lower()
-        if name.endswith('.tif') or name.endswith('.tif.gz') or name.endswith('.tif.zip') or name.endswith('.zip'):
-            preferred.append(b)
-
-    if preferred:
-        selected = preferred[0]
-    else:
-        # fallback to first blob if no preferred extension
-        selected = blobs[0]
-
-    tmp_download = local_path + '.download'
-    os.makedirs(os.path.dirname(tmp_download), exist_ok=True)
-    selected.download_to_filename(tmp_download)
-
-    # If gzipped, ungzip
-    if selected.name.lower().endswith('.gz'):
-        with gzip.open(tmp_download, 'rb') as f_in:
-            with open(local_path, 'wb') as f_out:
-                shutil.copyfileobj(f_in, f_out)
-        os.remove(tmp_download)
-        return local_path
-
-    # If zip: extract first .tif inside
-    if selected.name.lower().endswith('.zip'):
-        with zipfile.ZipFile(tmp_download, 'r') as z:
-            tif_names = [n for n in z.namelist() if n.lower().endswith('.tif')]
-            if not tif_names:
-                os.remove(tmp_download)
-                raise FileNotFoundError("Zip did not contain any .tif files")
-            # extract first tif to local_path
-            with z.open(tif_names[0]) as zf, open(local_path, 'wb') as out_f:
-                shutil.copyfileobj(zf, out_f)
-        os.remove(tmp_download)
-        return local_path
-
-    # Otherwise move tmp to final
-    os.replace(tmp_download, local_path)
-    return local_path
+    See earthengine/gcs.py: pooled client, parallel ranged download,
+    streaming decompression, checksum verification and atomic rename.
+    """
+    blob = gcs.select_blob(bucket_name, blob_prefix, project=project)
+    return gcs.download_blob(blob, local_path)
 
 # --- LEGACY ---
 
@@ -331,6 +467,7 @@ def export_forest_geometry_async(geometry, bucket_name, filename_key):
     if not geometry: raise ValueError("No geometry")
     if not bucket_name: raise ValueError("GCS bucket name not configured")
     if not filename_key: raise ValueError("filename_key is required")
+    ensure_gee()
 
     try:
         # Use the human-readable key for the GCS file path
@@ -377,6 +514,7 @@ def export_forest_geometry_to_drive(geometry, file_name="forest_geometry"):
     if not geometry:
         logger.warning("export_forest_geometry_to_drive called with no geometry.")
         raise ValueError("No geometry provided for export.")
+    ensure_gee()
 
     try:
         ee_geometry = ee.Geometry(geometry)
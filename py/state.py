@@ -3,30 +3,348 @@ state.py
 ---------------------------------------------
 Thread-safe runtime key-value store for wildfire simulation.
 Use only if you need to persist small shared data across modules.
+
+Entries may carry a TTL (seconds) and the store is bounded: keys are spread
+over STATE_SHARDS independently locked LRU shards holding at most
+STATE_MAX_BYTES together, so a busy key does not block the others and old
+entries are evicted instead of accumulating. The budget is shared: a set
+that goes over it evicts from its own shard first, then from the others,
+so any value up to STATE_MAX_BYTES can be stored.
+
+With STATE_BACKEND = "sqlite" (WILDFIRE_STATE_BACKEND) set_value / get_value
+go to a SQLite file shared by all workers (values are pickled). It is LRU
+too: reads refresh an entry's access time (at most every
+STATE_TOUCH_SECONDS per key and process), and triggers keep the total size
+in a one-row table so writes do not sum the table. Objects that
+only make sense in one process, such as compiled forest-shape predicates,
+are kept in process memory with get_or_create either way.
+
+    set_value("forest_shape", geojson, ttl=3600)
+    get_value("forest_shape")
+    predicate = get_or_create(("forest_predicate", digest), build, ttl=3600)
 """
 
+import logging
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
 from threading import Lock
 
-_store = {}
-_lock = Lock()
+try:
+    from config import STATE_BACKEND, STATE_DB_PATH, STATE_MAX_BYTES, FOREST_SHAPE_TTL_SECONDS
+except ImportError:
+    STATE_BACKEND = "memory"
+    STATE_DB_PATH = os.path.join(os.getcwd(), "state.sqlite3")
+    STATE_MAX_BYTES = 64 * 1024 * 1024
+    FOREST_SHAPE_TTL_SECONDS = 6 * 3600
+
+logger = logging.getLogger(__name__)
+
+STATE_SHARDS = 16
+# SqliteStore writes an entry's access time on reads at most this often
+STATE_TOUCH_SECONDS = 60
+FOREST_SHAPE_KEY = "forest_shape"
+
+_MISSING = object()
+
+
+def _sizeof(value, depth=0):
+    """Approximate bytes held by a value (numpy arrays and objects with `nbytes` report their own)."""
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    size = sys.getsizeof(value)
+    if depth < 8:
+        if isinstance(value, dict):
+            size += sum(_sizeof(k, depth + 1) + _sizeof(v, depth + 1) for k, v in value.items())
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            size += sum(_sizeof(v, depth + 1) for v in value)
+    return size
+
+
+class _Shard:
+    """One LRU partition: key -> (value, expires or None, size)."""
+
+    def __init__(self):
+        self.nbytes = 0
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key, now):
+        entry = self.entries.get(key)
+        if entry is None:
+            return _MISSING
+        value, expires, size = entry
+        if expires is not None and expires <= now:
+            del self.entries[key]
+            self.nbytes -= size
+            return _MISSING
+        self.entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, expires, size):
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.nbytes -= old[2]
+        self.entries[key] = (value, expires, size)
+        self.nbytes += size
+
+    def pop(self, key):
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.nbytes -= old[2]
+
+    def expire(self, now):
+        """Drop expired entries; returns the bytes freed."""
+        freed = 0
+        for key, (_, expires, size) in list(self.entries.items()):
+            if expires is not None and expires <= now:
+                del self.entries[key]
+                freed += size
+        self.nbytes -= freed
+        return freed
+
+    def evict(self, nbytes, keep):
+        """Drop least recently used entries (never `keep`) until nbytes are freed; returns the bytes freed."""
+        freed = 0
+        for key in list(self.entries):
+            if freed >= nbytes:
+                break
+            if key != keep:
+                freed += self.entries.pop(key)[2]
+        self.nbytes -= freed
+        return freed
+
+
+class MemoryStore:
+    def __init__(self, max_bytes=STATE_MAX_BYTES, shards=STATE_SHARDS):
+        self.max_bytes = max_bytes
+        self._shards = [_Shard() for _ in range(shards)]
+
+    def _shard(self, key):
+        return self._shards[hash(key) % len(self._shards)]
+
+    def get(self, key, default=None):
+        shard = self._shard(key)
+        with shard.lock:
+            value = shard.get(key, time.time())
+        return default if value is _MISSING else value
+
+    def set(self, key, value, ttl=None):
+        size = _sizeof(value)
+        if size > self.max_bytes:
+            logger.warning(f"State entry {key!r} ({size} bytes) exceeds STATE_MAX_BYTES "
+                           f"({self.max_bytes} bytes); not stored.")
+            self.delete(key)
+            return
+        shard = self._shard(key)
+        expires = time.time() + ttl if ttl else None
+        with shard.lock:
+            shard.set(key, value, expires, size)
+        if sum(s.nbytes for s in self._shards) > self.max_bytes:
+            self._evict(key)
+
+    def _evict(self, keep):
+        """
+        Bring the store back under max_bytes: expired entries first, then least
+        recently used ones, starting with keep's shard. Takes one shard lock at
+        a time.
+        """
+        now = time.time()
+        excess = sum(s.nbytes for s in self._shards) - self.max_bytes
+        for shard in self._shards:
+            if excess <= 0:
+                return
+            with shard.lock:
+                excess -= shard.expire(now)
+        first = self._shards.index(self._shard(keep))
+        for shard in self._shards[first:] + self._shards[:first]:
+            if excess <= 0:
+                return
+            with shard.lock:
+                excess -= shard.evict(excess, keep)
+
+    def delete(self, key):
+        shard = self._shard(key)
+        with shard.lock:
+            shard.pop(key)
 
-def set_value(key, value):
-    """Set a value in the store."""
-    with _lock:
-        _store[key] = value
+    def get_or_create(self, key, factory, ttl=None):
+        """Value for key, built with factory() and stored if missing or expired."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            # Built outside the shard lock; concurrent builders of one key both
+            # build, the last one stored wins
+            value = factory()
+            self.set(key, value, ttl)
+        return value
+
+    def snapshot(self):
+        now = time.time()
+        items = {}
+        for shard in self._shards:
+            with shard.lock:
+                for key in list(shard.entries):
+                    value = shard.get(key, now)
+                    if value is not _MISSING:
+                        items[key] = value
+        return items
+
+    def stats(self):
+        entries = nbytes = 0
+        for shard in self._shards:
+            with shard.lock:
+                entries += len(shard.entries)
+                nbytes += shard.nbytes
+        return {"backend": "memory", "entries": entries, "bytes": nbytes, "max_bytes": self.max_bytes}
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    key      TEXT PRIMARY KEY,
+    value    BLOB NOT NULL,
+    size     INTEGER NOT NULL,
+    expires  REAL,
+    updated  REAL NOT NULL  -- last write or (throttled) read: the LRU order
+);
+CREATE INDEX IF NOT EXISTS state_updated ON state (updated);
+CREATE TABLE IF NOT EXISTS state_total (
+    id     INTEGER PRIMARY KEY CHECK (id = 0),
+    bytes  INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO state_total (id, bytes) SELECT 0, COALESCE(SUM(size), 0) FROM state;
+CREATE TRIGGER IF NOT EXISTS state_insert AFTER INSERT ON state
+    BEGIN UPDATE state_total SET bytes = bytes + new.size; END;
+CREATE TRIGGER IF NOT EXISTS state_delete AFTER DELETE ON state
+    BEGIN UPDATE state_total SET bytes = bytes - old.size; END;
+CREATE TRIGGER IF NOT EXISTS state_resize AFTER UPDATE OF size ON state
+    BEGIN UPDATE state_total SET bytes = bytes - old.size + new.size; END;
+"""
+
+
+class SqliteStore:
+    """
+    The same interface over a SQLite file shared by every worker process.
+    Keys are stored as their repr; values must pickle.
+    """
+
+    def __init__(self, path=STATE_DB_PATH, max_bytes=STATE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._touched = {}  # key -> last time this process wrote its access time
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, default=None):
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute("SELECT value, expires FROM state WHERE key = ?", (repr(key),)).fetchone()
+        if row is None or (row[1] is not None and row[1] <= now):
+            return default
+        if now - self._touched.get(repr(key), 0) >= STATE_TOUCH_SECONDS:
+            self._touched[repr(key)] = now
+            conn.execute("UPDATE state SET updated = ? WHERE key = ?", (now, repr(key)))
+        return pickle.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            "INSERT INTO state (key, value, size, expires, updated) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, size = excluded.size, "
+            "expires = excluded.expires, updated = excluded.updated",
+            (repr(key), data, len(data), now + ttl if ttl else None, now))
+        self._touched[repr(key)] = now
+        total = conn.execute("SELECT bytes FROM state_total").fetchone()[0]
+        if total > self.max_bytes:
+            self._evict(conn, repr(key), now)
+
+    def _evict(self, conn, keep, now):
+        """Drop expired entries, then least recently used ones, until the store fits."""
+        conn.execute("DELETE FROM state WHERE expires IS NOT NULL AND expires <= ? AND key != ?", (now, keep))
+        total = conn.execute("SELECT bytes FROM state_total").fetchone()[0]
+        for key, size in conn.execute("SELECT key, size FROM state ORDER BY updated").fetchall():
+            if total <= self.max_bytes:
+                break
+            if key != keep:
+                conn.execute("DELETE FROM state WHERE key = ?", (key,))
+                self._touched.pop(key, None)
+                total -= size
+
+    def delete(self, key):
+        self._connect().execute("DELETE FROM state WHERE key = ?", (repr(key),))
+
+    def snapshot(self):
+        now = time.time()
+        rows = self._connect().execute(
+            "SELECT key, value FROM state WHERE expires IS NULL OR expires > ?", (now,)).fetchall()
+        return {key: pickle.loads(value) for key, value in rows}
+
+    def stats(self):
+        conn = self._connect()
+        entries = conn.execute("SELECT COUNT(*) FROM state").fetchone()[0]
+        nbytes = conn.execute("SELECT bytes FROM state_total").fetchone()[0]
+        return {"backend": "sqlite", "path": self.path, "entries": entries, "bytes": nbytes,
+                "max_bytes": self.max_bytes}
+
+
+# Process-local entries (compiled objects), and the shared store
+_local_store = MemoryStore()
+if STATE_BACKEND == "sqlite":
+    _store = SqliteStore()
+elif STATE_BACKEND == "memory":
+    _store = _local_store
+else:
+    raise ValueError(f"Unknown STATE_BACKEND: {STATE_BACKEND}")
+
+
+def set_value(key, value, ttl=None):
+    """Set a value in the store, expiring after ttl seconds if given."""
+    _store.set(key, value, ttl)
 
 def get_value(key, default=None):
     """Get a value from the store."""
-    with _lock:
-        return _store.get(key, default)
+    return _store.get(key, default)
 
 def clear_value(key):
     """Delete a key from the store."""
-    with _lock:
-        if key in _store:
-            del _store[key]
+    _store.delete(key)
+
+def get_or_create(key, factory, ttl=None):
+    """
+    Process-local value for key, built with factory() on first use (or after
+    it expired or was evicted). For objects that cannot be shared between
+    processes, e.g. compiled predicates; always kept in memory.
+    """
+    return _local_store.get_or_create(key, factory, ttl)
+
+def set_forest_shape(shape, ttl=FOREST_SHAPE_TTL_SECONDS):
+    """Store the current forest shape (GeoJSON geometry / Feature) used by simulations."""
+    set_value(FOREST_SHAPE_KEY, shape, ttl)
+
+def get_forest_shape():
+    """The current forest shape, or None if none was set or it expired."""
+    return get_value(FOREST_SHAPE_KEY)
 
 def snapshot():
     """Return a shallow copy of the store (for debugging)."""
-    with _lock:
-        return dict(_store)
+    return _store.snapshot()
+
+def stats():
+    """Entry count and approximate size of the store."""
+    return _store.stats()
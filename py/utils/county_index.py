@@ -0,0 +1,134 @@
+"""
+county_index.py
+---------------------------------------------
+In-memory index of US county boundaries, built once from the county GeoJSON
+shipped with the frontend (COUNTIES_GEOJSON_PATH).
+
+Counties are looked up by FIPS code, by name + state or by county key
+("Dane_WI", as built by the frontend), and by location through an STRtree
+of their polygons, so export regions and point-to-county lookups need no
+Earth Engine call. Records are plain dicts:
+
+    {"fips": "55025", "name": "Dane", "state": "WI", "county_key": "Dane_WI",
+     "bbox": [west, south, east, north]}
+
+    index = get_index()
+    index.at(-89.4, 43.07)["county_key"]      # 'Dane_WI'
+    index.geometry("55025")                   # GeoJSON polygon
+"""
+
+import json
+import logging
+import threading
+import time
+
+import numpy as np
+from shapely import STRtree, points
+from shapely.geometry import shape, mapping, box
+
+from config import COUNTIES_GEOJSON_PATH
+from utils.constants import STATE_ABBR_TO_FIPS
+
+logger = logging.getLogger(__name__)
+
+_FIPS_TO_STATE = {fips: abbr for abbr, fips in STATE_ABBR_TO_FIPS.items()}
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def state_abbr(state_fips_or_abbr):
+    """Two-letter abbreviation for a state abbreviation or FIPS code (None if unknown)."""
+    st = str(state_fips_or_abbr).strip()
+    if len(st) == 2 and st.isalpha():
+        st = st.upper()
+        return st if st in STATE_ABBR_TO_FIPS else None
+    return _FIPS_TO_STATE.get(st.zfill(2))
+
+
+class CountyIndex:
+    def __init__(self, path=COUNTIES_GEOJSON_PATH):
+        start = time.perf_counter()
+        with open(path) as f:
+            collection = json.load(f)
+
+        self._records = []
+        self._geometries = []
+        self._by_fips = {}
+        self._by_key = {}
+        for feature in collection["features"]:
+            props = feature.get("properties") or {}
+            state = _FIPS_TO_STATE.get(str(props.get("STATE", "")).zfill(2))
+            if not state or not props.get("NAME") or not feature.get("geometry"):
+                continue
+            fips = str(feature.get("id") or f"{props['STATE']}{props.get('COUNTY', '')}").zfill(5)
+            geometry = shape(feature["geometry"])
+            record = {
+                "fips": fips,
+                "name": props["NAME"],
+                "state": state,
+                "county_key": f"{props['NAME']}_{state}",
+                "bbox": [round(v, 6) for v in geometry.bounds],
+            }
+            self._by_fips[fips] = len(self._records)
+            self._by_key[record["county_key"].lower()] = len(self._records)
+            self._records.append(record)
+            self._geometries.append(geometry)
+
+        self._tree = STRtree(self._geometries)
+        logger.info(f"County index: {len(self._records)} counties from {path} "
+                    f"in {time.perf_counter() - start:.2f}s")
+
+    def __len__(self):
+        return len(self._records)
+
+    def _position(self, county):
+        """Record position for a FIPS code or county key."""
+        county = str(county).strip()
+        if county.isdigit():
+            return self._by_fips.get(county.zfill(5))
+        return self._by_key.get(county.lower())
+
+    def get(self, county):
+        """Record for a FIPS code or county key, or None."""
+        i = self._position(county)
+        return dict(self._records[i]) if i is not None else None
+
+    def by_name(self, county_name, state_fips_or_abbr):
+        """Record for a county name (case-insensitive) in a state, or None."""
+        state = state_abbr(state_fips_or_abbr)
+        if state is None:
+            return None
+        return self.get(f"{county_name.strip()}_{state}")
+
+    def in_state(self, state_fips_or_abbr):
+        """Records of every county of a state, sorted by name."""
+        state = state_abbr(state_fips_or_abbr)
+        return sorted((dict(r) for r in self._records if r["state"] == state), key=lambda r: r["name"])
+
+    def geometry(self, county):
+        """GeoJSON geometry of a county (FIPS code or county key), or None."""
+        i = self._position(county)
+        return mapping(self._geometries[i]) if i is not None else None
+
+    def at(self, lon, lat):
+        """Record of the county containing (lon, lat), or None."""
+        hits = self._tree.query(points(lon, lat), predicate="intersects")
+        if len(hits) == 0:
+            return None
+        return dict(self._records[int(np.min(hits))])
+
+    def intersecting(self, west, south, east, north):
+        """Records of the counties intersecting a lon/lat bounding box."""
+        hits = self._tree.query(box(west, south, east, north), predicate="intersects")
+        return [dict(self._records[int(i)]) for i in np.sort(hits)]
+
+
+def get_index():
+    """The process-wide CountyIndex, built on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = CountyIndex()
+    return _index
@@ -0,0 +1,61 @@
+"""
+locks.py
+---------------------------------------------
+Exclusive locks on output directories, held across threads and processes.
+
+Simulation requests for the same run (or risk-map job) can reach several
+processes at once: ASGI simulation workers, several app workers, the
+command line. dir_lock(path) serialises them with a thread lock per path
+plus fcntl.flock on path/.lock, so it works across all of them.
+
+    with dir_lock(run_dir):
+        ...  # read and rewrite the run's files
+
+With blocking=False it raises BlockingIOError instead of waiting, which
+also tells whether anyone holds the lock.
+
+flock is POSIX only; without fcntl (Windows) the lock holds within one
+process.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: thread lock only
+    fcntl = None
+
+LOCK_FILENAME = ".lock"
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+@contextmanager
+def dir_lock(path, blocking=True):
+    """
+    Hold the exclusive lock of directory `path` (which must exist).
+
+    Raises:
+        FileNotFoundError: If path does not exist.
+        BlockingIOError: With blocking=False, if the lock is held.
+    """
+    path = os.path.abspath(path)
+    with _locks_guard:
+        lock = _locks.setdefault(path, threading.Lock())
+    if not lock.acquire(blocking):
+        raise BlockingIOError(f"{path} is locked")
+    try:
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(path, LOCK_FILENAME), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    finally:
+        lock.release()
@@ -1,17 +1,123 @@
+"""
+logger.py
+---------------------------------------------
+Logging setup for the backend, and low-overhead helpers for hot loops.
+
+In "async" mode (LOG_MODE, the default) the root logger only puts records
+on a queue; a QueueListener thread formats and writes them, so simulation
+threads never wait on the stream. Records are queued unformatted: pass
+immutable values as %-style arguments (logger.debug("t=%d", t)), not arrays
+that are modified afterwards.
+
+StepLog replaces one log line per timestep with a line every N steps
+(SIM_LOG_EVERY, 0 = none) and one summary per run.
+"""
+
+import atexit
 import logging
+import logging.handlers
+import queue
+import time
+
+try:
+    from config import LOG_MODE, LOG_LEVEL, SIM_LOG_EVERY
+except ImportError:
+    LOG_MODE = "async"
+    LOG_LEVEL = "INFO"
+    SIM_LOG_EVERY = 0
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s - %(message)s"
+
+_listener = None
 
 
-def configure_logging(level=logging.INFO):
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queues the record as is; message formatting happens on the listener thread."""
+
+    def prepare(self, record):
+        return record
+
+
+def configure_logging(level=None, mode=None):
     """
     Configure root logger for the application.
+
+    Args:
+        level: Logging level (default LOG_LEVEL).
+        mode (str): "async" (queue + listener thread) or "sync" (default LOG_MODE).
     """
-    logging.basicConfig(
-        level=level,
-        format="%(asctime)s [%(levelname)s] %(name)s - %(message)s",
-        handlers=[
-            logging.StreamHandler()
-        ]
-    )
+    global _listener
+    level = LOG_LEVEL if level is None else level
+    mode = (LOG_MODE if mode is None else mode).lower()
+    if mode not in ("async", "sync"):
+        raise ValueError(f"Unknown LOG_MODE: {mode}")
+
+    root = logging.getLogger()
+    if mode == "sync" or root.handlers:
+        # As before (a no-op if logging was already configured)
+        logging.basicConfig(level=level, format=LOG_FORMAT, handlers=[logging.StreamHandler()])
+    else:
+        stream = logging.StreamHandler()
+        stream.setFormatter(logging.Formatter(LOG_FORMAT))
+        records = queue.SimpleQueue()
+        root.addHandler(_DeferredQueueHandler(records))
+        root.setLevel(level)
+        _listener = logging.handlers.QueueListener(records, stream, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+
     logger = logging.getLogger(__name__)
-    logger.debug("Logging configured.")
-    return logger
\ No newline at end of file
+    logger.debug("Logging configured (%s).", mode)
+    return logger
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread (async mode; registered with atexit)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class StepLog:
+    """
+    Aggregated per-run logging for a timestep loop.
+
+        steps = StepLog(logger, "Simulation")
+        for t in ...:
+            ...
+            steps.step(t, burning=n)
+        steps.finish(burned_cells=total)
+
+    step() costs a counter update unless a progress line is due (every
+    `every` steps, 0 = never); finish() logs one summary line.
+    """
+
+    def __init__(self, logger, label, every=None, level=logging.INFO):
+        self.logger = logger
+        self.label = label
+        self.every = SIM_LOG_EVERY if every is None else every
+        self.level = level
+        self.steps = 0
+        self.first = self.last = None
+        self.peak_burning = 0
+        self._start = time.perf_counter()
+
+    def step(self, t, burning=0):
+        self.steps += 1
+        if self.first is None:
+            self.first = t
+        self.last = t
+        if burning > self.peak_burning:
+            self.peak_burning = burning
+        if self.every and t % self.every == 0:
+            self.logger.log(self.level, "%s: timestep %d, %d cell(s) burning", self.label, t, burning)
+
+    def finish(self, **fields):
+        if not self.logger.isEnabledFor(self.level):
+            return
+        extra = "".join(f", {k}={v}" for k, v in fields.items())
+        span = f"t={self.first}..{self.last}" if self.steps else "no timesteps"
+        self.logger.log(self.level, "%s: %d step(s) (%s) in %.3fs, peak %d burning%s",
+                        self.label, self.steps, span, time.perf_counter() - self._start,
+                        self.peak_burning, extra)
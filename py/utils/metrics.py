@@ -0,0 +1,295 @@
+"""
+metrics.py
+---------------------------------------------
+Minimal, dependency-free Prometheus-style metrics.
+
+Counters, gauges and histograms are plain in-process objects guarded by a
+lock per labelled series, so an update costs roughly a microsecond and is
+safe to leave on inside simulation loops. GET /metrics renders the registry
+in the Prometheus text exposition format (see api/metrics.py).
+
+Values are per process; with several workers, scrape each worker.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ContextDecorator
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets (seconds) for requests and external calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# Finer buckets for per-timestep work inside the simulation loop
+STEP_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Registry:
+    """Holds every metric created in this process."""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self):
+        """Render all metrics in Prometheus text format."""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.extend(f'{n}="{_escape(v)}"' for n, v in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Timer(ContextDecorator):
+    """Observe elapsed wall time into a histogram series (context manager or decorator)."""
+
+    def __init__(self, series):
+        self._series = series
+        self._local = threading.local()
+
+    def __enter__(self):
+        self._local.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._series.observe(time.perf_counter() - self._local.start)
+        return False
+
+
+class _InProgress(ContextDecorator):
+    """Increment a gauge series on entry and decrement it on exit."""
+
+    def __init__(self, series):
+        self._series = series
+
+    def __enter__(self):
+        self._series.inc()
+        return self
+
+    def __exit__(self, *exc):
+        self._series.dec()
+        return False
+
+
+class _Metric:
+    """Base class: a named metric with zero or more labelled series."""
+
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def labels(self, *values, **labels):
+        """Return the series for the given label values (created on first use)."""
+        if labels:
+            values = tuple(labels[n] for n in self.labelnames)
+        key = tuple(str(v) for v in values)
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(key, self._new_series())
+        return series
+
+    def _default(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name} has labels {self.labelnames}; use .labels(...)")
+        return self.labels()
+
+    def _items(self):
+        with self._lock:
+            return list(self._series.items())
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for key, series in self._items():
+            lines.extend(series.render(self.name, self.labelnames, key))
+        return lines
+
+
+class _ValueSeries:
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def get(self):
+        with self._lock:
+            return self._value
+
+    def render(self, name, labelnames, key):
+        return [f"{name}{_format_labels(labelnames, key)} {_format_value(self.get())}"]
+
+
+class _GaugeSeries(_ValueSeries):
+    def dec(self, amount=1):
+        with self._lock:
+            self._value -= amount
+
+    def set(self, value):
+        with self._lock:
+            self._value = value
+
+    def track_inprogress(self):
+        return _InProgress(self)
+
+
+class _HistogramSeries:
+    def __init__(self, buckets):
+        self._buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        idx = bisect_left(self._buckets, value)
+        with self._lock:
+            self._counts[idx] += 1
+            self._sum += value
+
+    def time(self):
+        return _Timer(self)
+
+    def render(self, name, labelnames, key):
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self._buckets + (float("inf"),), counts):
+            cumulative += count
+            le = _format_labels(labelnames, key, extra=[("le", _format_value(float(bound)))])
+            lines.append(f"{name}_bucket{le} {cumulative}")
+        labels = _format_labels(labelnames, key)
+        lines.append(f"{name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{name}_count{labels} {cumulative}")
+        return lines
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _new_series(self):
+        return _ValueSeries()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def _new_series(self):
+        return _GaugeSeries()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def dec(self, amount=1):
+        self._default().dec(amount)
+
+    def set(self, value):
+        self._default().set(value)
+
+    def track_inprogress(self):
+        return self._default().track_inprogress()
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_series(self):
+        return _HistogramSeries(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+
+# --- APPLICATION METRICS ---
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.",
+    ("route", "method", "status"))
+
+SIMULATION_SECONDS = Histogram(
+    "wildfire_simulation_duration_seconds", "Wall time of a full simulation run.",
+    ("engine",))
+SIMULATION_STEP_SECONDS = Histogram(
+    "wildfire_simulation_step_seconds", "Wall time of one CA timestep (compute only).",
+    buckets=STEP_BUCKETS)
+SIMULATION_WRITE_SECONDS = Histogram(
+    "wildfire_simulation_write_seconds", "Wall time spent writing one output frame.",
+    buckets=STEP_BUCKETS)
+SIMULATION_QUEUE_DEPTH = Gauge(
+    "wildfire_simulation_queue_depth", "Simulation runs accepted and not yet finished.")
+CELLS_BURNED = Counter(
+    "wildfire_cells_burned_total", "Cells that caught fire across all simulation runs.")
+RASTER_CACHE_REQUESTS = Counter(
+    "wildfire_raster_cache_requests_total", "County raster cache lookups.",
+    ("result",))
+KERNEL_BACKEND_INFO = Gauge(
+    "wildfire_kernel_backend_info", "Active CA kernel backend (value is always 1).",
+    ("backend",))
+
+GEE_CALL_SECONDS = Histogram(
+    "gee_call_duration_seconds", "Latency of Google Earth Engine API calls.",
+    ("operation",))
+GEE_CACHE_REQUESTS = Counter(
+    "gee_cache_requests_total", "GEE result cache lookups (hit, stale = served while refreshing, miss).",
+    ("cache", "result"))
+GCS_CALL_SECONDS = Histogram(
+    "gcs_call_duration_seconds", "Latency of Google Cloud Storage calls.",
+    ("operation",))
+EXPORT_TASKS_PENDING = Gauge(
+    "gee_export_tasks_pending", "Export tasks the export poller is tracking (running or downloading).")
+EXPORT_STATUS_REQUESTS = Counter(
+    "gee_export_status_requests_total", "Export status checks by source (registry = served without a GEE call).",
+    ("source",))
+APP_STARTUP_SECONDS = Gauge(
+    "wildfire_app_startup_seconds", "Startup phases: import (app modules), ready (create_app done), gee_init.",
+    ("phase",))
@@ -0,0 +1,193 @@
+"""
+profiling.py
+---------------------------------------------
+Opt-in per-run profiling for the simulation engines.
+
+A RunProfiler accumulates wall and CPU time per named phase, tracks peak
+traced memory with tracemalloc and can optionally capture a cProfile dump.
+When disabled, phase() is a no-op so the same code path is used either way.
+
+tracemalloc is process-wide: tracing runs while any profiler is active and
+stops with the last one. When profiled runs overlap (batch or server thread
+pools), each reports the process peak since tracing started and is marked
+"peak_memory_shared" in its report.
+
+    profiler = RunProfiler(enabled=True, cprofile=False)
+    profiler.start()
+    with profiler.phase("decode"):
+        ...
+    profiler.mark("build")       # straight-line code: open phase runs until
+    ...                          # the next mark() or stop()
+    profiler.stop()
+    profiler.write(output_dir)   # -> <output_dir>/profile.json
+"""
+
+import cProfile
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+PROFILE_FILENAME = "profile.json"
+CPROFILE_FILENAME = "profile.pstats"
+
+_NULL_PHASE = nullcontext()
+
+# Profilers currently tracing, and whether tracemalloc was started by them
+_active = set()
+_active_lock = threading.Lock()
+_owns_tracemalloc = False
+
+
+class RunProfiler:
+    """Collects per-phase timings and peak memory for one simulation run."""
+
+    def __init__(self, enabled=False, cprofile=False):
+        self.enabled = enabled
+        self.cprofile = enabled and cprofile
+        self._phases = {}
+        self._order = []
+        self._wall_start = None
+        self._cpu_start = None
+        self._wall_total = 0.0
+        self._cpu_total = 0.0
+        self._peak_memory = None
+        self._memory_shared = False
+        self._cprofiler = None
+        self._open_mark = None
+
+    def start(self):
+        if not self.enabled:
+            return self
+        global _owns_tracemalloc
+        with _active_lock:
+            if not _active:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    _owns_tracemalloc = True
+                else:
+                    tracemalloc.reset_peak()
+            else:
+                # Overlapping runs: the peak cannot be attributed to one of them
+                for other in _active:
+                    other._memory_shared = True
+                self._memory_shared = True
+            _active.add(self)
+        if self.cprofile:
+            self._cprofiler = cProfile.Profile()
+            self._cprofiler.enable()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.thread_time()
+        return self
+
+    def stop(self):
+        if not self.enabled or self._wall_start is None:
+            return self
+        self.mark(None)
+        self._wall_total = time.perf_counter() - self._wall_start
+        self._cpu_total = time.thread_time() - self._cpu_start
+        self._wall_start = None
+        if self._cprofiler is not None:
+            self._cprofiler.disable()
+        global _owns_tracemalloc
+        with _active_lock:
+            _, self._peak_memory = tracemalloc.get_traced_memory()
+            _active.discard(self)
+            if not _active and _owns_tracemalloc:
+                tracemalloc.stop()
+                _owns_tracemalloc = False
+        return self
+
+    def phase(self, name):
+        """Context manager accumulating wall and CPU time under `name`."""
+        if not self.enabled:
+            return _NULL_PHASE
+        return self._timed_phase(name)
+
+    def mark(self, name):
+        """
+        Close the phase opened by the previous mark() (if any) and open `name`.
+        Suited to long straight-line code with early returns; mark(None) closes.
+        """
+        if not self.enabled:
+            return
+        if self._open_mark is not None:
+            prev, wall, cpu = self._open_mark
+            self._add(prev, time.perf_counter() - wall, time.thread_time() - cpu)
+            self._open_mark = None
+        if name is not None:
+            self._open_mark = (name, time.perf_counter(), time.thread_time())
+
+    @contextmanager
+    def _timed_phase(self, name):
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            self._add(name, time.perf_counter() - wall, time.thread_time() - cpu)
+
+    def _add(self, name, wall_seconds, cpu_seconds):
+        stats = self._phases.get(name)
+        if stats is None:
+            stats = self._phases[name] = {"wall_seconds": 0.0, "cpu_seconds": 0.0, "calls": 0}
+            self._order.append(name)
+        stats["wall_seconds"] += wall_seconds
+        stats["cpu_seconds"] += cpu_seconds
+        stats["calls"] += 1
+
+    def report(self):
+        """Return the profile as a JSON-serialisable dict."""
+        phases = {}
+        for name in self._order:
+            stats = self._phases[name]
+            phases[name] = {
+                "wall_seconds": round(stats["wall_seconds"], 6),
+                "cpu_seconds": round(stats["cpu_seconds"], 6),
+                "calls": stats["calls"],
+                "wall_fraction": round(stats["wall_seconds"] / self._wall_total, 4) if self._wall_total else None,
+            }
+        return {
+            "total_wall_seconds": round(self._wall_total, 6),
+            "total_cpu_seconds": round(self._cpu_total, 6),
+            "peak_memory_bytes": self._peak_memory,
+            "peak_memory_shared": self._memory_shared,
+            "phases": phases,
+            "cprofile": CPROFILE_FILENAME if self._cprofiler is not None else None,
+        }
+
+    def write(self, output_dir):
+        """Write profile.json (and profile.pstats if cProfile was on) into output_dir."""
+        if not self.enabled:
+            return None
+        if self._cprofiler is not None:
+            self._cprofiler.dump_stats(os.path.join(output_dir, CPROFILE_FILENAME))
+        path = os.path.join(output_dir, PROFILE_FILENAME)
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+        return path
+
+
+def load_profile(output_dir):
+    """Read profile.json from a run directory, or None if the run was not profiled."""
+    path = os.path.join(output_dir, PROFILE_FILENAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def summarize_profile(report):
+    """Compact form of a profile report for API responses."""
+    if not report:
+        return None
+    peak = report.get("peak_memory_bytes")
+    return {
+        "total_wall_seconds": report.get("total_wall_seconds"),
+        "total_cpu_seconds": report.get("total_cpu_seconds"),
+        "peak_memory_mib": round(peak / 2**20, 2) if peak is not None else None,
+        "peak_memory_shared": report.get("peak_memory_shared", False),
+        "phase_wall_seconds": {name: p["wall_seconds"] for name, p in report.get("phases", {}).items()},
+    }
@@ -0,0 +1,106 @@
+"""
+tile_cache.py
+---------------------------------------------
+Size-bounded on-disk LRU cache for rendered tiles.
+
+Entries are plain files under the cache directory; a hit refreshes the
+file's mtime, and when the total size passes max_bytes the least recently
+used files are deleted. Writes go through a temp file and rename, so
+several workers can share one cache directory safely (each keeps its own
+size estimate and re-scans the directory when it evicts).
+"""
+
+import logging
+import os
+import shutil
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class DiskLRUCache:
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None  # bytes on disk, scanned lazily
+
+    def _path(self, key):
+        # Keys are relative paths like "runs/<run>/<t>/<z>/<x>/<y>.png"
+        path = os.path.normpath(os.path.join(self.directory, key))
+        if not path.startswith(os.path.abspath(self.directory) + os.sep):
+            raise ValueError(f"Invalid cache key: {key}")
+        return path
+
+    def get(self, key):
+        """Cached bytes for key, or None."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        return data
+
+    def put(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan()[1]
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def purge(self, prefix):
+        """Delete every entry under a key prefix, e.g. "runs/<run>" when the run is deleted."""
+        path = self._path(prefix)
+        if not os.path.isdir(path):
+            return
+        shutil.rmtree(path, ignore_errors=True)
+        with self._lock:
+            self._size = None  # re-scanned on the next put
+
+    def _scan(self):
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        return entries, total
+
+    def _evict(self):
+        """Delete least recently used entries down to 90% of max_bytes."""
+        start = time.perf_counter()
+        entries, total = self._scan()
+        entries.sort()
+        target = self.max_bytes * 0.9
+        removed = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except FileNotFoundError:
+                pass
+        self._size = total
+        logger.info(f"Tile cache eviction: removed {removed} file(s) in {time.perf_counter() - start:.3f}s, {total} bytes remain.")
@@ -0,0 +1,117 @@
+"""
+tiles.py
+---------------------------------------------
+XYZ (Web Mercator) tile rendering for local rasters.
+
+A tile is read straight from a raster file through a WarpedVRT whose grid
+is the tile itself, so only the needed part of the source is decoded, then
+mapped to palette classes and encoded as a paletted PNG with transparency.
+
+    data = read_tile(path, z, x, y)             # None if the tile is off-raster
+    png = encode_png(classes, FIRE_PALETTE)
+"""
+
+import warnings
+
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.errors import NotGeoreferencedWarning
+from rasterio.io import MemoryFile
+from rasterio.transform import from_bounds
+from rasterio.vrt import WarpedVRT
+from rasterio.warp import transform_bounds
+
+TILE_SIZE = 256
+WEB_MERCATOR = "EPSG:3857"
+_ORIGIN = 20037508.342789244  # half the Web Mercator world width, metres
+
+# Palettes: class value -> RGBA. Anything not listed is fully transparent.
+FIRE_PALETTE = {2: (255, 165, 0, 230), 3: (255, 0, 0, 230)}  # burning, burnt
+FOREST_PALETTE = {1: (0, 150, 0, 230)}  # forest
+
+
+def tile_bounds(z, x, y):
+    """(left, bottom, right, top) of tile z/x/y in Web Mercator metres."""
+    size = 2 * _ORIGIN / (2 ** z)
+    left = -_ORIGIN + x * size
+    top = _ORIGIN - y * size
+    return left, top - size, left + size, top
+
+
+def valid_tile(z, x, y):
+    return 0 <= z <= 24 and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def _intersects(a, b):
+    return a[0] < b[2] and a[2] > b[0] and a[1] < b[3] and a[3] > b[1]
+
+
+def _overview_level(src, src_bounds, bounds):
+    """Index of the coarsest overview still at least as fine as the tile, or None for full resolution."""
+    tile_res = (bounds[2] - bounds[0]) / TILE_SIZE
+    src_res = (src_bounds[2] - src_bounds[0]) / src.width
+    level = None
+    for i, factor in enumerate(src.overviews(1)):
+        if src_res * factor <= tile_res:
+            level = i
+    return level
+
+
+def read_tile(path, z, x, y, band=1, nodata=None, resampling=Resampling.nearest, overviews=False):
+    """
+    Read band `band` of the raster at `path` resampled onto tile z/x/y.
+    With overviews=True, low zooms read from the raster's overviews instead
+    of decoding the full-resolution data.
+
+    Returns:
+        np.ndarray (TILE_SIZE x TILE_SIZE) in the band's dtype, or None when
+        the tile does not overlap the raster. Cells outside the raster are
+        `nodata` (or the raster's own nodata, else 0).
+    """
+    bounds = tile_bounds(z, x, y)
+    with rasterio.open(path) as src:
+        src_bounds = transform_bounds(src.crs, WEB_MERCATOR, *src.bounds) if src.crs else None
+        if src_bounds is None or not _intersects(bounds, src_bounds):
+            return None
+        fill = nodata if nodata is not None else (src.nodata if src.nodata is not None else 0)
+        level = _overview_level(src, src_bounds, bounds) if overviews else None
+        if level is None:
+            return _warp(src, bounds, band, fill, resampling)
+
+    with rasterio.open(path, overview_level=level) as ovr:
+        return _warp(ovr, bounds, band, fill, resampling)
+
+
+def _warp(src, bounds, band, fill, resampling):
+    with WarpedVRT(src, crs=WEB_MERCATOR, transform=from_bounds(*bounds, TILE_SIZE, TILE_SIZE),
+                   width=TILE_SIZE, height=TILE_SIZE, resampling=resampling,
+                   nodata=fill) as vrt:
+        return vrt.read(band)
+
+
+def encode_png(classes, palette):
+    """Encode a uint8 class array as a paletted PNG; unlisted classes are transparent."""
+    colormap = {i: (0, 0, 0, 0) for i in range(max(palette, default=0) + 1)}
+    colormap.update(palette)
+    height, width = classes.shape
+    with warnings.catch_warnings():
+        # A bare PNG has no georeferencing, which is expected here
+        warnings.simplefilter("ignore", NotGeoreferencedWarning)
+        with MemoryFile() as memfile:
+            with memfile.open(driver="PNG", width=width, height=height, count=1, dtype="uint8") as dst:
+                dst.write(classes.astype(np.uint8, copy=False), 1)
+                dst.write_colormap(1, colormap)
+            return memfile.read()
+
+
+_EMPTY_TILE = None
+
+
+def empty_tile():
+    """A fully transparent tile (encoded once)."""
+    global _EMPTY_TILE
+    if _EMPTY_TILE is None:
+        _EMPTY_TILE = encode_png(np.zeros((TILE_SIZE, TILE_SIZE), dtype=np.uint8), {})
+    return _EMPTY_TILE
+
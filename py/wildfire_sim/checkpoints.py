@@ -0,0 +1,101 @@
+"""
+checkpoints.py
+---------------------------------------------
+Compact state checkpoints for SCA runs.
+
+A checkpoint stores only the cells that differ from the county base raster
+(flat index + value) together with the random generator state after that
+timestep, so resuming from it reproduces the original run exactly. Each
+run directory also carries run.json, the record needed to rebuild the
+simulation (source raster, ignition, parameters, crop window, checkpoints):
+
+    sim_run_<county>_<ts>/
+        run.json
+        wildfire_t_000.tif ...
+        checkpoints/state_t005.npz ...
+"""
+
+import json
+import os
+import threading
+
+import numpy as np
+
+RUN_FILENAME = "run.json"
+CHECKPOINT_DIRNAME = "checkpoints"
+
+
+def checkpoint_path(run_dir, t):
+    return os.path.join(run_dir, CHECKPOINT_DIRNAME, f"state_t{t:03d}.npz")
+
+
+def save_checkpoint(run_dir, t, state, base_grid, rng):
+    """Write the state at timestep t as a sparse diff against base_grid, plus the RNG state."""
+    changed = np.flatnonzero(state.ravel() != base_grid.ravel())
+    path = checkpoint_path(run_dir, t)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez_compressed(
+            f,
+            t=np.int64(t),
+            index=changed.astype(np.int64),
+            value=state.ravel()[changed],
+            rng_state=np.array(json.dumps(rng.bit_generator.state)),
+        )
+    os.replace(tmp, path)
+    return path
+
+
+def load_checkpoint(run_dir, t, base_grid):
+    """
+    Rebuild (state, rng) at timestep t.
+
+    Raises:
+        FileNotFoundError: If the run has no checkpoint at t.
+    """
+    path = checkpoint_path(run_dir, t)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No checkpoint at t={t} in {run_dir}. Available: {list_checkpoints(run_dir)}")
+    with np.load(path) as data:
+        state = base_grid.copy()
+        state.ravel()[data["index"]] = data["value"]
+        rng_state = json.loads(str(data["rng_state"]))
+
+    rng = np.random.default_rng()
+    rng.bit_generator.state = rng_state
+    return state, rng
+
+
+def list_checkpoints(run_dir):
+    """Timesteps with a checkpoint, ascending."""
+    directory = os.path.join(run_dir, CHECKPOINT_DIRNAME)
+    if not os.path.isdir(directory):
+        return []
+    steps = []
+    for filename in os.listdir(directory):
+        if filename.startswith("state_t") and filename.endswith(".npz"):
+            steps.append(int(filename[len("state_t"):-len(".npz")]))
+    return sorted(steps)
+
+
+def read_run(run_dir):
+    """
+    Load run.json.
+
+    Raises:
+        FileNotFoundError: If run_dir is not a checkpointed SCA run.
+    """
+    path = os.path.join(run_dir, RUN_FILENAME)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No {RUN_FILENAME} in {run_dir}; the run cannot be resumed.")
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_run(run_dir, run):
+    path = os.path.join(run_dir, RUN_FILENAME)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(run, f, indent=2)
+    os.replace(tmp, path)
@@ -1,5 +1,12 @@
-"""Forest shape utilities: build point-in-polygon predicate from GeoJSON/list/shapely."""
+"""Forest shape utilities: build point-in-polygon predicate from GeoJSON/list/shapely.
+
+Compiled shapes (predicate + grid mask per simulation grid) are cached in the
+state store by shape digest, so repeated runs on one shape reuse them."""
+import hashlib
+import json
 import logging
+
+import numpy as np
 from matplotlib.path import Path
 
 logger = logging.getLogger(__name__)
@@ -15,14 +22,17 @@ except Exception:
         # fallback: local import (works if PYTHONPATH or CWD contains py/)
         import state as app_state
 
+try:
+    from config import FOREST_SHAPE_TTL_SECONDS
+except ImportError:
+    FOREST_SHAPE_TTL_SECONDS = 6 * 3600
 
-def make_point_in_forest(shape_obj, scale, grid_size):
-    """Return predicate(pt)->bool testing whether pt is inside shape_obj (supports GeoJSON/list/shapely)."""
-    logger.info("make_point_in_forest called.")
-    if not shape_obj:
-        logger.warning("No shape object provided.")
-        return None
 
+def _compile(shape_obj, scale, grid_size):
+    """
+    Compile shape_obj for a grid: ("paths", [matplotlib Path, ...]) projected
+    into the grid box, ("shapely", geometry), or None if it is not a shape.
+    """
     # Feature wrapper
     if isinstance(shape_obj, dict) and shape_obj.get('type') == 'Feature':
         shape_obj = shape_obj.get('geometry')
@@ -97,39 +107,117 @@ def make_point_in_forest(shape_obj, scale, grid_size):
 
         if not path_list:
             return None
-
-        def _fn(pt):
-            for p in path_list:
-                if p.contains_point(pt):
-                    return True
-            return False
-
-        return _fn
+        return ("paths", path_list)
 
     # Sequence of coords
     if isinstance(shape_obj, (list, tuple)) and len(shape_obj) > 0 and isinstance(shape_obj[0], (list, tuple)):
         try:
             pts = [(float(x), float(y)) for x, y in shape_obj]
-            path = Path(pts)
-            return lambda pt: path.contains_point(pt)
+            return ("paths", [Path(pts)])
         except Exception:
             return None
 
     # shapely geometry
     if hasattr(shape_obj, 'contains'):
-        try:
-            from shapely.geometry import Point
-        except Exception:
-            return None
-        def _fn_shapely(pt):
-            return bool(shape_obj.contains(Point(pt)))
-        return _fn_shapely
+        return ("shapely", shape_obj)
 
     return None
 
 
+def _predicate(compiled):
+    kind, shape_obj = compiled
+    if kind == "paths":
+        def _fn(pt):
+            for p in shape_obj:
+                if p.contains_point(pt):
+                    return True
+            return False
+        return _fn
+
+    try:
+        from shapely.geometry import Point
+    except Exception:
+        return None
+    def _fn_shapely(pt):
+        return bool(shape_obj.contains(Point(pt)))
+    return _fn_shapely
+
+
+def _contains(compiled, points):
+    """Vectorised predicate: bool array, True for each (x, y) row of points inside the shape."""
+    kind, shape_obj = compiled
+    if kind == "paths":
+        inside = np.zeros(len(points), dtype=bool)
+        for p in shape_obj:
+            inside |= p.contains_points(points)
+        return inside
+    import shapely
+    return shapely.contains_xy(shape_obj, points[:, 0], points[:, 1])
+
+
+def make_point_in_forest(shape_obj, scale, grid_size):
+    """Return predicate(pt)->bool testing whether pt is inside shape_obj (supports GeoJSON/list/shapely)."""
+    logger.info("make_point_in_forest called.")
+    if not shape_obj:
+        logger.warning("No shape object provided.")
+        return None
+    compiled = _compile(shape_obj, scale, grid_size)
+    return _predicate(compiled) if compiled is not None else None
+
+
+class CompiledForest:
+    """
+    A forest shape compiled for one simulation grid: the point predicate and
+    the grid mask, where mask[i - 1, j - 1] tells whether the node at
+    (i * scale, j * scale) lies in the forest (i, j = 1..grid_size).
+    predicate and mask are None if the shape could not be processed.
+    """
+
+    def __init__(self, shape_obj, scale, grid_size):
+        compiled = _compile(shape_obj, scale, grid_size)
+        self.predicate = _predicate(compiled) if compiled is not None else None
+        self.mask = None
+        self._vertices = 0
+        if self.predicate is not None:
+            ticks = np.arange(1, grid_size + 1) * scale
+            xs, ys = np.meshgrid(ticks, ticks, indexing="ij")
+            points = np.column_stack([xs.ravel(), ys.ravel()])
+            self.mask = _contains(compiled, points).reshape(grid_size, grid_size)
+            if compiled[0] == "paths":
+                self._vertices = sum(len(p.vertices) for p in compiled[1])
+
+    @property
+    def nbytes(self):
+        """Approximate memory held (state store accounting)."""
+        return 1024 + self._vertices * 16 + (self.mask.nbytes if self.mask is not None else 0)
+
+
+def shape_digest(shape_obj):
+    """Stable digest of a GeoJSON / coordinate list / shapely shape."""
+    if hasattr(shape_obj, 'wkb'):
+        data = shape_obj.wkb
+    else:
+        data = json.dumps(shape_obj, sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.sha1(data).hexdigest()
+
+
+def get_compiled_forest(scale, grid_size, override_shape=None):
+    """
+    CompiledForest for override_shape, or the latest stored shape in state;
+    None if there is no shape. Cached per (shape, grid) for
+    FOREST_SHAPE_TTL_SECONDS.
+    """
+    shape = override_shape if override_shape is not None else app_state.get_forest_shape()
+    if not shape:
+        logger.warning("No shape object provided.")
+        return None
+    key = ("forest_shape", shape_digest(shape), float(scale), int(grid_size))
+    return app_state.get_or_create(key, lambda: CompiledForest(shape, scale, grid_size),
+                                   ttl=FOREST_SHAPE_TTL_SECONDS)
+
+
 def get_point_in_forest(scale, grid_size, override_shape=None):
     """Return predicate from override_shape or latest stored shape in state."""
     logger.info("get_point_in_forest called.")
-    shape = override_shape if override_shape is not None else app_state.get_forest_shape()
-    return make_point_in_forest(shape, scale, grid_size)
\ No newline at end of file
+    forest = get_compiled_forest(scale, grid_size, override_shape)
+    return forest.predicate if forest is not None else None
\ No newline at end of file
@@ -0,0 +1,154 @@
+"""
+forest_tiles.py
+---------------------------------------------
+Forest cover map layer rendered locally from county rasters.
+
+When a county's GeoTIFF is in GEOTIFF_DIR, the map layer is served as XYZ
+tiles from it instead of an Earth Engine map ID. The first request builds a
+tile source next to the tile cache: a uint8 copy of the raster holding only
+the forest class (see wildfire_sim/ingest.py), tiled and with
+mode-resampled overviews so low zooms never decode the full raster.
+Sources are versioned by the raster's mtime and rebuilt when it changes.
+"""
+
+import logging
+import os
+import re
+import threading
+
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.warp import transform_bounds
+
+from utils import tiles
+from wildfire_sim import ingest
+from wildfire_sim.kernels import NO_FOREST
+
+try:
+    from config import GEOTIFF_DIR, FOREST_TILE_SOURCE_DIR
+except ImportError:
+    GEOTIFF_DIR = os.path.join(os.getcwd(), "geotiffs")
+    FOREST_TILE_SOURCE_DIR = os.path.join(os.getcwd(), "forest_sources")
+
+logger = logging.getLogger(__name__)
+
+# One build lock per source, so different counties can be ingested in parallel
+_build_locks = {}
+_build_locks_lock = threading.Lock()
+
+
+def _build_lock(path):
+    with _build_locks_lock:
+        return _build_locks.setdefault(path, threading.Lock())
+
+
+def export_key(county_key):
+    """filename_key used for GEE exports (see /earthengine/start-export)."""
+    return "".join(c if c.isalnum() or c in ('-', '_') else '_' for c in county_key).strip('_').lower()
+
+
+def find_forest_raster(county_key):
+    """
+    Locate the county's forest raster in GEOTIFF_DIR: ForestCover_<key>_2024.tif
+    (as used by the simulator) or the <filename_key>.tif of a GEE export.
+
+    Raises:
+        FileNotFoundError: If neither exists.
+    """
+    pattern = re.compile(rf"ForestCover_{re.escape(county_key)}_2024\.tif", re.IGNORECASE)
+    export_name = f"{export_key(county_key)}.tif"
+    if os.path.isdir(GEOTIFF_DIR):
+        filenames = os.listdir(GEOTIFF_DIR)
+        for filename in filenames:
+            if pattern.fullmatch(filename):
+                return os.path.join(GEOTIFF_DIR, filename)
+        if export_name in filenames:
+            return os.path.join(GEOTIFF_DIR, export_name)
+    raise FileNotFoundError(f"No forest raster for countyKey '{county_key}' in {GEOTIFF_DIR}.")
+
+
+def _build_source(raster_path, path):
+    with rasterio.open(raster_path) as src:
+        classes = ingest.forest_classes(src.read(1), src.nodata)
+        classes[classes == ingest.CLASS_NODATA] = NO_FOREST
+        profile = {
+            "driver": "GTiff", "dtype": rasterio.uint8, "count": 1, "nodata": None,
+            "crs": src.crs, "transform": src.transform, "width": src.width, "height": src.height,
+            "tiled": True, "blockxsize": tiles.TILE_SIZE, "blockysize": tiles.TILE_SIZE,
+            "compress": "deflate",
+        }
+
+    factors = []
+    factor = 2
+    while max(profile["width"], profile["height"]) / factor >= tiles.TILE_SIZE / 2:
+        factors.append(factor)
+        factor *= 2
+
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with rasterio.open(tmp, "w", **profile) as dst:
+        dst.write(classes, 1)
+        if factors:
+            # Mode keeps overview cells binary (forest / no forest)
+            dst.build_overviews(factors, Resampling.mode)
+    os.replace(tmp, path)
+
+
+def tile_source(county_key):
+    """
+    (path, version) of the county's forest tile source, building it on first use.
+    `version` changes whenever the underlying raster does.
+
+    Raises:
+        FileNotFoundError: If the county has no local raster.
+    """
+    raster_path = find_forest_raster(county_key)
+    version = str(os.stat(raster_path).st_mtime_ns)
+    stem = os.path.splitext(os.path.basename(raster_path))[0]
+    path = os.path.join(FOREST_TILE_SOURCE_DIR, f"{stem}_{version}.tif")
+    if os.path.exists(path):
+        return path, version
+
+    with _build_lock(path):
+        if not os.path.exists(path):
+            logger.info(f"Building forest tile source for {county_key} from {raster_path}")
+            os.makedirs(FOREST_TILE_SOURCE_DIR, exist_ok=True)
+            _build_source(raster_path, path)
+            # Drop sources built from older versions of the raster
+            stale = re.compile(rf"{re.escape(stem)}_\d+\.tif")
+            for filename in os.listdir(FOREST_TILE_SOURCE_DIR):
+                if stale.fullmatch(filename) and filename != os.path.basename(path):
+                    try:
+                        os.remove(os.path.join(FOREST_TILE_SOURCE_DIR, filename))
+                    except OSError:
+                        pass
+    return path, version
+
+
+def layer_info(county_key):
+    """
+    Version and WGS84 bounds of the county's local forest layer.
+
+    Raises:
+        FileNotFoundError: If the county has no local raster.
+    """
+    path, version = tile_source(county_key)
+    with rasterio.open(path) as src:
+        west, south, east, north = transform_bounds(src.crs, "EPSG:4326", *src.bounds)
+    return {"version": version, "bounds_wgs84": {"west": west, "south": south, "east": east, "north": north}}
+
+
+def render_tile(county_key, z, x, y):
+    """
+    PNG tile z/x/y of the county's forest layer (green = forest).
+
+    Returns:
+        (png bytes, version)
+
+    Raises:
+        FileNotFoundError: If the county has no local raster.
+    """
+    path, version = tile_source(county_key)
+    classes = tiles.read_tile(path, z, x, y, nodata=NO_FOREST, overviews=True)
+    if classes is None:
+        return tiles.empty_tile(), version
+    return tiles.encode_png(classes, tiles.FOREST_PALETTE), version
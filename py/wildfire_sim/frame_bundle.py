@@ -0,0 +1,191 @@
+"""
+frame_bundle.py
+---------------------------------------------
+Frame manifest and single-file frame bundle for SCA runs.
+
+Every run directory gets a manifest.json describing its frames (file,
+timestep, per-frame burning/burnt cell counts) together with the shared
+output grid (bounds, CRS, transform, size), so a client can load a run
+without probing for wildfire_t_NNN.tif files one by one.
+
+frames.tif bundles all frames of a run as one multi-band GeoTIFF (band
+i+1 = timestep i). It is built on first request and rebuilt when the
+run has been extended since.
+
+arrival.tif holds, per cell, the timestep at which it caught fire (uint16,
+ARRIVAL_NODATA if it never did). Since a cell burns for exactly one step,
+frame t is fully described by it: burning where arrival == t, burnt where
+arrival < t. Tiles for any timestep are rendered from this one file.
+"""
+
+import json
+import os
+import threading
+
+import numpy as np
+import rasterio
+from rasterio.transform import array_bounds
+from rasterio.warp import transform_bounds
+from rasterio.windows import Window, transform as window_transform
+
+from utils import tiles
+
+from wildfire_sim.kernels import NO_FOREST, FOREST, BURNING, BURNT
+
+MANIFEST_FILENAME = "manifest.json"
+BUNDLE_FILENAME = "frames.tif"
+ARRIVAL_FILENAME = "arrival.tif"
+ARRIVAL_NODATA = np.iinfo(np.uint16).max
+
+CELL_CLASSES = {NO_FOREST: "no_forest", FOREST: "forest", BURNING: "burning", BURNT: "burnt"}
+
+
+def frame_filename(t):
+    return f"wildfire_t_{t:03d}.tif"
+
+
+def frame_entry(t, burning, burnt):
+    """Per-frame entry for the manifest (counts cover the full grid, not just the crop)."""
+    return {"t": t, "file": frame_filename(t), "burning": burning, "burnt": burnt, "burned": burning + burnt}
+
+
+def frame_stats(state, t):
+    """frame_entry counted from a full state grid."""
+    return frame_entry(t, int(np.count_nonzero(state == BURNING)), int(np.count_nonzero(state == BURNT)))
+
+
+def _output_grid(run, meta):
+    """(transform, height, width) of the run's frames: the crop window, or the full raster."""
+    crop = run.get("crop_window")
+    if crop:
+        return window_transform(Window(**crop), meta["transform"]), crop["height"], crop["width"]
+    return meta["transform"], meta["height"], meta["width"]
+
+
+def write_manifest(run_dir, run, meta):
+    """Write manifest.json for a run from its run record and the source raster meta."""
+    transform, height, width = _output_grid(run, meta)
+    left, bottom, right, top = array_bounds(height, width, transform)
+    crs = meta.get("crs")
+    wgs84 = transform_bounds(crs, "EPSG:4326", left, bottom, right, top) if crs else None
+    manifest = {
+        "frames": run.get("frames", []),
+        "frame_count": len(run.get("frames", [])),
+        "bounds": {"left": left, "bottom": bottom, "right": right, "top": top},
+        "bounds_wgs84": dict(zip(("west", "south", "east", "north"), wgs84)) if wgs84 else None,
+        "crs": crs.to_string() if crs else None,
+        "transform": list(transform)[:6],
+        "width": width,
+        "height": height,
+        "dtype": "uint8",
+        "classes": {str(k): v for k, v in CELL_CLASSES.items()},
+        "timesteps": run.get("timesteps"),
+        "burned_out": run.get("burned_out"),
+        "bundle": BUNDLE_FILENAME,
+        "arrival": ARRIVAL_FILENAME if os.path.exists(os.path.join(run_dir, ARRIVAL_FILENAME)) else None,
+    }
+
+    path = os.path.join(run_dir, MANIFEST_FILENAME)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+    return manifest
+
+
+def read_manifest(run_dir):
+    """
+    Load manifest.json.
+
+    Raises:
+        FileNotFoundError: If the run has no manifest.
+    """
+    path = os.path.join(run_dir, MANIFEST_FILENAME)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No {MANIFEST_FILENAME} in {run_dir}.")
+    with open(path) as f:
+        return json.load(f)
+
+
+def get_bundle(run_dir):
+    """
+    Path of the run's multi-band frame bundle, building it if missing or
+    older than the manifest.
+
+    Raises:
+        FileNotFoundError: If the run has no manifest.
+    """
+    manifest = read_manifest(run_dir)
+    path = os.path.join(run_dir, BUNDLE_FILENAME)
+    manifest_mtime = os.path.getmtime(os.path.join(run_dir, MANIFEST_FILENAME))
+    if os.path.exists(path) and os.path.getmtime(path) >= manifest_mtime:
+        return path
+
+    frames = manifest["frames"]
+    with rasterio.open(os.path.join(run_dir, frames[0]["file"])) as first:
+        profile = first.profile.copy()
+    profile.update(count=len(frames), dtype=rasterio.uint8, compress="lzw", tiled=False)
+
+    # Unique temp name: concurrent first requests may build the bundle at the same time
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with rasterio.open(tmp, "w", **profile) as dst:
+        for band, frame in enumerate(frames, start=1):
+            with rasterio.open(os.path.join(run_dir, frame["file"])) as src:
+                dst.write(src.read(1), band)
+            dst.set_band_description(band, f"t={frame['t']:03d}")
+    os.replace(tmp, path)
+    return path
+
+
+# --- ARRIVAL TIME ---
+
+def read_arrival(run_dir):
+    """The run's arrival-time array (frame extent), or None if it has none."""
+    path = os.path.join(run_dir, ARRIVAL_FILENAME)
+    if not os.path.exists(path):
+        return None
+    with rasterio.open(path) as src:
+        return src.read(1)
+
+
+def write_arrival(run_dir, arrival, run, meta):
+    transform, height, width = _output_grid(run, meta)
+    profile = {
+        "driver": "GTiff", "dtype": rasterio.uint16, "count": 1, "nodata": ARRIVAL_NODATA,
+        "crs": meta.get("crs"), "transform": transform, "height": height, "width": width,
+        "compress": "lzw",
+    }
+    path = os.path.join(run_dir, ARRIVAL_FILENAME)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with rasterio.open(tmp, "w", **profile) as dst:
+        dst.write(arrival, 1)
+    os.replace(tmp, path)
+
+
+# --- TILES ---
+
+def render_tile(run_dir, t, z, x, y):
+    """
+    PNG tile z/x/y of frame t, rendered from arrival.tif when the run has one
+    (otherwise from the frame GeoTIFF).
+
+    Raises:
+        FileNotFoundError: If the run has no manifest or no frame t.
+    """
+    manifest = read_manifest(run_dir)
+    if not 0 <= t < manifest["frame_count"]:
+        raise FileNotFoundError(f"Run {run_dir} has no frame t={t}.")
+
+    arrival_path = os.path.join(run_dir, ARRIVAL_FILENAME)
+    if manifest.get("arrival") and os.path.exists(arrival_path):
+        arrival = tiles.read_tile(arrival_path, z, x, y, nodata=ARRIVAL_NODATA)
+        if arrival is None:
+            return tiles.empty_tile()
+        classes = np.zeros(arrival.shape, dtype=np.uint8)
+        classes[arrival < t] = BURNT
+        classes[arrival == t] = BURNING
+    else:
+        classes = tiles.read_tile(os.path.join(run_dir, frame_filename(t)), z, x, y, nodata=NO_FOREST)
+        if classes is None:
+            return tiles.empty_tile()
+    return tiles.encode_png(classes, tiles.FIRE_PALETTE)
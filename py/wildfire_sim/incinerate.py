@@ -2,7 +2,7 @@ import os
 import time
 import numpy as np
 import matplotlib.pyplot as plt
-from config import OUTPUT_BASE, ROOSEVELT_FOREST_COVER_CSV
+from config import WILDFIRE_OUTPUT_BASE, ROOSEVELT_FOREST_COVER_CSV
 import pandas as pd
 import random as rnd
 import networkx as nx
@@ -12,7 +12,10 @@ matplotlib.use('Agg')
 from matplotlib.path import Path
 from matplotlib.colors import ListedColormap
 # import create_forest
-from wildfire_sim.create_forest import get_point_in_forest
+from wildfire_sim.create_forest import get_compiled_forest
+from wildfire_sim import kernels
+from utils import metrics
+from utils.profiling import RunProfiler
 
 # =========================================================================
 # User-configurable Parameters
@@ -181,18 +184,18 @@ def incinerate(g, colors, edge_list):
 
     # Ember mechanic
     non_empty_nodes = [n for n in g.nodes if g.nodes[n]['fire_state'] not in ('empty', 'burning', 'burnt')]
+    if non_empty_nodes:
+        # Positions as arrays so the candidate search runs in the kernel backend
+        non_empty_pos = np.array([g.nodes[n]['pos'] for n in non_empty_nodes], dtype=np.float64)
+        non_empty_xs = np.ascontiguousarray(non_empty_pos[:, 0])
+        non_empty_ys = np.ascontiguousarray(non_empty_pos[:, 1])
     for bnode in burning_nodes:
         if not non_empty_nodes:
             break
         if rnd.random() < EMBER_PROB:
             bx, by = g.nodes[bnode]['pos']
-            candidates = []
-            for n in non_empty_nodes:
-                nxp, nyp = g.nodes[n]['pos']
-                dx = abs(nxp - bx) / cell_scale
-                dy = abs(nyp - by) / cell_scale
-                if dx <= EMBER_RADIUS and dy <= EMBER_RADIUS:
-                    candidates.append(n)
+            idx = kernels.ember_candidates(non_empty_xs, non_empty_ys, bx, by, cell_scale, EMBER_RADIUS)
+            candidates = [non_empty_nodes[i] for i in idx]
             
             if not candidates:
                 if rnd.random() < 0.1:
@@ -309,14 +312,33 @@ def draw_forest_snapshot(g, grid_size, timestep, output_dir):
     plt.savefig(filepath, bbox_inches='tight', pad_inches=0, dpi=150)
     plt.close()
 
-def run_wildfire_simulation(forest_shape=None):
+@metrics.SIMULATION_QUEUE_DEPTH.track_inprogress()
+@metrics.SIMULATION_SECONDS.labels(engine="incinerate").time()
+def run_wildfire_simulation(forest_shape=None, profile=False, cprofile=False):
     """
     Run wildfire simulation using detailed logic from incinerate_old.py
     and save each timestep as a raster PNG.
+
+    With profile=True, per-phase timings and peak memory are written to
+    <output_dir>/profile.json and returned under "profile" (cprofile=True
+    also dumps cProfile stats to <output_dir>/profile.pstats).
     """
-    logger.info(f"Starting wildfire simulation...")
+    profiler = RunProfiler(enabled=profile, cprofile=cprofile).start()
+    try:
+        result = _run_wildfire_simulation(forest_shape, profiler)
+    finally:
+        profiler.stop()
+    if profile and result.get("success"):
+        profiler.write(result["output_dir"])
+        result["profile"] = profiler.report()
+    return result
+
+def _run_wildfire_simulation(forest_shape, profiler):
+    """Body of run_wildfire_simulation; each phase is reported to `profiler`."""
+    logger.info(f"Starting wildfire simulation (kernel backend: {kernels.get_backend()})...")
     try:
-        df = pd.read_csv(CSV_FILE)
+        with profiler.phase("load_csv"):
+            df = pd.read_csv(CSV_FILE)
     except FileNotFoundError:
         logger.error(f"[ERROR] File not found at path: {CSV_FILE}")
         return {"success": False, "error": f"Dataset file not found at {CSV_FILE}"}
@@ -332,11 +354,14 @@ def run_wildfire_simulation(forest_shape=None):
     pos_dict = {}
     aspect_dict = {'N': -0.063, 'NE':0.349, 'E':0.686, 'SE':0.557, 'S':0.039, 'SW':-0.155, 'W':-0.252, 'NW':-0.171}
 
-    # Create a point-in-forest predicate using the helper module; this will
+    # Compile the forest shape for this grid using the helper module; this will
     # use the provided override `forest_shape` if passed, otherwise it will
-    # read the latest stored shape from the SSOT in `state.py`.
-    point_in_forest = get_point_in_forest(scale, grid_size, forest_shape)
-    if forest_shape and not point_in_forest:
+    # read the latest stored shape from the SSOT in `state.py`. The compiled
+    # shape (predicate + per-node mask) is cached, so repeated runs reuse it.
+    profiler.mark("build_graph")
+    forest = get_compiled_forest(scale, grid_size, forest_shape)
+    forest_mask = forest.mask if forest is not None else None
+    if forest_shape and forest_mask is None:
         logger.error("Invalid GeoJSON: 'forest_shape' was provided but could not be processed.")
         logger.error("Please provide a valid GeoJSON Feature or Geometry with type 'Polygon' or 'MultiPolygon'.")
         return {
@@ -398,14 +423,10 @@ def run_wildfire_simulation(forest_shape=None):
             pos_dict[k] = current_pos
 
             # Check if node is inside the provided forest shape
+            # (forest_mask[i-1, j-1] is the create_forest predicate at current_pos)
             inside_forest = True
-            if point_in_forest:
-                try:
-                    # point_in_forest is the predicate from create_forest
-                    inside_forest = bool(point_in_forest(current_pos))
-                except Exception as e:
-                    logger.warning(f"Error checking point_in_forest for {current_pos}: {e}")
-                    inside_forest = True # Default to inside on error
+            if forest_mask is not None:
+                inside_forest = bool(forest_mask[i - 1, j - 1])
 
             if not inside_forest:
                 g.add_node(k, threshold_switch=1.0, color='black', num_of_active_neighbors=0,
@@ -441,6 +462,7 @@ def run_wildfire_simulation(forest_shape=None):
         lf = np.floor((g.nodes[n1]['life'] + g.nodes[n2]['life']) / 2)
         g.add_edge(n1, n2, w=pp, color='green', life=int(lf), edge_strength=0, wind_speed=0.01, wind_dir=angle, eb=0)
 
+    profiler.mark("setup")
     non_burnt_nodes = [n for n in g.nodes if g.nodes[n]['fire_state'] == 'not_burnt']
     if not non_burnt_nodes:
         logger.warning("No nodes available to ignite. Forest is empty or all density checks failed.")
@@ -460,9 +482,10 @@ def run_wildfire_simulation(forest_shape=None):
     logger.info(f"Ignition set at node {ignition_node} (pos {g.nodes[ignition_node]['pos']})")
 
     # --- Setup Output Directory ---
-    output_dir = os.path.join(OUTPUT_BASE, f"wildfire_run_{int(time.time())}")
+    output_dir = os.path.join(WILDFIRE_OUTPUT_BASE, f"wildfire_run_{int(time.time())}")
     os.makedirs(output_dir, exist_ok=True)
     logger.info(f"Saving simulation frames to: {output_dir}")
+    profiler.mark(None)
 
     # --- Main Simulation Loop ---
     final_timestep = 0
@@ -471,7 +494,8 @@ def run_wildfire_simulation(forest_shape=None):
         current_burning_forests = count_burning(g)
 
         # Draw the state *before* this step's incineration
-        draw_forest_snapshot(g, grid_size, i, output_dir)
+        with profiler.phase("render"):
+            draw_forest_snapshot(g, grid_size, i, output_dir)
         
         # Stop when there are no burning nodes left
         if current_burning_forests == 0 and i > 0:
@@ -482,11 +506,13 @@ def run_wildfire_simulation(forest_shape=None):
              logger.info(f"Simulation reached max timesteps ({TIMESTEPS}).")
 
         # Run fire spread logic
-        g, colors = incinerate(g, colors, edge_list)
+        with profiler.phase("spread"):
+            g, colors = incinerate(g, colors, edge_list)
 
         # Run wind logic
         if i > 0:
-            simulate_wind(g, edge_list, MAX_WIND_SPEED, 0.1, dist_scale)
+            with profiler.phase("wind"):
+                simulate_wind(g, edge_list, MAX_WIND_SPEED, 0.1, dist_scale)
 
     logger.info(f"Simulation complete. Final timestep: {final_timestep}")
 
@@ -0,0 +1,181 @@
+"""
+ingest.py
+---------------------------------------------
+Ingest stage for downloaded county forest rasters.
+
+GEE exports hold the float32 Dynamic World 'trees' probability. Ingesting a
+raster rewrites it in place, once, as the class grid the simulator uses:
+
+    uint8, FOREST (1) where trees >= FOREST_TREES_THRESHOLD, else NO_FOREST (0),
+    CLASS_NODATA (255) where the source had nodata / NaN,
+    tiled + deflate, tagged WILDFIRE_FOREST_CLASSES=1
+
+and writes a sidecar <raster>.stats.json with per-raster statistics (forest
+fraction, cell counts, bounds, threshold, source dtype). Simulations then
+read a 4x smaller grid that needs no conversion. Rasters that already hold
+classes (e.g. ForestCover_<key>_2024.tif) keep them and are only re-encoded.
+
+Exports are ingested right after download; existing files can be
+converted from py/ with:
+    python -m wildfire_sim.ingest [raster.tif ...]   # default: all of GEOTIFF_DIR
+"""
+
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+import rasterio
+from rasterio.warp import transform_bounds
+
+from wildfire_sim.kernels import NO_FOREST, FOREST
+
+try:
+    from config import GEOTIFF_DIR, FOREST_TREES_THRESHOLD
+except ImportError:
+    GEOTIFF_DIR = os.path.join(os.getcwd(), "geotiffs")
+    FOREST_TREES_THRESHOLD = 0.5
+
+logger = logging.getLogger(__name__)
+
+CLASS_NODATA = 255
+INGEST_TAG = "WILDFIRE_FOREST_CLASSES"
+STATS_SUFFIX = ".stats.json"
+BLOCK_SIZE = 256
+
+
+def forest_classes(data, nodata, threshold=None):
+    """
+    Forest class grid from a class or 'trees' probability band: FOREST /
+    NO_FOREST, and CLASS_NODATA where the source has no data.
+    """
+    threshold = FOREST_TREES_THRESHOLD if threshold is None else threshold
+    valid = ~np.isnan(data) if np.issubdtype(data.dtype, np.floating) else np.ones(data.shape, dtype=bool)
+    if nodata is not None and not np.isnan(nodata):
+        valid &= data != nodata
+    if np.issubdtype(data.dtype, np.floating):
+        forest = valid & (data >= threshold)
+    else:
+        forest = valid & (data == FOREST)
+    classes = np.where(forest, FOREST, NO_FOREST).astype(np.uint8)
+    classes[~valid] = CLASS_NODATA
+    return classes
+
+
+def is_ingested(src):
+    """True if an open rasterio dataset is an ingested class raster."""
+    return src.dtypes[0] == "uint8" and src.tags().get(INGEST_TAG) == "1"
+
+
+def stats_path(path):
+    return f"{os.path.splitext(path)[0]}{STATS_SUFFIX}"
+
+
+def read_stats(path):
+    """Sidecar statistics of an ingested raster, or None if missing or out of date."""
+    try:
+        with open(stats_path(path)) as f:
+            stats = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if stats.get("mtime_ns") != os.stat(path).st_mtime_ns:
+        return None
+    return stats
+
+
+def _stats(classes, src, source_dtype, threshold):
+    valid_cells = int(np.count_nonzero(classes != CLASS_NODATA))
+    forest_cells = int(np.count_nonzero(classes == FOREST))
+    west, south, east, north = src.bounds
+    bounds_wgs84 = transform_bounds(src.crs, "EPSG:4326", west, south, east, north) if src.crs else None
+    return {
+        "width": src.width,
+        "height": src.height,
+        "crs": src.crs.to_string() if src.crs else None,
+        "bounds": [west, south, east, north],
+        "bounds_wgs84": list(bounds_wgs84) if bounds_wgs84 else None,
+        "source_dtype": source_dtype,
+        "threshold": threshold if np.issubdtype(np.dtype(source_dtype), np.floating) else None,
+        "valid_cells": valid_cells,
+        "nodata_cells": int(classes.size - valid_cells),
+        "forest_cells": forest_cells,
+        "forest_fraction": round(forest_cells / valid_cells, 6) if valid_cells else 0.0,
+    }
+
+
+def _write_json(path, data):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def ingest_raster(path, threshold=None):
+    """
+    Convert a forest raster in place to a uint8 class raster and write its
+    stats sidecar. A raster that is already ingested is left as is (its
+    sidecar is rewritten if missing or stale).
+
+    Returns:
+        dict: The raster statistics (see the module docstring).
+    """
+    threshold = FOREST_TREES_THRESHOLD if threshold is None else threshold
+    stats = read_stats(path)
+    if stats is not None:
+        return stats
+
+    with rasterio.open(path) as src:
+        source_dtype = src.dtypes[0]
+        if is_ingested(src):
+            classes = src.read(1)
+            stats = _stats(classes, src, src.tags().get("source_dtype", source_dtype),
+                           float(src.tags().get("threshold", threshold)))
+            converted = False
+        else:
+            classes = forest_classes(src.read(1), src.nodata, threshold)
+            stats = _stats(classes, src, source_dtype, threshold)
+            profile = {
+                "driver": "GTiff", "dtype": rasterio.uint8, "count": 1, "nodata": CLASS_NODATA,
+                "crs": src.crs, "transform": src.transform, "width": src.width, "height": src.height,
+                "tiled": True, "blockxsize": BLOCK_SIZE, "blockysize": BLOCK_SIZE, "compress": "deflate",
+            }
+            converted = True
+
+    if converted:
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with rasterio.open(tmp, "w", **profile) as dst:
+                dst.write(classes, 1)
+                dst.update_tags(**{INGEST_TAG: "1", "source_dtype": source_dtype, "threshold": str(threshold)})
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        logger.info(f"Ingested {path}: {source_dtype} -> uint8 classes, "
+                    f"forest fraction {stats['forest_fraction']:.3f}")
+
+    stats["mtime_ns"] = os.stat(path).st_mtime_ns
+    stats["ingested"] = datetime.now().isoformat(timespec="seconds")
+    _write_json(stats_path(path), stats)
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s - %(message)s")
+
+    parser = argparse.ArgumentParser(description="Convert forest rasters to uint8 class rasters with a stats sidecar.")
+    parser.add_argument("paths", nargs="*", help="Rasters to ingest (default: every .tif in GEOTIFF_DIR).")
+    parser.add_argument("--threshold", type=float, default=None, help="Forest threshold for 'trees' probabilities.")
+    args = parser.parse_args()
+
+    paths = args.paths or sorted(os.path.join(GEOTIFF_DIR, f) for f in os.listdir(GEOTIFF_DIR)
+                                 if f.lower().endswith(".tif"))
+    for raster_path in paths:
+        result = ingest_raster(raster_path, args.threshold)
+        print(f"{raster_path}: forest {result['forest_fraction']:.3f} "
+              f"({result['forest_cells']} of {result['valid_cells']} valid cells)")
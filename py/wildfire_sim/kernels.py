@@ -0,0 +1,246 @@
+"""
+kernels.py
+---------------------------------------------
+Per-step update kernels for the wildfire simulations.
+
+Two interchangeable backends are provided:
+    numba → tight loops compiled with Numba (used automatically if installed)
+    numpy → vectorised NumPy / SciPy (always available)
+
+The backend is resolved lazily on first use. Set CA_KERNEL_BACKEND in
+config.py (or the WILDFIRE_KERNEL_BACKEND env var) to 'numpy' or 'numba'
+to force one. Both backends consume the random generator in the same
+order, so a seeded run produces identical grids on either backend.
+"""
+
+import logging
+import threading
+
+import numpy as np
+from scipy.ndimage import binary_dilation
+
+try:
+    from config import CA_KERNEL_BACKEND
+except ImportError:
+    CA_KERNEL_BACKEND = "auto"
+
+logger = logging.getLogger(__name__)
+
+# --- CELL STATES (shared by sca.py and the kernels below) ---
+NO_FOREST = 0  # Non-burnable land
+FOREST = 1     # Burnable forest
+BURNING = 2    # Actively on fire
+BURNT = 3      # Burnt out
+
+BACKEND_NUMPY = "numpy"
+BACKEND_NUMBA = "numba"
+
+_NEIGHBORHOOD = np.ones((3, 3), dtype=bool)
+# The same 8-neighbourhood within each grid of a (members, height, width) stack
+_STACK_NEIGHBORHOOD = np.zeros((3, 3, 3), dtype=bool)
+_STACK_NEIGHBORHOOD[1] = True
+
+_backend = None
+_numba_kernels = None
+_backend_lock = threading.Lock()
+
+
+# --- NUMPY BACKEND ---
+
+def _ca_step_numpy(grid, p_ignite, p_spontaneous, rng):
+    """Vectorised CA step. Draws one uniform per candidate cell in row-major order."""
+    is_burning = (grid == BURNING)
+    is_forest = (grid == FOREST)
+    has_burning_neighbor = binary_dilation(is_burning, structure=_NEIGHBORHOOD)
+
+    # Only forest cells that can actually ignite consume a random draw
+    if p_spontaneous > 0:
+        candidates = is_forest
+    else:
+        candidates = is_forest & has_burning_neighbor
+
+    next_grid = grid.copy()
+    next_grid[is_burning] = BURNT
+
+    n_candidates = int(np.count_nonzero(candidates))
+    if n_candidates:
+        draws = rng.random(n_candidates)
+        thresholds = np.where(has_burning_neighbor[candidates], p_ignite, p_spontaneous)
+        ignites = np.zeros_like(candidates)
+        ignites[candidates] = draws < thresholds
+        next_grid[ignites] = BURNING
+
+    return next_grid
+
+
+def _ember_candidates_numpy(xs, ys, bx, by, cell_scale, radius):
+    """Indices of nodes within `radius` grid cells (per axis) of (bx, by)."""
+    dx = np.abs(xs - bx) / cell_scale
+    dy = np.abs(ys - by) / cell_scale
+    return np.flatnonzero((dx <= radius) & (dy <= radius))
+
+
+# --- NUMBA BACKEND ---
+
+def _build_numba_kernels():
+    """Compile the Numba kernels. Raises ImportError if Numba is not installed."""
+    import numba
+
+    @numba.njit(cache=True, nogil=True)
+    def ca_step(grid, p_ignite, p_spontaneous, rng):
+        height, width = grid.shape
+        next_grid = grid.copy()
+
+        # Bounding box of the burning cells; without spontaneous ignition
+        # nothing outside it (plus a one-cell ring) can change.
+        y0, y1, x0, x1 = height, -1, width, -1
+        for y in range(height):
+            for x in range(width):
+                if grid[y, x] == BURNING:
+                    y0 = min(y0, y)
+                    y1 = max(y1, y)
+                    x0 = min(x0, x)
+                    x1 = max(x1, x)
+        if p_spontaneous > 0:
+            y0, y1, x0, x1 = 0, height - 1, 0, width - 1
+        elif y1 < 0:
+            return next_grid
+        else:
+            y0, y1 = max(0, y0 - 1), min(height - 1, y1 + 1)
+            x0, x1 = max(0, x0 - 1), min(width - 1, x1 + 1)
+
+        for y in range(y0, y1 + 1):
+            for x in range(x0, x1 + 1):
+                state = grid[y, x]
+                if state == BURNING:
+                    next_grid[y, x] = BURNT
+                elif state == FOREST:
+                    has_burning_neighbor = False
+                    for ny in range(max(0, y - 1), min(height, y + 2)):
+                        for nx in range(max(0, x - 1), min(width, x + 2)):
+                            if grid[ny, nx] == BURNING:
+                                has_burning_neighbor = True
+                                break
+                        if has_burning_neighbor:
+                            break
+                    if has_burning_neighbor:
+                        if rng.random() < p_ignite:
+                            next_grid[y, x] = BURNING
+                    elif p_spontaneous > 0 and rng.random() < p_spontaneous:
+                        next_grid[y, x] = BURNING
+        return next_grid
+
+    @numba.njit(cache=True, nogil=True)
+    def ember_candidates(xs, ys, bx, by, cell_scale, radius):
+        out = np.empty(xs.shape[0], dtype=np.int64)
+        n = 0
+        for i in range(xs.shape[0]):
+            if abs(xs[i] - bx) / cell_scale <= radius and abs(ys[i] - by) / cell_scale <= radius:
+                out[n] = i
+                n += 1
+        return out[:n]
+
+    return {"ca_step": ca_step, "ember_candidates": ember_candidates}
+
+
+def _warm_up(kernels):
+    """Trigger compilation on tiny inputs so failures surface at selection time."""
+    grid = np.array([[FOREST, BURNING], [NO_FOREST, FOREST]], dtype=np.uint8)
+    kernels["ca_step"](grid, 0.5, 0.0, np.random.default_rng(0))
+    pts = np.zeros(2, dtype=np.float64)
+    kernels["ember_candidates"](pts, pts, 0.0, 0.0, 1.0, 1.0)
+
+
+# --- BACKEND SELECTION ---
+
+def get_backend():
+    """Return the active backend name, resolving it on first call."""
+    global _backend, _numba_kernels
+    if _backend is not None:
+        return _backend
+
+    with _backend_lock:
+        if _backend is not None:
+            return _backend
+
+        requested = (CA_KERNEL_BACKEND or "auto").lower()
+        if requested not in ("auto", BACKEND_NUMPY, BACKEND_NUMBA):
+            logger.warning(f"Unknown CA_KERNEL_BACKEND '{requested}', falling back to 'auto'.")
+            requested = "auto"
+
+        backend = BACKEND_NUMPY
+        if requested != BACKEND_NUMPY:
+            try:
+                kernels = _build_numba_kernels()
+                _warm_up(kernels)
+                _numba_kernels = kernels
+                backend = BACKEND_NUMBA
+            except ImportError:
+                if requested == BACKEND_NUMBA:
+                    logger.warning("CA_KERNEL_BACKEND='numba' but Numba is not installed; using NumPy kernels.")
+            except Exception as e:
+                logger.warning(f"Numba kernel compilation failed ({e}); using NumPy kernels.")
+
+        _backend = backend
+        logger.info(f"Wildfire CA kernel backend: {_backend}")
+        return _backend
+
+
+def ca_step(grid, p_ignite, p_spontaneous, rng):
+    """
+    Advance the stochastic CA by one step.
+
+    Args:
+        grid (np.ndarray): 2D uint8 grid of cell states.
+        p_ignite (float): Ignition probability for forest next to fire.
+        p_spontaneous (float): Ignition probability for any other forest cell.
+        rng (np.random.Generator): Random source (advanced in place).
+
+    Returns:
+        np.ndarray: The next grid (the input is not modified).
+    """
+    if get_backend() == BACKEND_NUMBA:
+        return _numba_kernels["ca_step"](grid, float(p_ignite), float(p_spontaneous), rng)
+    return _ca_step_numpy(grid, p_ignite, p_spontaneous, rng)
+
+
+def ember_candidates(xs, ys, bx, by, cell_scale, radius):
+    """
+    Return indices into (xs, ys) of points within `radius` cells of (bx, by),
+    measured independently along each axis (a square search window).
+    """
+    if get_backend() == BACKEND_NUMBA:
+        return _numba_kernels["ember_candidates"](xs, ys, float(bx), float(by), float(cell_scale), float(radius))
+    return _ember_candidates_numpy(xs, ys, bx, by, cell_scale, radius)
+
+
+def ca_step_stack(grids, p_ignite, p_spontaneous, rng):
+    """
+    Advance a stack of independent CA grids by one step in a single
+    vectorised pass (parameter sweeps). NumPy only: the work is a handful of
+    whole-stack array operations whichever backend is active.
+
+    Args:
+        grids (np.ndarray): 3D uint8 array (members, height, width).
+        p_ignite (np.ndarray): Per-member ignition probability, shape (members,).
+        p_spontaneous (np.ndarray): Per-member spontaneous probability, shape (members,).
+        rng (np.random.Generator): Random source (advanced in place).
+
+    Returns:
+        np.ndarray: The next stack (the input is not modified).
+    """
+    p_ignite = np.asarray(p_ignite, dtype=np.float64)
+    p_spontaneous = np.asarray(p_spontaneous, dtype=np.float64)
+    is_burning = (grids == BURNING)
+    has_burning_neighbor = binary_dilation(is_burning, structure=_STACK_NEIGHBORHOOD)
+    candidates = (grids == FOREST) & (has_burning_neighbor | (p_spontaneous > 0)[:, None, None])
+
+    next_grids = grids.copy()
+    next_grids[is_burning] = BURNT
+
+    members, ys, xs = np.nonzero(candidates)
+    if members.size:
+        thresholds = np.where(has_burning_neighbor[members, ys, xs], p_ignite[members], p_spontaneous[members])
+        ignites = rng.random(members.size) < thresholds
+        next_grids[members[ignites], ys[ignites], xs[ignites]] = BURNING
+    return next_grids
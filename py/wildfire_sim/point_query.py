@@ -0,0 +1,127 @@
+"""
+point_query.py
+---------------------------------------------
+Batch ignition-point queries against a county forest raster.
+
+For each (lat, lon) this answers "is this pixel burnable?" and "where is
+the nearest FOREST pixel?". Snapping uses a nearest-feature index raster
+from scipy's Euclidean distance transform, computed once per decoded
+county raster and kept alongside it, so every lookup after the first is
+a constant-time array index.
+"""
+
+import logging
+import threading
+import weakref
+
+import numpy as np
+from rasterio.transform import xy
+from scipy.ndimage import distance_transform_edt
+
+from wildfire_sim.sca import FOREST, _coords_to_pixels, _load_county_raster
+
+logger = logging.getLogger(__name__)
+
+# CountyRaster -> nearest-FOREST index raster of shape (2, H, W), or None if
+# the raster has no forest at all. Entries go away with the raster cache entry.
+_nearest_index_cache = weakref.WeakKeyDictionary()
+_nearest_index_lock = threading.Lock()
+
+
+def _nearest_forest_indices(raster):
+    """Return the cached (2, H, W) array of nearest FOREST (row, col) per pixel."""
+    with _nearest_index_lock:
+        if raster in _nearest_index_cache:
+            return _nearest_index_cache[raster]
+
+    forest = raster.grid == FOREST
+    if not forest.any():
+        indices = None
+    else:
+        logger.info(f"Computing nearest-forest index for {raster.path} {raster.shape}...")
+        # EDT measures distance to the nearest zero, so forest pixels are the zeros
+        indices = distance_transform_edt(~forest, return_distances=False, return_indices=True)
+        # Row/col fit in uint16 for any realistic county raster; halves the footprint
+        if max(raster.shape) < np.iinfo(np.uint16).max:
+            indices = indices.astype(np.uint16)
+        indices.setflags(write=False)
+
+    with _nearest_index_lock:
+        _nearest_index_cache[raster] = indices
+    return indices
+
+
+def query_points(county_key, points, max_snap_distance=None):
+    """
+    Check many ignition points in one county and snap them to the nearest forest.
+
+    Args:
+        county_key (str): The county key (e.g., "Arlington_VA").
+        points (list[dict]): [{"lat": float, "lon": float}, ...]
+        max_snap_distance (float, optional): Snap radius in pixels; points whose
+            nearest forest pixel is further away get no "nearest" result.
+
+    Returns:
+        list[dict]: One entry per point with "in_bounds", "value", "burnable"
+            and "nearest" ({row, col, lat, lon, distance_px, distance} or None).
+            "distance" is in raster CRS units.
+
+    Raises:
+        FileNotFoundError: If the county GeoTIFF cannot be found.
+    """
+    raster = _load_county_raster(county_key)
+    lats = np.asarray([p["lat"] for p in points], dtype=np.float64)
+    lons = np.asarray([p["lon"] for p in points], dtype=np.float64)
+
+    rows, cols = _coords_to_pixels(lats, lons, raster.transform)
+    height, width = raster.shape
+    in_bounds = (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+    r_in, c_in = rows[in_bounds], cols[in_bounds]
+
+    values = np.full(rows.shape, -1, dtype=np.int64)
+    values[in_bounds] = raster.grid[r_in, c_in]
+
+    indices = _nearest_forest_indices(raster)
+    near_rows = np.full(rows.shape, -1, dtype=np.int64)
+    near_cols = np.full(rows.shape, -1, dtype=np.int64)
+    if indices is not None:
+        near_rows[in_bounds] = indices[0, r_in, c_in]
+        near_cols[in_bounds] = indices[1, r_in, c_in]
+    has_nearest = near_rows >= 0
+
+    distance_px = np.hypot(near_rows - rows, near_cols - cols)
+    transform = raster.transform
+    distance = np.hypot((near_rows - rows) * transform.e, (near_cols - cols) * transform.a)
+    if max_snap_distance is not None:
+        has_nearest &= distance_px <= max_snap_distance
+
+    # Pixel centres of the snapped cells, back in the raster's coordinates
+    near_x, near_y = xy(transform, near_rows[has_nearest], near_cols[has_nearest])
+    near_x = np.atleast_1d(near_x)
+    near_y = np.atleast_1d(near_y)
+
+    results = []
+    j = 0
+    for i in range(len(points)):
+        nearest = None
+        if has_nearest[i]:
+            nearest = {
+                "row": int(near_rows[i]),
+                "col": int(near_cols[i]),
+                "lat": float(near_y[j]),
+                "lon": float(near_x[j]),
+                "distance_px": round(float(distance_px[i]), 3),
+                "distance": round(float(distance[i]), 6),
+            }
+            j += 1
+        results.append({
+            "lat": float(lats[i]),
+            "lon": float(lons[i]),
+            "row": int(rows[i]),
+            "col": int(cols[i]),
+            "in_bounds": bool(in_bounds[i]),
+            "value": int(values[i]) if in_bounds[i] else None,
+            "burnable": bool(values[i] == FOREST),
+            "nearest": nearest,
+        })
+    return results
@@ -0,0 +1,358 @@
+"""
+risk_map.py
+---------------------------------------------
+County-wide ignition-risk map precomputation.
+
+A background job samples ignition points on a regular lattice over the
+FOREST pixels of a county raster, runs the SCA from each one (several
+seeded runs per point) in a process pool without writing frames, and
+fills every forest pixel with the expected burned area of its nearest
+sample. The result is written as a float32 GeoTIFF.
+
+Progress is checkpointed into the job directory, so a job interrupted
+by a restart picks up where it left off when started again with the
+same parameters:
+
+    wildfire_output/risk_<county_key>_<params hash>/
+        job.json         parameters, status and progress
+        checkpoint.npz   sample pixels and per-sample results so far
+        risk.tif         the finished risk map
+
+Long jobs can also be run outside the server (from py/):
+    python -m wildfire_sim.risk_map <county_key> [--stride N] [--runs N]
+"""
+
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import numpy as np
+import rasterio
+from scipy.ndimage import distance_transform_edt
+
+try:
+    from config import (
+        WILDFIRE_OUTPUT_BASE, RISK_SAMPLE_STRIDE, RISK_RUNS_PER_POINT,
+        RISK_MAX_WORKERS, RISK_CHUNK_SIZE, RISK_CHECKPOINT_SECONDS
+    )
+except ImportError:
+    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+    WILDFIRE_OUTPUT_BASE = os.path.join(os.path.abspath(os.path.join(BASE_DIR, os.pardir)), "wildfire_output")
+    RISK_SAMPLE_STRIDE = 10
+    RISK_RUNS_PER_POINT = 3
+    RISK_MAX_WORKERS = None
+    RISK_CHUNK_SIZE = 64
+    RISK_CHECKPOINT_SECONDS = 30
+
+from wildfire_sim import sca, run_catalog
+from wildfire_sim.sca import FOREST
+from utils.locks import dir_lock
+
+logger = logging.getLogger(__name__)
+
+JOB_FILENAME = "job.json"
+CHECKPOINT_FILENAME = "checkpoint.npz"
+RISK_FILENAME = "risk.tif"
+RISK_NODATA = -1.0
+
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+STATUS_INTERRUPTED = "interrupted"
+
+_jobs = {}  # job_id -> RiskMapJob (jobs started by this process)
+_jobs_lock = threading.Lock()
+
+
+# --- PROCESS POOL WORKERS ---
+_worker_grid = None
+_worker_config = None
+
+
+def _init_worker(raster_path, params):
+    """Decode the county raster once per worker process and build the job's CA parameters."""
+    global _worker_grid, _worker_config
+    _worker_grid = sca._read_raster(raster_path).grid
+    _worker_config = sca.SimulationConfig(timesteps=params["timesteps"], p_ignition=params["p_ignition"],
+                                          p_spontaneous=params["p_spontaneous"])
+
+
+def _simulate_chunk(indices, rows, cols, runs, seed):
+    """Mean burned cells over `runs` seeded runs for each sample in the chunk."""
+    burned = np.empty(len(indices), dtype=np.float32)
+    for k, (i, y, x) in enumerate(zip(indices, rows, cols)):
+        # Seed from (job seed, sample index): results do not depend on scheduling or resumes
+        rng = np.random.default_rng([seed, int(i)])
+        burned[k] = np.mean([sca._burned_cells(_worker_grid, int(y), int(x), rng, _worker_config) for _ in range(runs)])
+    return indices, burned
+
+
+# --- HELPERS ---
+
+def _atomic_write(path, write):
+    """Write via a temporary file and rename, so a crash never leaves a torn file."""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def _sample_lattice(grid, stride):
+    """FOREST pixels on a regular lattice with spacing `stride`, centred in each cell."""
+    offset = stride // 2
+    rows, cols = np.meshgrid(np.arange(offset, grid.shape[0], stride),
+                             np.arange(offset, grid.shape[1], stride), indexing="ij")
+    rows, cols = rows.ravel(), cols.ravel()
+    on_forest = grid[rows, cols] == FOREST
+    return rows[on_forest].astype(np.int32), cols[on_forest].astype(np.int32)
+
+
+def _job_id(county_key, raster, params):
+    """Deterministic id: same county, raster file and parameters -> same job directory."""
+    fingerprint = json.dumps({"raster": raster.path, "mtime": os.path.getmtime(raster.path), **params},
+                             sort_keys=True)
+    return f"risk_{county_key}_{hashlib.sha1(fingerprint.encode()).hexdigest()[:10]}"
+
+
+def _interpolate(grid, shape, rows, cols, burned):
+    """Assign each FOREST pixel the value of its nearest sample; everything else is nodata."""
+    sampled = np.ones(shape, dtype=bool)
+    sampled[rows, cols] = False
+    nearest = distance_transform_edt(sampled, return_distances=False, return_indices=True)
+
+    sample_values = np.full(shape, RISK_NODATA, dtype=np.float32)
+    sample_values[rows, cols] = burned
+    risk = sample_values[nearest[0], nearest[1]]
+    risk[grid != FOREST] = RISK_NODATA
+    return risk
+
+
+# --- JOB ---
+
+class RiskMapJob:
+    """One risk-map computation; run() blocks, start() runs it on a background thread."""
+
+    def __init__(self, county_key, stride=None, runs_per_point=None, seed=0, max_workers=None, config=None):
+        self.county_key = county_key
+        self.raster = sca._load_county_raster(county_key)
+        config = config or sca.SimulationConfig()
+        self.params = {
+            "stride": int(stride or RISK_SAMPLE_STRIDE),
+            "runs_per_point": int(runs_per_point or RISK_RUNS_PER_POINT),
+            "seed": int(seed),
+            "timesteps": config.timesteps,
+            "p_ignition": config.p_ignition,
+            "p_spontaneous": config.p_spontaneous,
+        }
+        # Clients may ask for fewer worker processes, never more than the server allows
+        limit = RISK_MAX_WORKERS or os.cpu_count() or 1
+        self.max_workers = min(max_workers or limit, limit)
+        self.job_id = _job_id(county_key, self.raster, self.params)
+        self.job_dir = os.path.join(WILDFIRE_OUTPUT_BASE, self.job_id)
+        self.status = STATUS_RUNNING
+        self.error = None
+        self.done = 0
+        self.total = 0
+        self._thread = None
+
+    # --- persistence ---
+    def _load_checkpoint(self):
+        path = os.path.join(self.job_dir, CHECKPOINT_FILENAME)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return data["rows"], data["cols"], data["burned"]
+
+    def _save_checkpoint(self, rows, cols, burned):
+        _atomic_write(os.path.join(self.job_dir, CHECKPOINT_FILENAME),
+                      lambda f: np.savez(f, rows=rows, cols=cols, burned=burned))
+        self._write_job_file()
+
+    def _write_job_file(self):
+        info = self.info()
+        info["updated"] = datetime.now().isoformat(timespec="seconds")
+        _atomic_write(os.path.join(self.job_dir, JOB_FILENAME),
+                      lambda f: f.write(json.dumps(info, indent=2).encode()))
+        # Counted against the output quota; recorded at every checkpoint so a
+        # running job never looks idle
+        run_catalog.record_run(self.job_dir, {"county_key": self.county_key, **self.params})
+
+    def info(self):
+        return {
+            "job_id": self.job_id,
+            "county_key": self.county_key,
+            "status": self.status,
+            "error": self.error,
+            "params": self.params,
+            "samples_done": self.done,
+            "samples_total": self.total,
+            "progress": round(self.done / self.total, 4) if self.total else 0.0,
+            "job_dir": self.job_dir,
+            "risk_file": os.path.join(self.job_dir, RISK_FILENAME) if self.status == STATUS_COMPLETED else None,
+        }
+
+    # --- execution ---
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name=f"risk-{self.job_id}", daemon=True)
+        self._thread.start()
+        return self
+
+    def run(self):
+        os.makedirs(self.job_dir, exist_ok=True)
+        # The same request may reach several processes: one runs the job at a
+        # time, a duplicate waits here and then finds the result (or resumes)
+        with dir_lock(self.job_dir):
+            stored = _stored_job(self.job_id)
+            if stored and stored["status"] == STATUS_COMPLETED:
+                self.done, self.total = stored["samples_done"], stored["samples_total"]
+                self.status = STATUS_COMPLETED
+                return self.info()
+            try:
+                self._run()
+                self.status = STATUS_COMPLETED
+                logger.info(f"Risk map {self.job_id} complete.")
+            except Exception as e:
+                logger.error(f"Risk map {self.job_id} failed: {e}", exc_info=True)
+                self.status = STATUS_FAILED
+                self.error = str(e)
+            self._write_job_file()
+        return self.info()
+
+    def _run(self):
+        grid = self.raster.grid
+
+        checkpoint = self._load_checkpoint()
+        if checkpoint is not None:
+            rows, cols, burned = checkpoint
+            logger.info(f"Resuming risk map {self.job_id} from checkpoint.")
+        else:
+            rows, cols = _sample_lattice(grid, self.params["stride"])
+            burned = np.full(rows.shape, np.nan, dtype=np.float32)
+
+        pending = np.flatnonzero(np.isnan(burned))
+        self.total = int(rows.shape[0])
+        self.done = self.total - int(pending.shape[0])
+        self._save_checkpoint(rows, cols, burned)
+        logger.info(f"Risk map {self.job_id}: {self.total} samples, {pending.shape[0]} to run.")
+
+        if pending.shape[0]:
+            chunks = [pending[i:i + RISK_CHUNK_SIZE] for i in range(0, pending.shape[0], RISK_CHUNK_SIZE)]
+            # Spawned workers: forking a threaded server process is not safe
+            with ProcessPoolExecutor(max_workers=self.max_workers,
+                                     mp_context=multiprocessing.get_context("spawn"),
+                                     initializer=_init_worker,
+                                     initargs=(self.raster.path, self.params)) as pool:
+                futures = [pool.submit(_simulate_chunk, chunk, rows[chunk], cols[chunk],
+                                       self.params["runs_per_point"], self.params["seed"])
+                           for chunk in chunks]
+                last_checkpoint = time.monotonic()
+                for future in as_completed(futures):
+                    indices, values = future.result()
+                    burned[indices] = values
+                    self.done += len(indices)
+                    if time.monotonic() - last_checkpoint >= RISK_CHECKPOINT_SECONDS:
+                        self._save_checkpoint(rows, cols, burned)
+                        last_checkpoint = time.monotonic()
+            self._save_checkpoint(rows, cols, burned)
+
+        self._write_risk_raster(rows, cols, burned)
+
+    def _write_risk_raster(self, rows, cols, burned):
+        grid = self.raster.grid
+        if rows.shape[0]:
+            risk = _interpolate(grid, grid.shape, rows, cols, burned)
+        else:
+            risk = np.full(grid.shape, RISK_NODATA, dtype=np.float32)
+
+        meta = self.raster.meta.copy()
+        meta.update(driver="GTiff", dtype=rasterio.float32, count=1, nodata=RISK_NODATA, compress="lzw")
+        path = os.path.join(self.job_dir, RISK_FILENAME)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with rasterio.open(tmp, "w", **meta) as dst:
+            dst.write(risk, 1)
+            dst.update_tags(units="expected burned cells", county_key=self.county_key,
+                            **{k: str(v) for k, v in self.params.items()})
+        os.replace(tmp, path)
+        logger.info(f"Wrote risk map {path}")
+
+
+# --- PUBLIC API ---
+
+def start_risk_map_job(county_key, stride=None, runs_per_point=None, seed=0, max_workers=None, config=None):
+    """
+    Start (or resume) a risk-map job in the background.
+
+    Starting a job with the same county, raster and parameters as a running
+    job returns the running job; a finished job is returned as-is; an
+    interrupted one resumes from its checkpoint. `config` (a
+    sca.SimulationConfig) sets timesteps and probabilities of the runs.
+
+    Returns:
+        dict: The job info (see RiskMapJob.info).
+
+    Raises:
+        FileNotFoundError: If the county GeoTIFF cannot be found.
+    """
+    job = RiskMapJob(county_key, stride, runs_per_point, seed, max_workers, config)
+    with _jobs_lock:
+        existing = _jobs.get(job.job_id)
+        if existing is not None and existing.status in (STATUS_RUNNING, STATUS_COMPLETED):
+            return existing.info()
+        # Finished, or running in another process
+        stored = _stored_job(job.job_id)
+        if stored and stored["status"] in (STATUS_RUNNING, STATUS_COMPLETED):
+            return stored
+        _jobs[job.job_id] = job
+    return job.start().info()
+
+
+def get_risk_map_job(job_id):
+    """Job info from memory, or from job.json on disk for jobs of an earlier process."""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    if job is not None:
+        return job.info()
+    return _stored_job(job_id)
+
+
+def _stored_job(job_id):
+    """Job info from job.json; a running job whose directory is not locked was interrupted."""
+    job_dir = os.path.join(WILDFIRE_OUTPUT_BASE, os.path.basename(job_id))
+    path = os.path.join(job_dir, JOB_FILENAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        info = json.load(f)
+    if info.get("status") == STATUS_RUNNING:
+        try:
+            with dir_lock(job_dir, blocking=False):
+                # Written by a process that is gone; starting it again resumes from the checkpoint
+                info["status"] = STATUS_INTERRUPTED
+        except BlockingIOError:
+            pass  # another process is running it
+    elif info.get("status") == STATUS_COMPLETED and not os.path.exists(os.path.join(job_dir, RISK_FILENAME)):
+        info["status"] = STATUS_INTERRUPTED  # risk raster deleted; rebuilt from the checkpoint
+    return info
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s - %(message)s")
+
+    parser = argparse.ArgumentParser(description="Precompute a county ignition-risk GeoTIFF (resumable).")
+    parser.add_argument("county_key")
+    parser.add_argument("--stride", type=int, default=None, help="Sample spacing in pixels.")
+    parser.add_argument("--runs", type=int, default=None, help="Seeded runs per sample point.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    result = RiskMapJob(args.county_key, args.stride, args.runs, args.seed, args.workers).run()
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,404 @@
+"""
+run_catalog.py
+---------------------------------------------
+SQLite catalog of simulation runs, with disk-quota retention.
+
+Every finished run (single, batch ignition, branch or risk map) is recorded
+with its county, parameters, WGS84 bounding box, size on disk and last
+access time, so listings ("runs touching this bbox", "latest runs for a
+county") are index lookups instead of walks over WILDFIRE_OUTPUT_BASE.
+
+A file is counted once per run however many hard links it has, and a
+branch does not count the frames it links from its parent (the parent
+does; they are moved to the branch's size when the parent is deleted).
+
+When the catalogued runs exceed WILDFIRE_OUTPUT_QUOTA_BYTES, the least
+recently accessed ones are deleted, skipping runs used within the last
+RUN_CATALOG_MIN_IDLE_SECONDS (in progress or being viewed), and their
+tiles are purged from the tile cache.
+
+Runs are keyed by their path relative to WILDFIRE_OUTPUT_BASE, e.g.
+"sim_run_Door_WI_20251121_120635", "sim_batch_Door_WI_.../ignition_003"
+or "risk_Door_WI_0123456789".
+The catalog is rebuilt from the run directories on first use in each
+process (and from the command line, from py/):
+    python -m wildfire_sim.run_catalog sync|evict
+"""
+
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+try:
+    from config import (
+        WILDFIRE_OUTPUT_BASE, RUN_CATALOG_PATH, WILDFIRE_OUTPUT_QUOTA_BYTES,
+        RUN_CATALOG_MIN_IDLE_SECONDS, RUN_CATALOG_TOUCH_SECONDS, TILE_CACHE_DIR, TILE_CACHE_MAX_BYTES
+    )
+except ImportError:
+    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+    PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, os.pardir, os.pardir))
+    WILDFIRE_OUTPUT_BASE = os.path.join(PROJECT_ROOT, "wildfire_output")
+    RUN_CATALOG_PATH = os.path.join(PROJECT_ROOT, "data", "run_catalog.sqlite3")
+    WILDFIRE_OUTPUT_QUOTA_BYTES = 20 * 1024 ** 3
+    RUN_CATALOG_MIN_IDLE_SECONDS = 300
+    RUN_CATALOG_TOUCH_SECONDS = 60
+    TILE_CACHE_DIR = os.path.join(PROJECT_ROOT, "data", "cache", "tiles")
+    TILE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+from wildfire_sim import checkpoints
+from utils.tile_cache import DiskLRUCache
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_key      TEXT PRIMARY KEY,
+    county_key   TEXT,
+    kind         TEXT,
+    params       TEXT,
+    west         REAL,
+    south        REAL,
+    east         REAL,
+    north        REAL,
+    size_bytes   INTEGER NOT NULL DEFAULT 0,
+    created      REAL NOT NULL,
+    last_access  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_county_created ON runs (county_key, created);
+CREATE INDEX IF NOT EXISTS runs_created ON runs (created);
+CREATE INDEX IF NOT EXISTS runs_last_access ON runs (last_access);
+CREATE INDEX IF NOT EXISTS runs_bbox ON runs (west, east, south, north);
+"""
+
+# run.json fields kept in the params column
+_PARAM_FIELDS = ("seed", "lat", "lon", "ignition", "p_ignition", "p_spontaneous", "timesteps",
+                 "burned_cells", "burned_out", "parent", "branched_at", "branch_seed", "cells_cleared")
+
+# Top-level directories of WILDFIRE_OUTPUT_BASE that hold runs (sim_batch_*
+# directories hold one run per ignition)
+_RUN_PREFIXES = ("sim_", "risk_", "wildfire_run_")
+# Risk map job file (wildfire_sim/risk_map.py), read when syncing risk runs
+_RISK_JOB_FILENAME = "job.json"
+
+_local = threading.local()
+_sync_lock = threading.Lock()
+_synced = False
+_touched = {}  # run_key -> last time this process wrote its last_access
+_tile_cache = DiskLRUCache(TILE_CACHE_DIR, TILE_CACHE_MAX_BYTES)
+
+
+def _connect():
+    """This thread's connection (WAL mode, so workers and threads share the file safely)."""
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "path", None) != RUN_CATALOG_PATH:
+        os.makedirs(os.path.dirname(RUN_CATALOG_PATH), exist_ok=True)
+        conn = sqlite3.connect(RUN_CATALOG_PATH, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        _local.conn, _local.path = conn, RUN_CATALOG_PATH
+    return conn
+
+
+def _ensure_synced():
+    global _synced
+    if _synced:
+        return
+    with _sync_lock:
+        if not _synced:
+            sync()
+            _synced = True
+
+
+def run_key(run_dir):
+    """Catalog key of a run directory, or None if it is outside WILDFIRE_OUTPUT_BASE."""
+    root = os.path.abspath(WILDFIRE_OUTPUT_BASE)
+    path = os.path.abspath(run_dir)
+    if not path.startswith(root + os.sep):
+        return None
+    return os.path.relpath(path, root).replace(os.sep, "/")
+
+
+def _run_path(key):
+    return os.path.join(WILDFIRE_OUTPUT_BASE, *key.split("/"))
+
+
+def _files(path):
+    """(st_dev, st_ino) -> size of the files under path (hard links of one file appear once)."""
+    files = {}
+    for root, _, names in os.walk(path):
+        for name in names:
+            try:
+                st = os.stat(os.path.join(root, name))
+            except FileNotFoundError:
+                continue
+            files[(st.st_dev, st.st_ino)] = st.st_size
+    return files
+
+
+def _dir_size(path, parent=None):
+    """Bytes of the files under path, leaving out files hard-linked from the parent run's directory."""
+    files = _files(path)
+    if parent and files:
+        for inode in _files(_run_path(parent)):
+            files.pop(inode, None)
+    return sum(files.values())
+
+
+def _kind(key):
+    name = key.rsplit("/", 1)[-1]
+    if name.startswith("ignition_"):
+        return "batch"
+    if name.startswith("risk_"):
+        return "risk"
+    return "branch" if name.startswith("sim_branch") else "run"
+
+
+def _created(run, run_dir):
+    try:
+        return datetime.fromisoformat(run["created"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return os.path.getmtime(run_dir)
+
+
+def _record(conn, run_dir, run, manifest, now):
+    key = run_key(run_dir)
+    if key is None:
+        return None
+    bounds = (manifest or {}).get("bounds_wgs84") or {}
+    params = {k: run[k] for k in _PARAM_FIELDS if k in run}
+    conn.execute(
+        """
+        INSERT INTO runs (run_key, county_key, kind, params, west, south, east, north,
+                          size_bytes, created, last_access)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (run_key) DO UPDATE SET
+            county_key = excluded.county_key, kind = excluded.kind, params = excluded.params,
+            west = excluded.west, south = excluded.south, east = excluded.east, north = excluded.north,
+            size_bytes = excluded.size_bytes, last_access = MAX(runs.last_access, excluded.last_access)
+        """,
+        (key, run.get("county_key"), _kind(key), json.dumps(params),
+         bounds.get("west"), bounds.get("south"), bounds.get("east"), bounds.get("north"),
+         _dir_size(run_dir, run.get("parent")), _created(run, run_dir), now),
+    )
+    return key
+
+
+def record_run(run_dir, run, manifest=None):
+    """
+    Add or update a run (called whenever a run is written or extended), then
+    enforce the disk quota.
+    """
+    _ensure_synced()
+    key = _record(_connect(), run_dir, run, manifest, time.time())
+    if key is not None:
+        _touched[key] = time.time()
+        enforce_quota()
+
+
+def touch(run_dir):
+    """Mark a run as accessed (writes at most once per RUN_CATALOG_TOUCH_SECONDS per run)."""
+    key = run_key(run_dir)
+    if key is None:
+        return
+    now = time.time()
+    if now - _touched.get(key, 0) < RUN_CATALOG_TOUCH_SECONDS:
+        return
+    _touched[key] = now
+    try:
+        _connect().execute("UPDATE runs SET last_access = ? WHERE run_key = ?", (now, key))
+    except sqlite3.Error as e:
+        logger.warning(f"Failed to update last access for {key}: {e}")
+
+
+def _row_to_dict(row):
+    info = dict(row)
+    info["params"] = json.loads(info["params"] or "{}")
+    bounds = [info.pop(k) for k in ("west", "south", "east", "north")]
+    info["bbox"] = None if bounds[0] is None else dict(zip(("west", "south", "east", "north"), bounds))
+    info["created"] = datetime.fromtimestamp(info["created"]).isoformat(timespec="seconds")
+    info["last_access"] = datetime.fromtimestamp(info["last_access"]).isoformat(timespec="seconds")
+    return info
+
+
+def find_runs(county_key=None, bbox=None, limit=50):
+    """
+    Catalogued runs, newest first.
+
+    Args:
+        county_key (str, optional): Only runs of this county.
+        bbox (tuple, optional): (west, south, east, north) in WGS84; only runs
+            whose extent intersects it.
+        limit (int): Max rows.
+
+    Returns:
+        list[dict]: {run_key, county_key, kind, params, bbox, size_bytes, created, last_access}
+    """
+    _ensure_synced()
+    where, args = [], []
+    if county_key:
+        where.append("county_key = ?")
+        args.append(county_key)
+    if bbox:
+        west, south, east, north = bbox
+        where.append("west <= ? AND east >= ? AND south <= ? AND north >= ?")
+        args += [east, west, north, south]
+    sql = "SELECT * FROM runs"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY created DESC LIMIT ?"
+    args.append(int(limit))
+    return [_row_to_dict(r) for r in _connect().execute(sql, args)]
+
+
+def latest_runs(county_key, limit=10):
+    """Most recent runs of a county."""
+    return find_runs(county_key=county_key, limit=limit)
+
+
+def total_size():
+    return _connect().execute("SELECT COALESCE(SUM(size_bytes), 0) FROM runs").fetchone()[0]
+
+
+def _forget(conn, key):
+    """Drop a run's row and its cached tiles (keyed "runs/<run_key>/..." by the tile route)."""
+    conn.execute("DELETE FROM runs WHERE run_key = ?", (key,))
+    _touched.pop(key, None)
+    try:
+        _tile_cache.purge(f"runs/{key}")
+    except (OSError, ValueError) as e:
+        logger.warning(f"Failed to purge cached tiles of {key}: {e}")
+
+
+def _delete_run(conn, key):
+    path = _run_path(key)
+    shutil.rmtree(path, ignore_errors=True)
+    _forget(conn, key)
+    # Frames its branches linked are now theirs alone
+    for row in conn.execute("SELECT run_key, params FROM runs WHERE kind = 'branch'").fetchall():
+        if json.loads(row["params"] or "{}").get("parent") == key:
+            conn.execute("UPDATE runs SET size_bytes = ? WHERE run_key = ?",
+                         (_dir_size(_run_path(row["run_key"])), row["run_key"]))
+    # A batch directory goes once none of its ignition runs is left
+    parent = os.path.dirname(path)
+    if os.path.abspath(parent) != os.path.abspath(WILDFIRE_OUTPUT_BASE) and os.path.isdir(parent):
+        if not any(os.path.isdir(os.path.join(parent, n)) for n in os.listdir(parent)):
+            shutil.rmtree(parent, ignore_errors=True)
+
+
+def enforce_quota(quota_bytes=None):
+    """
+    Delete least recently accessed runs until the catalogued total fits the
+    quota. Returns the evicted run keys.
+    """
+    quota = WILDFIRE_OUTPUT_QUOTA_BYTES if quota_bytes is None else quota_bytes
+    if not quota:
+        return []
+    conn = _connect()
+    total = total_size()
+    if total <= quota:
+        return []
+
+    cutoff = time.time() - RUN_CATALOG_MIN_IDLE_SECONDS
+    candidates = conn.execute(
+        "SELECT run_key, size_bytes FROM runs WHERE last_access < ? ORDER BY last_access",
+        (cutoff,)).fetchall()
+    evicted = []
+    for row in candidates:
+        if total <= quota:
+            break
+        _delete_run(conn, row["run_key"])
+        total = total_size()
+        evicted.append(row["run_key"])
+
+    if evicted:
+        logger.info(f"Run catalog: evicted {len(evicted)} run(s) over the {quota} byte quota; {total} bytes remain.")
+    if total > quota:
+        logger.warning(f"Run catalog: {total} bytes still over the {quota} byte quota (remaining runs are in use).")
+    return evicted
+
+
+def _run_dirs():
+    """Run directories under WILDFIRE_OUTPUT_BASE (including batch ignition runs)."""
+    if not os.path.isdir(WILDFIRE_OUTPUT_BASE):
+        return
+    for name in os.listdir(WILDFIRE_OUTPUT_BASE):
+        path = os.path.join(WILDFIRE_OUTPUT_BASE, name)
+        if not (name.startswith(_RUN_PREFIXES) and os.path.isdir(path)):
+            continue
+        if name.startswith("sim_batch"):
+            for sub in os.listdir(path):
+                if os.path.isdir(os.path.join(path, sub)):
+                    yield os.path.join(path, sub)
+        else:
+            yield path
+
+
+def _read_risk_job(run_dir):
+    """County and parameters of a risk map job, as run.json fields."""
+    try:
+        with open(os.path.join(run_dir, _RISK_JOB_FILENAME)) as f:
+            job = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    return {"county_key": job.get("county_key"), **(job.get("params") or {})}
+
+
+def sync():
+    """
+    Reconcile the catalog with the run directories: add runs it does not know
+    (e.g. made before the catalog existed) and drop rows whose directory is gone.
+    Returns (added, removed).
+    """
+    conn = _connect()
+    known = {r["run_key"] for r in conn.execute("SELECT run_key FROM runs")}
+    found = set()
+    added = 0
+    for run_dir in _run_dirs():
+        key = run_key(run_dir)
+        found.add(key)
+        if key in known:
+            continue
+        try:
+            run = checkpoints.read_run(run_dir)
+        except (FileNotFoundError, ValueError):
+            # Risk maps keep a job file instead; a run from before run.json
+            # existed still counts against the quota
+            run = _read_risk_job(run_dir) if _kind(key) == "risk" else {}
+        try:
+            from wildfire_sim import frame_bundle  # rasterio; only needed here
+            manifest = frame_bundle.read_manifest(run_dir)
+        except (FileNotFoundError, ValueError):
+            manifest = None
+        _record(conn, run_dir, run, manifest, os.path.getmtime(run_dir))
+        added += 1
+
+    removed = known - found
+    for key in removed:
+        _forget(conn, key)
+    if added or removed:
+        logger.info(f"Run catalog synced: {added} run(s) added, {len(removed)} removed.")
+    return added, len(removed)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s - %(message)s")
+
+    parser = argparse.ArgumentParser(description="Maintain the wildfire_output run catalog.")
+    parser.add_argument("command", choices=("sync", "evict"))
+    parser.add_argument("--quota", type=int, default=None, help="Quota in bytes (default: config).")
+    args = parser.parse_args()
+
+    added, removed = sync()
+    print(f"Synced: {added} added, {removed} removed; {total_size()} bytes catalogued.")
+    if args.command == "evict":
+        evicted = enforce_quota(args.quota)
+        print(f"Evicted {len(evicted)} run(s).")
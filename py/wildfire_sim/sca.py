@@ -1,17 +1,27 @@
 import os
 import re  # For regex file searching
+import json
+import shutil
 import rasterio
 import numpy as np
 import traceback
 import logging
-from scipy.signal import convolve2d
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from rasterio.windows import Window
 from rasterio.windows import transform as window_transform
+from rasterio.transform import rowcol
+from rasterio.features import rasterize
 
 # --- Import config from parent directory ---
 try:
-    from config import GEOTIFF_DIR, WILDFIRE_OUTPUT_BASE
+    from config import (
+        GEOTIFF_DIR, WILDFIRE_OUTPUT_BASE, RASTER_CACHE_SIZE, BATCH_MAX_WORKERS, CHECKPOINT_INTERVAL,
+        MAX_SIM_TIMESTEPS, SWEEP_MAX_CELLS
+    )
 except ImportError:
     # Fallback for running script directly
     print("Warning: Could not import config. Using relative paths.")
@@ -21,38 +31,113 @@ except ImportError:
     WILDFIRE_OUTPUT_BASE = os.path.join(PROJECT_ROOT, "wildfire_output")
     os.makedirs(GEOTIFF_DIR, exist_ok=True)
     os.makedirs(WILDFIRE_OUTPUT_BASE, exist_ok=True)
+    RASTER_CACHE_SIZE = 4
+    BATCH_MAX_WORKERS = 4
+    CHECKPOINT_INTERVAL = 5
+    MAX_SIM_TIMESTEPS = 200
+    SWEEP_MAX_CELLS = 32 * 1024 * 1024
+
+from wildfire_sim import kernels, checkpoints, frame_bundle, run_catalog, forest_tiles, ingest
+from utils import metrics
+from utils.profiling import RunProfiler
+from utils.logger import StepLog
+from utils.locks import dir_lock
 
 logger = logging.getLogger(__name__)
 
 # --- 1. DEFINE CELL STATES ---
-NO_FOREST = 0  # Non-burnable land
-FOREST = 1     # Burnable forest
-BURNING = 2    # Actively on fire
-BURNT = 3      # Burnt out
+# Defined alongside the CA kernels so the compiled backend shares them
+from wildfire_sim.kernels import NO_FOREST, FOREST, BURNING, BURNT
 
 # --- 2. CONFIGURATION PARAMETERS ---
+# Defaults for runs that do not pass a SimulationConfig
 TIMESTEPS = 20
 ENABLE_CROP = True
-CROP_BUFFER = 100 # Pixels to include around the ignition point
+CROP_MARGIN = 10 # Pixels kept around the cells that burned (output extent)
 P_IGNITION = 0.40
 P_SPONTANEOUS = 0
 
+class SimulationConfig:
+    """
+    CA parameters of one run. Passed down the call chain instead of reading
+    the module defaults, so concurrent requests can use different settings.
+    Unset fields take the module defaults at construction time.
+    """
+
+    FIELDS = ("timesteps", "p_ignition", "p_spontaneous", "enable_crop", "crop_margin")
+    # Request parameter (query string / JSON) names
+    PARAMS = {"timesteps": "timesteps", "pIgnition": "p_ignition", "pSpontaneous": "p_spontaneous",
+              "crop": "enable_crop", "cropMargin": "crop_margin"}
+
+    def __init__(self, timesteps=None, p_ignition=None, p_spontaneous=None, enable_crop=None, crop_margin=None):
+        self.timesteps = int(TIMESTEPS if timesteps is None else timesteps)
+        self.p_ignition = float(P_IGNITION if p_ignition is None else p_ignition)
+        self.p_spontaneous = float(P_SPONTANEOUS if p_spontaneous is None else p_spontaneous)
+        self.enable_crop = bool(ENABLE_CROP if enable_crop is None else enable_crop)
+        self.crop_margin = int(CROP_MARGIN if crop_margin is None else crop_margin)
+        if not 0 < self.timesteps <= MAX_SIM_TIMESTEPS:
+            raise ValueError(f"timesteps must be between 1 and {MAX_SIM_TIMESTEPS}.")
+        if not (0 <= self.p_ignition <= 1 and 0 <= self.p_spontaneous <= 1):
+            raise ValueError("pIgnition and pSpontaneous must be probabilities between 0 and 1.")
+        if self.crop_margin < 0:
+            raise ValueError("cropMargin must be a non-negative number of pixels.")
+
+    @classmethod
+    def from_params(cls, params):
+        """
+        Build from request parameters (timesteps, pIgnition, pSpontaneous,
+        crop, cropMargin); missing ones keep the defaults.
+
+        Raises:
+            ValueError: If a value is malformed or out of range.
+        """
+        values = {}
+        for name, field in cls.PARAMS.items():
+            value = params.get(name)
+            if value is None or value == "":
+                continue
+            if field == "enable_crop":
+                if isinstance(value, str):
+                    value = value.strip().lower() in ("1", "true", "yes", "on")
+            else:
+                try:
+                    value = int(value) if field in ("timesteps", "crop_margin") else float(value)
+                except (TypeError, ValueError):
+                    raise ValueError(f"{name} must be a number.")
+            values[field] = value
+        return cls(**values)
+
+    def replace(self, **changes):
+        return SimulationConfig(**{**self.to_dict(), **changes})
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def __repr__(self):
+        return f"SimulationConfig({', '.join(f'{k}={v!r}' for k, v in self.to_dict().items())})"
+
 # --- 3. HELPER FUNCTIONS ---
 
-def _coords_to_pixels(lat, lon, src):
-    """Converts geographic (lat, lon) coordinates to (y, x) pixel coordinates."""
-    logger.info(f"  Converting (lat={lat}, lon={lon}) to pixel coordinates...")
-    row, col = src.index(lon, lat)
-    logger.info(f"  ...Converted to (row={row}, col={col})")
-    return (int(row), int(col))
+def _coords_to_pixels(lats, lons, transform):
+    """
+    Converts geographic (lat, lon) coordinates to (y, x) pixel coordinates.
+    Vectorised: takes sequences of lats/lons and returns (rows, cols) int arrays.
+    """
+    rows, cols = rowcol(transform, np.asarray(lons, dtype=np.float64), np.asarray(lats, dtype=np.float64))
+    return np.atleast_1d(np.asarray(rows, dtype=np.int64)), np.atleast_1d(np.asarray(cols, dtype=np.int64))
 
-def _save_raster(data, meta, timestep, output_dir, crop_window=None):
-    """Saves a numpy array as a GeoTIFF."""
+def _save_raster(data, meta, timestep, output_dir, crop_window=None, cropped=False):
+    """
+    Saves a numpy array as a GeoTIFF, cut to crop_window if given (with
+    cropped=True, data already holds just that window). The file is written
+    under a temporary name and renamed, so a frame being rewritten is never
+    seen half-written and hard-linked copies of it are left alone.
+    """
     
     if crop_window:
         new_transform = window_transform(crop_window, meta['transform'])
-        data_to_save = data[crop_window.row_off:crop_window.row_off + crop_window.height,
-                            crop_window.col_off:crop_window.col_off + crop_window.width]
+        data_to_save = data if cropped else data[crop_window.row_off:crop_window.row_off + crop_window.height,
+                                                 crop_window.col_off:crop_window.col_off + crop_window.width]
         meta.update(
             transform=new_transform,
             height=crop_window.height,
@@ -63,42 +148,404 @@ def _save_raster(data, meta, timestep, output_dir, crop_window=None):
 
     data_to_save = data_to_save.astype(np.uint8)
     meta.update(
+        driver='GTiff',
         dtype=rasterio.uint8,
         count=1,
         compress='lzw'
     )
     
-    filename = os.path.join(output_dir, f"wildfire_t_{timestep:03d}.tif")
+    filename = os.path.join(output_dir, frame_bundle.frame_filename(timestep))
     
-    logger.info(f"  Saving {filename} (Size: {data_to_save.shape})...")
-    with rasterio.open(filename, 'w', **meta) as dst:
+    logger.debug("  Saving %s (Size: %s)...", filename, data_to_save.shape)
+    tmp = f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with rasterio.open(tmp, 'w', **meta) as dst:
         dst.write(data_to_save, 1)
+    os.replace(tmp, filename)
 
-def _run_ca_step(grid, p_ignite, p_spontaneous):
-    """Performs one step of the stochastic cellular automaton."""
-    
-    next_grid = grid.copy()
-    next_grid[grid == BURNING] = BURNT
-
-    kernel = np.array([[1, 1, 1], [1, 0, 1], [1, 1, 1]], dtype=np.uint8)
-    is_burning = (grid == BURNING).astype(np.uint8)
-    burning_neighbors = convolve2d(is_burning, kernel, mode='same', boundary='fill', fillvalue=0)
-    is_forest = (grid == FOREST)
-    has_burning_neighbor = (burning_neighbors > 0)
-    
-    random_neighbor = np.random.rand(*grid.shape)
-    random_spontaneous = np.random.rand(*grid.shape)
-    
-    ignites_from_neighbor = (is_forest & has_burning_neighbor & (random_neighbor < p_ignite))
-    ignites_spontaneously = (is_forest & ~has_burning_neighbor & (random_spontaneous < p_spontaneous))
+def _find_input_raster(county_key):
+    """Locate ForestCover_<county_key>_2024.tif (or the county's GEE export) in GEOTIFF_DIR."""
+    file_pattern = re.compile(rf"ForestCover_{re.escape(county_key)}_2024\.tif", re.IGNORECASE)
+    input_file = None
     
-    next_grid[ignites_from_neighbor] = BURNING
-    next_grid[ignites_spontaneously] = BURNING
+    logger.info(f"Searching for file in: {GEOTIFF_DIR}")
+    if not os.path.exists(GEOTIFF_DIR):
+        raise FileNotFoundError(f"GeoTIFF directory not found at: {GEOTIFF_DIR}")
+        
+    filenames = os.listdir(GEOTIFF_DIR)
+    for filename in filenames:
+        if file_pattern.match(filename):
+            input_file = os.path.join(GEOTIFF_DIR, filename)
+            logger.info(f"Found input file: {input_file}")
+            break
+
+    export_name = f"{forest_tiles.export_key(county_key)}.tif"
+    if not input_file and export_name in filenames:
+        input_file = os.path.join(GEOTIFF_DIR, export_name)
+        logger.info(f"Found exported input file: {input_file}")
+            
+    if not input_file:
+        raise FileNotFoundError(f"No GeoTIFF file found for countyKey '{county_key}' in {GEOTIFF_DIR}. Searched for pattern: {file_pattern.pattern}")
+
+    return input_file
+
+class CountyRaster:
+    """A decoded county forest raster. `grid` is shared and read-only; copy before mutating."""
+
+    def __init__(self, path, grid, meta):
+        self.path = path
+        self.grid = grid
+        self.meta = meta
+        self.transform = meta['transform']
+        self.shape = grid.shape
+
+_raster_cache = OrderedDict()  # path -> (mtime, CountyRaster)
+_raster_cache_lock = threading.Lock()
+
+def _read_raster(input_file):
+    """Decode a forest raster from disk into a (read-only) CountyRaster."""
+    try:
+        with rasterio.open(input_file) as src:
+            if ingest.is_ingested(src):
+                # Already FOREST / NO_FOREST classes (see wildfire_sim/ingest.py)
+                grid = src.read(1)
+            else:
+                logger.warning(f"{input_file} has not been ingested; classifying it on read.")
+                grid = ingest.forest_classes(src.read(1), src.nodata)
+            grid[grid == ingest.CLASS_NODATA] = NO_FOREST
+            meta = src.meta.copy()
+    except Exception as e:
+        logger.error(f"Error reading {input_file}: {e}")
+        # Wrap rasterio errors
+        raise IOError(f"Failed to read or process raster file: {e}")
+
+    grid.setflags(write=False)
+    return CountyRaster(input_file, grid, meta)
+
+def _load_county_raster(county_key, input_file=None):
+    """
+    Find and decode the county raster, reusing a cached decode while the
+    file is unchanged. Keeps at most RASTER_CACHE_SIZE rasters in memory.
+    Pass input_file if it was already looked up with _find_input_raster.
+    """
+    input_file = input_file or _find_input_raster(county_key)
+    mtime = os.path.getmtime(input_file)
+
+    with _raster_cache_lock:
+        cached = _raster_cache.get(input_file)
+        if cached is not None and cached[0] == mtime:
+            _raster_cache.move_to_end(input_file)
+            metrics.RASTER_CACHE_REQUESTS.labels(result="hit").inc()
+            return cached[1]
+    metrics.RASTER_CACHE_REQUESTS.labels(result="miss").inc()
+
+    raster = _read_raster(input_file)
+    with _raster_cache_lock:
+        _raster_cache[input_file] = (mtime, raster)
+        _raster_cache.move_to_end(input_file)
+        while len(_raster_cache) > RASTER_CACHE_SIZE:
+            _raster_cache.popitem(last=False)
+    return raster
+
+def _validate_ignitions(raster, lats, lons):
+    """
+    Map ignition points to pixels in one vectorised transform and check them.
+
+    Returns:
+        (rows, cols, errors): errors[i] is None for a valid point, otherwise
+        the exception (IndexError / ValueError) that point would raise.
+    """
+    logger.debug("  Converting %d ignition point(s) to pixel coordinates...", len(lats))
+    rows, cols = _coords_to_pixels(lats, lons, raster.transform)
+    height, width = raster.shape
+    in_bounds = (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+    values = np.full(rows.shape, -1, dtype=np.int64)
+    values[in_bounds] = raster.grid[rows[in_bounds], cols[in_bounds]]
+
+    errors = []
+    for i in range(rows.shape[0]):
+        if not in_bounds[i]:
+            errors.append(IndexError(f"Calculated pixel ({rows[i]}, {cols[i]}) is outside raster bounds."))
+        elif values[i] != FOREST:
+            errors.append(ValueError(f"Ignition point {lats[i], lons[i]} (pixel {rows[i], cols[i]}) is not a forest pixel. Value is {values[i]}"))
+        else:
+            errors.append(None)
+    return rows, cols, errors
+
+def _make_run_dir(prefix, county_key, parent=None):
+    """Create <parent>/<prefix>_<county_key>_<timestamp> (parent defaults to WILDFIRE_OUTPUT_BASE)."""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    base = os.path.join(parent or WILDFIRE_OUTPUT_BASE, f"{prefix}_{county_key}_{timestamp}")
+    os.makedirs(os.path.dirname(base), exist_ok=True)
+    # Several runs can start within the same second (batches, branches): never share a folder
+    run_dir, n = base, 1
+    while True:
+        try:
+            os.mkdir(run_dir)
+            break
+        except FileExistsError:
+            run_dir = f"{base}_{n}"
+            n += 1
+    logger.info(f"Creating output subfolder: {run_dir}")
+    return run_dir
+
+def _bbox(rows, cols):
+    """Bounding box (y0, y1, x0, x1), end-exclusive, of non-empty cell index arrays."""
+    return int(rows.min()), int(rows.max()) + 1, int(cols.min()), int(cols.max()) + 1
+
+def _bbox_union(a, b):
+    if a is None or b is None:
+        return a or b
+    return min(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), max(a[3], b[3])
+
+def _burning_cells(state, active, anywhere):
+    """
+    (rows, cols) of the BURNING cells of a freshly stepped state. Without
+    spontaneous ignition fire only spreads to neighbours, so only the box
+    `active` (the previous step's burning cells) plus one ring is searched.
+    """
+    if anywhere:
+        return np.nonzero(state == BURNING)
+    if active is None:
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty
+    y0, x0 = max(0, active[0] - 1), max(0, active[2] - 1)
+    rows, cols = np.nonzero(state[y0:active[1] + 1, x0:active[3] + 1] == BURNING)
+    return rows + y0, cols + x0
+
+def _output_window(shape, burned, margin, previous=None):
+    """
+    Frame extent: the bounding box of every burned cell plus `margin`
+    pixels (clipped to the raster), grown to contain `previous`.
+    """
+    height, width = shape
+    y0, y1, x0, x1 = burned
+    box = (max(0, y0 - margin), min(height, y1 + margin), max(0, x0 - margin), min(width, x1 + margin))
+    if previous is not None:
+        box = _bbox_union(box, (previous.row_off, previous.row_off + previous.height,
+                                previous.col_off, previous.col_off + previous.width))
+    return Window(col_off=box[2], row_off=box[0], width=box[3] - box[2], height=box[1] - box[0])
+
+def _frame_from_arrival(fuel, arrival, t):
+    """State at timestep t >= the time of `fuel`: burning where arrival == t, burnt where arrival < t."""
+    frame = fuel.copy()
+    frame[arrival < t] = BURNT
+    frame[arrival == t] = BURNING
+    return frame
+
+def _rewindow_frames(output_dir, timesteps, old_window, window, pad_state, meta):
+    """
+    Rewrite frames written over old_window over the larger `window`. Nothing
+    had burned outside old_window in those frames, so the new border comes
+    from pad_state (the full state before any later edits).
+    """
+    frame = pad_state[_window_slices(window, pad_state.shape)].copy()
+    inner = (slice(old_window.row_off - window.row_off, old_window.row_off - window.row_off + old_window.height),
+             slice(old_window.col_off - window.col_off, old_window.col_off - window.col_off + old_window.width))
+    for t in timesteps:
+        path = os.path.join(output_dir, frame_bundle.frame_filename(t))
+        if not os.path.exists(path):
+            continue
+        with rasterio.open(path) as src:
+            frame[inner] = src.read(1)
+        _save_raster(frame, meta.copy(), t, output_dir, crop_window=window, cropped=True)
+
+def _run_ca_step(grid, p_ignite, p_spontaneous, rng=None):
+    """
+    Performs one step of the stochastic cellular automaton.
+    Dispatches to the active kernel backend (see kernels.py).
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    return kernels.ca_step(grid, p_ignite, p_spontaneous, rng)
+
+# --- 4. SIMULATION CORE ---
+def _window_to_dict(window):
+    if window is None:
+        return None
+    return {"col_off": int(window.col_off), "row_off": int(window.row_off),
+            "width": int(window.width), "height": int(window.height)}
+
+def _window_from_dict(d):
+    return Window(**d) if d else None
+
+def _window_slices(window, shape):
+    """Array slices selecting `window` (the whole array if None)."""
+    if window is None:
+        return (slice(0, shape[0]), slice(0, shape[1]))
+    return (slice(window.row_off, window.row_off + window.height),
+            slice(window.col_off, window.col_off + window.width))
+
+def _simulate(raster, start_y, start_x, output_dir, rng, profiler, run=None, config=None):
+    """
+    Run the CA from a single ignition on a copy of raster.grid, writing one
+    GeoTIFF per timestep into output_dir, plus run.json and state checkpoints
+    so the run can later be extended or branched.
+
+    Args:
+        run (dict, optional): Extra metadata for run.json (county_key, seed, ...).
+        config (SimulationConfig, optional): Run parameters (default: module defaults).
+
+    Returns:
+        dict: {"timesteps": last timestep written, "burned_cells": int, "burned_out": bool}
+    """
+    config = config or SimulationConfig()
+    current_state = raster.grid.copy()
+    logger.info("Starting fire at coordinate: (y=%d, x=%d)", start_y, start_x)
+
+    run = dict(run or {})
+    run.update(
+        input_file=raster.path,
+        input_mtime=os.path.getmtime(raster.path),
+        ignition={"row": int(start_y), "col": int(start_x)},
+        p_ignition=config.p_ignition,
+        p_spontaneous=config.p_spontaneous,
+        # The frame extent follows the fire (see _advance); None = full raster
+        crop_margin=config.crop_margin if config.enable_crop else None,
+        crop_window=None,
+        created=datetime.now().isoformat(timespec="seconds"),
+    )
+
+    # --- Start fire; frame 0 is written with the others ---
+    current_state[start_y, start_x] = BURNING
+    metrics.CELLS_BURNED.inc()
+    run["frames"] = [frame_bundle.frame_stats(current_state, 0)]
+    if CHECKPOINT_INTERVAL:
+        with profiler.phase("checkpoint"):
+            checkpoints.save_checkpoint(output_dir, 0, current_state, raster.grid, rng)
+
+    return _advance(raster, current_state, 0, config.timesteps, output_dir, rng, run, profiler, write_from=0)
+
+def _advance(raster, current_state, t0, steps, output_dir, rng, run, profiler, write_from=None, history_state=None):
+    """
+    Step the CA from `current_state` at timestep t0 for up to `steps` timesteps,
+    saving a checkpoint every CHECKPOINT_INTERVAL steps and at the last step,
+    then write frames write_from.. (default t0 + 1..) and run.json.
+
+    With cropping on (run["crop_margin"] set, or a run made with a fixed
+    crop_window), every frame of the run covers the union bounding box of
+    all cells that have burned, plus the margin. The box is grown as cells
+    ignite, only searching next to the fire when there is no spontaneous
+    ignition; frames are rendered from the arrival times once it is final.
+    If the extent grew, frames before write_from are rewritten over it, with
+    history_state (default: current_state) outside the old extent.
+    """
+    meta = raster.meta
+    p_ignition, p_spontaneous = run["p_ignition"], run["p_spontaneous"]
+    old_window = _window_from_dict(run.get("crop_window"))
+    cropped = old_window is not None or run.get("crop_margin") is not None
+    write_from = t0 + 1 if write_from is None else write_from
+    shape = current_state.shape
+    fuel = current_state
+
+    # Arrival time over the whole raster, updated as cells ignite
+    arrival = np.full(shape, frame_bundle.ARRIVAL_NODATA, dtype=np.uint16)
+    stored = frame_bundle.read_arrival(output_dir)
+    if stored is not None:
+        arrival[_window_slices(old_window, shape)] = stored
+    rows, cols = np.nonzero(current_state == BURNING)
+    arrival[rows, cols] = t0
+    active = _bbox(rows, cols) if rows.size else None
+    burned_rows, burned_cols = np.nonzero(current_state >= BURNING)
+    burned = _bbox(burned_rows, burned_cols) if burned_rows.size else None
+    n_burning, n_burnt = int(rows.size), int(burned_rows.size) - int(rows.size)
+
+    # --- Run simulation loop ---
+    t = t0
+    burned_out = active is None
+    frames = run.setdefault("frames", [])
+    step_log = StepLog(logger, f"Run {os.path.basename(output_dir)}")
+    for t in range(t0 + 1, t0 + steps + 1):
+        step_start = time.perf_counter()
+        with profiler.phase("ca_step"):
+            next_state = _run_ca_step(current_state, p_ignition, p_spontaneous, rng)
+            rows, cols = _burning_cells(next_state, active, p_spontaneous > 0)
+            burned_out = rows.size == 0
+            arrival[rows, cols] = t
+            active = None if burned_out else _bbox(rows, cols)
+            burned = _bbox_union(burned, active)
+        metrics.SIMULATION_STEP_SECONDS.observe(time.perf_counter() - step_start)
+
+        # A cell burns for exactly one step, so the counts follow from the last frame's
+        n_burnt, n_burning = n_burnt + n_burning, int(rows.size)
+        frames.append(frame_bundle.frame_entry(t, n_burning, n_burnt))
+        step_log.step(t, n_burning)
+        current_state = next_state
+
+        if burned_out:
+            logger.debug("  Fire has burned out at timestep %d.", t)
+            break
+        if CHECKPOINT_INTERVAL and t % CHECKPOINT_INTERVAL == 0 and t < t0 + steps:
+            with profiler.phase("checkpoint"):
+                checkpoints.save_checkpoint(output_dir, t, current_state, raster.grid, rng)
+
+    # The final state is always kept so the run can be extended
+    with profiler.phase("checkpoint"):
+        checkpoints.save_checkpoint(output_dir, t, current_state, raster.grid, rng)
+
+    # --- Write frames over the final extent ---
+    window = None
+    if cropped and burned is not None:
+        window = _output_window(shape, burned, run.get("crop_margin") or 0, old_window)
+    elif cropped:
+        window = old_window
+    with profiler.phase("write"):
+        if old_window is not None and _window_to_dict(window) != run.get("crop_window"):
+            _rewindow_frames(output_dir, range(write_from), old_window, window,
+                             fuel if history_state is None else history_state, meta)
+        region = _window_slices(window, shape)
+        fuel_out, arrival_out = fuel[region], arrival[region]
+        for frame_t in range(write_from, t + 1):
+            write_start = time.perf_counter()
+            _save_raster(_frame_from_arrival(fuel_out, arrival_out, frame_t), meta.copy(), frame_t, output_dir,
+                         crop_window=window, cropped=True)
+            metrics.SIMULATION_WRITE_SECONDS.observe(time.perf_counter() - write_start)
+
+    burned_cells = n_burning + n_burnt
+    metrics.CELLS_BURNED.inc(burned_cells - int(burned_rows.size))
+    stats = {"timesteps": t, "burned_cells": burned_cells, "burned_out": burned_out}
+    step_log.finish(**stats)
+    run.update(stats, crop_window=_window_to_dict(window), checkpoints=checkpoints.list_checkpoints(output_dir))
+    checkpoints.write_run(output_dir, run)
+    frame_bundle.write_arrival(output_dir, arrival_out, run, meta)
+    manifest = frame_bundle.write_manifest(output_dir, run, meta)
+    try:
+        run_catalog.record_run(output_dir, run, manifest)
+    except Exception as e:
+        # The run itself is complete; a catalog problem must not fail it
+        logger.error(f"Failed to record {output_dir} in the run catalog: {e}", exc_info=True)
+    return stats
+
+def _burned_cells(grid, start_y, start_x, rng, config=None):
+    """
+    Run the CA from one ignition entirely in memory (no frames written) and
+    return the number of cells that burned.
+
+    Without spontaneous ignition fire spreads at most one cell per step, so
+    only the window within timesteps + 1 of the ignition can change; the CA
+    runs on that window alone. Candidate cells keep their row-major order
+    inside the window, so a seeded run matches the full-grid result exactly.
+    """
+    config = config or SimulationConfig()
+    timesteps = config.timesteps
+    if config.p_spontaneous == 0:
+        reach = timesteps + 1
+        y0, x0 = max(0, start_y - reach), max(0, start_x - reach)
+        state = grid[y0:start_y + reach + 1, x0:start_x + reach + 1].copy()
+        start_y, start_x = start_y - y0, start_x - x0
+    else:
+        state = grid.copy()
 
-    return next_grid
+    state[start_y, start_x] = BURNING
+    for _ in range(timesteps):
+        state = _run_ca_step(state, config.p_ignition, config.p_spontaneous, rng)
+        if not np.any(state == BURNING):
+            break
+    return int(np.count_nonzero(state >= BURNING))
 
 # --- 5. MAIN SIMULATION FUNCTION (CALLED BY ROUTES.PY) ---
-def run_geotiff_simulation(county_key, igni_lat, igni_lon):
+@metrics.SIMULATION_QUEUE_DEPTH.track_inprogress()
+@metrics.SIMULATION_SECONDS.labels(engine="sca").time()
+def run_geotiff_simulation(county_key, igni_lat, igni_lon, seed=None, profile=False, cprofile=False, config=None):
     """
     Main function to run the GeoTIFF wildfire simulation.
     
@@ -106,6 +553,13 @@ def run_geotiff_simulation(county_key, igni_lat, igni_lon):
         county_key (str): The county key (e.g., "Arlington_VA").
         igni_lat (float): Ignition point latitude.
         igni_lon (float): Ignition point longitude.
+        seed (int, optional): Seed for the CA random generator (reproducible runs).
+        profile (bool): Record per-phase wall/CPU time and peak memory
+            into <output_dir>/profile.json.
+        cprofile (bool): With profile, also dump cProfile stats to
+            <output_dir>/profile.pstats.
+        config (SimulationConfig, optional): Timesteps, probabilities and
+            cropping of this run (default: the module defaults).
         
     Returns:
         str: The *absolute path* to the simulation output directory.
@@ -115,91 +569,359 @@ def run_geotiff_simulation(county_key, igni_lat, igni_lon):
         IndexError: If the (lat, lon) is outside the raster bounds.
         ValueError: If the ignition point is not a valid forest pixel.
     """
-    logger.info(f"Starting wildfire simulation for {county_key}...")
-    
-    # --- Step 1: Find the input raster ---
-    file_pattern = re.compile(rf"ForestCover_{re.escape(county_key)}_2024\.tif", re.IGNORECASE)
-    INPUT_FILE = None
-    
-    logger.info(f"Searching for file in: {GEOTIFF_DIR}")
-    if not os.path.exists(GEOTIFF_DIR):
-        raise FileNotFoundError(f"GeoTIFF directory not found at: {GEOTIFF_DIR}")
-        
-    for filename in os.listdir(GEOTIFF_DIR):
-        if file_pattern.match(filename):
-            INPUT_FILE = os.path.join(GEOTIFF_DIR, filename)
-            logger.info(f"Found input file: {INPUT_FILE}")
-            break
-            
-    if not INPUT_FILE:
-        raise FileNotFoundError(f"No GeoTIFF file found for countyKey '{county_key}' in {GEOTIFF_DIR}. Searched for pattern: {file_pattern.pattern}")
-
-    # --- Step 2: Read raster & get ignition point ---
+    profiler = RunProfiler(enabled=profile, cprofile=cprofile).start()
     try:
-        with rasterio.open(INPUT_FILE) as src:
-            current_state = src.read(1).astype(np.uint8)
-            meta = src.meta.copy()
-            
-            # This call will raise an IndexError if (lon, lat) is out of bounds
-            start_y, start_x = _coords_to_pixels(igni_lat, igni_lon, src)
-            
-            if (start_y < 0 or start_y >= current_state.shape[0] or
-                start_x < 0 or start_x >= current_state.shape[1]):
-                raise IndexError(f"Calculated pixel ({start_y}, {start_x}) is outside raster bounds.")
-
-            if current_state[start_y, start_x] != FOREST:
-                raise ValueError(f"Ignition point {igni_lat, igni_lon} (pixel {start_y, start_x}) is not a forest pixel. Value is {current_state[start_y, start_x]}")
-            
-    except (IndexError, ValueError):
-        # Re-raise for the route to handle
-        raise
-    except Exception as e:
-        logger.error(f"Error reading {INPUT_FILE} or converting coords: {e}")
-        # Wrap other rasterio errors
-        raise IOError(f"Failed to read or process raster file: {e}")
+        output_dir = _simulate_county(county_key, igni_lat, igni_lon, seed, profiler, config)
+    finally:
+        profiler.stop()
+    profiler.write(output_dir)
+    return output_dir
 
-    # --- Step 3: Prepare output directory ---
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    sim_run_name = f"sim_run_{county_key}_{timestamp}"
-    # WILDFIRE_OUTPUT_BASE comes from config
-    current_sim_output_dir = os.path.join(WILDFIRE_OUTPUT_BASE, sim_run_name)
-    
-    logger.info(f"Creating output subfolder: {current_sim_output_dir}")
-    os.makedirs(current_sim_output_dir, exist_ok=True)
+def _simulate_county(county_key, igni_lat, igni_lon, seed, profiler, config=None):
+    """Body of run_geotiff_simulation; each phase is reported to `profiler`."""
+    logger.info(f"Starting wildfire simulation for {county_key} (kernel backend: {kernels.get_backend()})...")
     
-    logger.info(f"Starting fire at coordinate: (y={start_y}, x={start_x})")
-    
-    # --- Step 4: Calculate cropping window ---
-    crop_window = None
-    if ENABLE_CROP:
-        logger.info(f"Cropping enabled with a {CROP_BUFFER}px buffer.")
-        full_height, full_width = current_state.shape
-        y_min = max(0, start_y - CROP_BUFFER)
-        y_max = min(full_height, start_y + CROP_BUFFER)
-        x_min = max(0, start_x - CROP_BUFFER)
-        x_max = min(full_width, start_x + CROP_BUFFER)
-        crop_window = Window(col_off=x_min, row_off=y_min, width=x_max - x_min, height=y_max - y_min)
-        logger.info(f"  ...Calculated crop window: {crop_window}")
-
-    # --- Step 5: Start fire and save t=0 ---
-    current_state[start_y, start_x] = BURNING
-    _save_raster(current_state, meta.copy(), 0, current_sim_output_dir, crop_window=crop_window)
+    # --- Step 1: Find and decode the input raster ---
+    with profiler.phase("discover"):
+        input_file = _find_input_raster(county_key)
+    with profiler.phase("decode"):
+        raster = _load_county_raster(county_key, input_file)
 
-    # --- Step 6: Run simulation loop ---
-    for t in range(1, TIMESTEPS + 1):
-        logger.info(f"--- Running Timestep {t} ---")
-        
-        next_state = _run_ca_step(current_state, P_IGNITION, P_SPONTANEOUS)
-        
-        if np.sum(next_state == BURNING) == 0:
-            logger.info(f"  Fire has burned out at timestep {t}.")
-            _save_raster(next_state, meta.copy(), t, current_sim_output_dir, crop_window=crop_window)
-            break
-            
-        _save_raster(next_state, meta.copy(), t, current_sim_output_dir, crop_window=crop_window)
-        current_state = next_state
+    # --- Step 2: Get ignition point ---
+    (start_y,), (start_x,), (error,) = _validate_ignitions(raster, [igni_lat], [igni_lon])
+    if error is not None:
+        # Raised for the route to handle
+        raise error
 
+    # --- Step 3: Prepare output directory ---
+    with profiler.phase("setup"):
+        current_sim_output_dir = _make_run_dir("sim_run", county_key)
+
+    # --- Step 4: Run the CA ---
+    _simulate(raster, int(start_y), int(start_x), current_sim_output_dir, np.random.default_rng(seed), profiler,
+              run={"county_key": county_key, "lat": igni_lat, "lon": igni_lon, "seed": seed}, config=config)
     logger.info("--- Simulation complete ---")
     
     # Return the *absolute path* to the route handler
     return current_sim_output_dir
+
+# --- 6. BATCH SIMULATION (MANY IGNITIONS, ONE RASTER) ---
+def _relative_path(path, base):
+    """path relative to base (just the file name if it is not inside base)."""
+    path, base = os.path.abspath(path), os.path.abspath(base)
+    if path.startswith(base + os.path.sep):
+        return os.path.relpath(path, base).replace(os.path.sep, "/")
+    return os.path.basename(path)
+
+def run_batch_simulation(county_key, ignitions, max_workers=None, config=None):
+    """
+    Simulate many ignition points in one county, sharing a single decoded raster.
+
+    All points are validated with one vectorised coordinate-to-pixel transform;
+    valid points are then simulated concurrently in a thread pool (the CA
+    kernels and GeoTIFF writes release the GIL for most of their work).
+
+    Args:
+        county_key (str): The county key (e.g., "Arlington_VA").
+        ignitions (list[dict]): [{"lat": float, "lon": float, "seed": int | None}, ...]
+        max_workers (int, optional): Thread pool size (default and maximum BATCH_MAX_WORKERS).
+        config (SimulationConfig, optional): Parameters shared by every point.
+
+    Returns:
+        dict: The batch manifest (also written to <batch_dir>/manifest.json).
+            batch_dir and each output_dir are relative to WILDFIRE_OUTPUT_BASE,
+            input_file to GEOTIFF_DIR (the manifest is served to clients).
+            Each entry has status "completed" or "invalid"/"failed" with an error.
+
+    Raises:
+        FileNotFoundError: If the county GeoTIFF cannot be found.
+    """
+    logger.info(f"Starting batch simulation for {county_key}: {len(ignitions)} ignition(s)...")
+    raster = _load_county_raster(county_key)
+
+    lats = [float(p["lat"]) for p in ignitions]
+    lons = [float(p["lon"]) for p in ignitions]
+    rows, cols, errors = _validate_ignitions(raster, lats, lons)
+
+    batch_dir = _make_run_dir("sim_batch", county_key)
+    entries = []
+    for i, point in enumerate(ignitions):
+        seed = point.get("seed")
+        # Draw a seed for unseeded points so every entry in the manifest is reproducible
+        seed = int(seed) if seed is not None else int(np.random.SeedSequence().entropy % 2**32)
+        entry = {"index": i, "lat": lats[i], "lon": lons[i], "seed": seed,
+                 "row": int(rows[i]), "col": int(cols[i])}
+        if errors[i] is not None:
+            entry.update(status="invalid", error=str(errors[i]))
+        entries.append(entry)
+
+    pending = [e for e in entries if "status" not in e]
+
+    def _run_point(entry):
+        try:
+            output_dir = os.path.join(batch_dir, f"ignition_{entry['index']:03d}")
+            os.makedirs(output_dir, exist_ok=True)
+            with metrics.SIMULATION_SECONDS.labels(engine="sca").time():
+                stats = _simulate(raster, entry["row"], entry["col"], output_dir,
+                                  np.random.default_rng(entry["seed"]), RunProfiler(),
+                                  run={"county_key": county_key, "lat": entry["lat"],
+                                       "lon": entry["lon"], "seed": entry["seed"]},
+                                  config=config)
+            entry.update(status="completed", output_dir=_relative_path(output_dir, WILDFIRE_OUTPUT_BASE), **stats)
+        except Exception as e:
+            logger.error(f"Batch ignition {entry['index']} failed: {e}", exc_info=True)
+            entry.update(status="failed", error=str(e))
+        finally:
+            metrics.SIMULATION_QUEUE_DEPTH.dec()
+
+    metrics.SIMULATION_QUEUE_DEPTH.inc(len(pending))
+    # BATCH_MAX_WORKERS is both the default and the upper bound
+    workers = max(1, min(max_workers or BATCH_MAX_WORKERS, BATCH_MAX_WORKERS, len(pending)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sca-batch") as pool:
+        list(pool.map(_run_point, pending))
+
+    manifest = {
+        "county_key": county_key,
+        "input_file": _relative_path(raster.path, GEOTIFF_DIR),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "batch_dir": _relative_path(batch_dir, WILDFIRE_OUTPUT_BASE),
+        "ignitions": entries,
+    }
+    with open(os.path.join(batch_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    completed = sum(1 for e in entries if e["status"] == "completed")
+    logger.info(f"--- Batch simulation complete: {completed}/{len(entries)} ignition(s) simulated ---")
+    return manifest
+
+# --- 7. EXTEND / BRANCH FROM CHECKPOINTS ---
+def _run_lock(run_dir):
+    """
+    Exclusive lock on a run directory, across threads and processes (ASGI
+    simulation workers, several app workers), so two extensions of a run
+    cannot interleave.
+    """
+    return dir_lock(run_dir)
+
+def _raster_for_run(run):
+    """Decoded source raster of a run; refuses if the file changed since the run was made."""
+    input_file = run["input_file"]
+    if not os.path.exists(input_file) or os.path.getmtime(input_file) != run["input_mtime"]:
+        raise ValueError(f"Source raster {input_file} changed or was removed since this run; start a new simulation.")
+    return _load_county_raster(run["county_key"]) if run.get("county_key") else _read_raster(input_file)
+
+def _apply_firebreaks(state, transform, geometries):
+    """
+    Clear fuel under the given GeoJSON geometries (polygons or lines, in the
+    raster's coordinates): FOREST cells become NO_FOREST. Cells already
+    burning are left as they are. Returns the number of cells cleared.
+    """
+    if not geometries:
+        return 0
+    mask = rasterize(((g, 1) for g in geometries), out_shape=state.shape, transform=transform,
+                     fill=0, all_touched=True, dtype=np.uint8).astype(bool)
+    cleared = mask & (state == FOREST)
+    state[cleared] = NO_FOREST
+    return int(np.count_nonzero(cleared))
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+@metrics.SIMULATION_QUEUE_DEPTH.track_inprogress()
+@metrics.SIMULATION_SECONDS.labels(engine="sca").time()
+def extend_simulation(run_dir, steps):
+    """
+    Continue an existing run for `steps` more timesteps from its last checkpoint.
+    New frames are appended to the same run directory; earlier steps are not
+    recomputed, and a seeded run extended by N steps matches a run of T+N steps.
+
+    Returns:
+        dict: {"timesteps", "burned_cells", "burned_out", "new_frames"}
+
+    Raises:
+        FileNotFoundError: If run_dir is not a checkpointed run.
+        ValueError: If the source raster changed since the run.
+    """
+    with _run_lock(run_dir):
+        run = checkpoints.read_run(run_dir)
+        run_catalog.touch(run_dir)
+        t0 = run["timesteps"]
+        if run.get("burned_out"):
+            logger.info(f"Run {run_dir} already burned out at t={t0}; nothing to extend.")
+            return {"timesteps": t0, "burned_cells": run["burned_cells"], "burned_out": True, "new_frames": 0}
+
+        raster = _raster_for_run(run)
+        state, rng = checkpoints.load_checkpoint(run_dir, t0, raster.grid)
+        logger.info(f"Extending {run_dir} from t={t0} by {steps} step(s)...")
+        stats = _advance(raster, state, t0, steps, run_dir, rng, run, RunProfiler())
+        return {**stats, "new_frames": stats["timesteps"] - t0}
+
+@metrics.SIMULATION_QUEUE_DEPTH.track_inprogress()
+@metrics.SIMULATION_SECONDS.labels(engine="sca").time()
+def branch_simulation(run_dir, t, firebreaks=None, steps=None, seed=None):
+    """
+    Start a new run from checkpoint `t` of an existing run, after clearing
+    fuel under `firebreaks`. Frames 0..t-1 are linked from the parent, frame
+    t is rewritten with the edit applied, and only steps after t are computed.
+
+    Args:
+        run_dir (str): Absolute path of the parent run.
+        t (int): Timestep of a parent checkpoint.
+        firebreaks (list[dict], optional): GeoJSON geometries to clear.
+        steps (int, optional): Steps to run after t (default: parent's horizon).
+        seed (int, optional): Reseed the branch; by default it continues the
+            parent's random stream.
+
+    Returns:
+        str: The *absolute path* to the branch output directory.
+
+    Raises:
+        FileNotFoundError: If the run or the checkpoint does not exist.
+        ValueError: If the source raster changed since the run.
+    """
+    # The parent is only read under its lock, so an extend cannot rewrite
+    # (or rewindow) its files while they are read and linked
+    with _run_lock(run_dir):
+        parent = checkpoints.read_run(run_dir)
+        run_catalog.touch(run_dir)
+        raster = _raster_for_run(parent)
+        state, rng = checkpoints.load_checkpoint(run_dir, t, raster.grid)
+
+        branch_dir = _make_run_dir("sim_branch", parent.get("county_key", "run"))
+        for i in range(t):
+            _link_or_copy(os.path.join(run_dir, f"wildfire_t_{i:03d}.tif"),
+                          os.path.join(branch_dir, f"wildfire_t_{i:03d}.tif"))
+        arrival = frame_bundle.read_arrival(run_dir)
+    if seed is not None:
+        rng = np.random.default_rng(seed)
+
+    # Frames before t are the parent's; if the branch's extent grows they are
+    # rewritten with the state before the firebreaks around them
+    history = state.copy() if firebreaks else None
+    cleared = _apply_firebreaks(state, raster.transform, firebreaks)
+    logger.info(f"Branching {run_dir} at t={t}: {cleared} cell(s) cleared by firebreaks.")
+
+    run = {k: v for k, v in parent.items() if k not in ("timesteps", "burned_cells", "burned_out", "checkpoints")}
+    run.update(
+        frames=parent.get("frames", [])[:t] + [frame_bundle.frame_stats(state, t)],
+        parent=os.path.basename(os.path.normpath(run_dir)),
+        branched_at=t,
+        firebreaks=firebreaks or [],
+        cells_cleared=cleared,
+        created=datetime.now().isoformat(timespec="seconds"),
+    )
+    if seed is not None:
+        run["branch_seed"] = seed
+
+    if arrival is not None:
+        # Forget ignitions after the branch point; they are recomputed
+        arrival[arrival > t] = frame_bundle.ARRIVAL_NODATA
+        frame_bundle.write_arrival(branch_dir, arrival, run, raster.meta)
+    checkpoints.save_checkpoint(branch_dir, t, state, raster.grid, rng)
+
+    if steps is None:
+        steps = max(parent["timesteps"] - t, 0)
+    # Frame t is rewritten with the firebreaks applied
+    _advance(raster, state, t, steps, branch_dir, rng, run, RunProfiler(), write_from=t, history_state=history)
+    return branch_dir
+
+# --- 8. PARAMETER SWEEPS (MANY PARAMETER SETS, ONE IGNITION) ---
+@metrics.SIMULATION_QUEUE_DEPTH.track_inprogress()
+@metrics.SIMULATION_SECONDS.labels(engine="sca_sweep").time()
+def run_parameter_sweep(county_key, igni_lat, igni_lon, p_ignition=None, p_spontaneous=None, runs=1,
+                        seed=None, config=None):
+    """
+    Burned-area curves for every combination of ignition probabilities from
+    one ignition point, computed in memory (no frames are written).
+
+    Each (p_ignition, p_spontaneous, replicate) member is one layer of a
+    (members, height, width) stack, and all members advance together with
+    one vectorised CA step per timestep (kernels.ca_step_stack). Without
+    spontaneous ignition the stack only covers the window the fire can reach
+    in config.timesteps steps, as in _burned_cells. Members are processed in
+    chunks of at most SWEEP_MAX_CELLS cells.
+
+    Args:
+        county_key (str): The county key (e.g., "Arlington_VA").
+        igni_lat (float): Ignition point latitude.
+        igni_lon (float): Ignition point longitude.
+        p_ignition (list[float], optional): Values to sweep (default: config.p_ignition).
+        p_spontaneous (list[float], optional): Values to sweep (default: config.p_spontaneous).
+        runs (int): Replicates per combination; the curves are their mean.
+        seed (int, optional): Seed for the sweep's random generator.
+        config (SimulationConfig, optional): Supplies timesteps and the defaults above.
+
+    Returns:
+        dict: {"county_key", "ignition": {"row", "col"}, "timesteps", "runs",
+               "combinations": [{"p_ignition", "p_spontaneous", "burned": [...],
+               "burning": [...]}, ...]} where burned[t] / burning[t] are the
+               mean cell counts at timestep t = 0..timesteps.
+
+    Raises:
+        FileNotFoundError: If the county GeoTIFF cannot be found.
+        IndexError: If the (lat, lon) is outside the raster bounds.
+        ValueError: If the ignition point is not a forest pixel or a probability is out of range.
+    """
+    config = config or SimulationConfig()
+    p_ignitions = [float(p) for p in p_ignition] if p_ignition else [config.p_ignition]
+    p_spontaneouses = [float(p) for p in p_spontaneous] if p_spontaneous else [config.p_spontaneous]
+    if not all(0 <= p <= 1 for p in p_ignitions + p_spontaneouses):
+        raise ValueError("Swept probabilities must be between 0 and 1.")
+    runs = max(1, int(runs))
+    timesteps = config.timesteps
+
+    raster = _load_county_raster(county_key)
+    (start_y,), (start_x,), (error,) = _validate_ignitions(raster, [igni_lat], [igni_lon])
+    if error is not None:
+        raise error
+    start_y, start_x = int(start_y), int(start_x)
+
+    combinations = [(pi, ps) for pi in p_ignitions for ps in p_spontaneouses]
+    member_p_ignition = np.repeat([c[0] for c in combinations], runs)
+    member_p_spontaneous = np.repeat([c[1] for c in combinations], runs)
+    n_members = member_p_ignition.shape[0]
+    logger.info("Sweeping %d parameter combination(s) x %d run(s) for %s from (y=%d, x=%d)...",
+                len(combinations), runs, county_key, start_y, start_x)
+
+    if not member_p_spontaneous.any():
+        reach = timesteps + 1
+        y0, x0 = max(0, start_y - reach), max(0, start_x - reach)
+        base = raster.grid[y0:start_y + reach + 1, x0:start_x + reach + 1]
+        iy, ix = start_y - y0, start_x - x0
+    else:
+        base, iy, ix = raster.grid, start_y, start_x
+
+    burned = np.zeros((n_members, timesteps + 1), dtype=np.int64)
+    burning = np.zeros((n_members, timesteps + 1), dtype=np.int64)
+    rng = np.random.default_rng(seed)
+    chunk = max(1, SWEEP_MAX_CELLS // base.size)
+    for c0 in range(0, n_members, chunk):
+        members = slice(c0, min(n_members, c0 + chunk))
+        stack = np.repeat(base[np.newaxis], members.stop - members.start, axis=0)
+        stack[:, iy, ix] = BURNING
+        burned[members, 0] = burning[members, 0] = 1
+        for t in range(1, timesteps + 1):
+            stack = kernels.ca_step_stack(stack, member_p_ignition[members], member_p_spontaneous[members], rng)
+            burning[members, t] = np.count_nonzero(stack == BURNING, axis=(1, 2))
+            burned[members, t] = np.count_nonzero(stack >= BURNING, axis=(1, 2))
+            if not burning[members, t].any():
+                # Every member burned out; the curves stay flat from here
+                burned[members, t + 1:] = burned[members, t:t + 1]
+                break
+
+    mean_burned = burned.reshape(len(combinations), runs, -1).mean(axis=1)
+    mean_burning = burning.reshape(len(combinations), runs, -1).mean(axis=1)
+    return {
+        "county_key": county_key,
+        "ignition": {"row": start_y, "col": start_x},
+        "timesteps": timesteps,
+        "runs": runs,
+        "combinations": [
+            {"p_ignition": pi, "p_spontaneous": ps,
+             "burned": mean_burned[k].round(3).tolist(), "burning": mean_burning[k].round(3).tolist()}
+            for k, (pi, ps) in enumerate(combinations)
+        ],
+    }